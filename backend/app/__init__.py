@@ -6,6 +6,7 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from flask import Flask
 from flask_cors import CORS
 
+from app import coordination, database, history, live_state, metrics, migrations, push, route_stops, spatial, static_responses
 from app.config import Config
 from app.extensions import db
 
@@ -18,31 +19,49 @@ scheduler = BackgroundScheduler(daemon=True)
 def create_app(config_object: type[Config] = Config) -> Flask:
     """Application factory. Wires together the DB, CORS, the API blueprint,
     and (outside of testing) the background ETL scheduler that keeps the
-    database stocked with live MTA data.
+    database stocked with live MTA data -- or, in web workers that leave
+    ingesting to app/worker.py, the thread that follows its results.
     """
     app = Flask(__name__)
     app.config.from_object(config_object)
 
+    database.init_app(app)
     db.init_app(app)
-    CORS(app, resources={r"/api/*": {"origins": app.config["CORS_ORIGINS"]}})
+    metrics.init_app(app)
+    live_state.init_app(app)
+    coordination.init_app(app)
+    history.init_app(app)
+    push.init_app(app)
+    static_responses.init_app(app)
+    route_stops.init_app(app)
+    spatial.init_app(app)
+    CORS(
+        app,
+        resources={r"/api/*": {"origins": app.config["CORS_ORIGINS"]}},
+        expose_headers=["ETag"],  # so the frontend can revalidate with If-None-Match
+    )
 
     from app.routes import api_bp
 
     app.register_blueprint(api_bp, url_prefix="/api")
 
     with app.app_context():
-        db.create_all()
+        migrations.upgrade()
         from app.etl import seed_shapes, seed_stations
 
         seed_stations()
         seed_shapes()
+        if app.config["SERVE_REQUESTS"]:
+            static_responses.rebuild()
+            route_stops.warm()
+            spatial.rebuild()
 
     if app.config["ENABLE_SCHEDULER"] and not scheduler.running:
-        from app.etl import run_ingest
-
+        # Every process may schedule; only the ingest leader actually
+        # ingests (see app/coordination.py)
         def _job() -> None:
             with app.app_context():
-                run_ingest()
+                coordination.ingest_if_leader()
 
         scheduler.add_job(
             _job,
@@ -56,4 +75,9 @@ def create_app(config_object: type[Config] = Config) -> Flask:
         scheduler.modify_job("ingest_job", next_run_time=datetime.now())
         atexit.register(lambda: scheduler.shutdown(wait=False))
 
+    if app.config["LIVE_REFRESH_SECONDS"] > 0:
+        # Pick up ingests run by another process (the worker, or whichever
+        # web worker holds the ingest lock)
+        coordination.start_follower(app)
+
     return app
@@ -16,18 +16,124 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Connection pools (see app/database.py). Each web worker process has a
+    # pool of DB_POOL_SIZE connections, growing by up to DB_MAX_OVERFLOW
+    # under load, and requests wait up to DB_POOL_TIMEOUT seconds for one.
+    # The ingest writer and the leader lock get a separate pool of
+    # DB_INGEST_POOL_SIZE (0 shares the request pool instead). Connections
+    # are replaced after DB_POOL_RECYCLE seconds (-1 never) and pinged on
+    # checkout unless DB_POOL_PRE_PING=false. Ignored for in-memory SQLite.
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", "10"))
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_INGEST_POOL_SIZE = int(os.environ.get("DB_INGEST_POOL_SIZE", "3"))
+    DB_INGEST_MAX_OVERFLOW = int(os.environ.get("DB_INGEST_MAX_OVERFLOW", "2"))
+
     CORS_ORIGINS = os.environ.get("CORS_ORIGINS", "*")
 
     # The in-process scheduler is what makes this an ETL *pipeline* rather
     # than a passthrough proxy: it polls MTA on an interval and persists
     # normalized snapshots, independent of whether anyone is viewing the UI.
+    # It's the simple single-process setup; with several web workers, run
+    # `python -m app.worker` instead and turn this off (see app/worker.py).
     ENABLE_SCHEDULER = os.environ.get("ENABLE_SCHEDULER", "true").lower() == "true"
+    # Whether this process answers API requests. Only web processes build
+    # the request-side caches (pre-serialized responses, route stop orders,
+    # the station grid); the standalone worker sets it off.
+    SERVE_REQUESTS = True
     INGEST_INTERVAL_SECONDS = int(os.environ.get("INGEST_INTERVAL_SECONDS", "30"))
 
+    # Only the process holding the ingest lock ingests (see
+    # app/coordination.py): "auto" uses a Postgres advisory lock on
+    # Postgres and a lock file otherwise; "advisory", "file" or "none" force
+    # one. INGEST_LOCK_FILE defaults to a file under the system tmp.
+    INGEST_LEADER_LOCK = os.environ.get("INGEST_LEADER_LOCK", "auto").lower()
+    INGEST_LOCK_FILE = os.environ.get("INGEST_LOCK_FILE", "")
+    # How often a process that isn't ingesting checks the database for a
+    # newer ingest to republish its live snapshot from; 0 disables it.
+    LIVE_REFRESH_SECONDS = float(os.environ.get("LIVE_REFRESH_SECONDS", "5"))
+
+    # Each open /api/stream connection holds a request thread for as long
+    # as the client stays connected. Past this many per process, new
+    # streams get a 503 and clients poll instead, so the REST endpoints keep
+    # threads to run on. Keep it below the gunicorn --threads count (see the
+    # Dockerfile); 0 removes the limit.
+    STREAM_MAX_SUBSCRIBERS = int(os.environ.get("STREAM_MAX_SUBSCRIBERS", "24"))
+
+    # All 8 feed groups are fetched in parallel each cycle. The per-feed
+    # timeout goes to each HTTP request; the cycle deadline bounds the whole
+    # fetch stage so it always finishes well inside the ingest interval.
+    MTA_FEED_BASE_URL = os.environ.get(
+        "MTA_FEED_BASE_URL", "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds"
+    )
+    FEED_TIMEOUT_SECONDS = float(os.environ.get("FEED_TIMEOUT_SECONDS", "10"))
+    FEED_CYCLE_DEADLINE_SECONDS = float(os.environ.get("FEED_CYCLE_DEADLINE_SECONDS", "20"))
+    FEED_FETCH_WORKERS = int(os.environ.get("FEED_FETCH_WORKERS", "8"))
+    # Processes that decode and normalize the fetched feeds (see
+    # etl.FeedDecoder), leaving a core for request handling; 0 decodes
+    # inline in the fetch threads.
+    FEED_DECODE_PROCESSES = int(
+        os.environ.get("FEED_DECODE_PROCESSES", str(min(4, max((os.cpu_count() or 1) - 1, 0))))
+    )
+
+    # Service alerts missing from this many consecutive ingest cycles are
+    # deleted (the feed only lists currently active alerts).
+    ALERT_EXPIRY_CYCLES = int(os.environ.get("ALERT_EXPIRY_CYCLES", "6"))
+
+    # Superseded stop_arrivals generations are deleted in a background
+    # thread after each successful ingest; tests run it inline instead.
+    ARRIVALS_GC_IN_BACKGROUND = True
+
+    # Observed-arrival analytics (see app/headways.py). A headway under the
+    # bunching threshold counts as bunched, one over the gap threshold as a
+    # gap; anything over the max is a service break and isn't counted.
+    # Observations and hourly buckets are kept for HEADWAY_RETENTION_DAYS.
+    HEADWAY_ANALYTICS_ENABLED = os.environ.get("HEADWAY_ANALYTICS_ENABLED", "true").lower() == "true"
+    HEADWAY_BUNCHING_SECONDS = int(os.environ.get("HEADWAY_BUNCHING_SECONDS", "120"))
+    HEADWAY_GAP_SECONDS = int(os.environ.get("HEADWAY_GAP_SECONDS", "900"))
+    HEADWAY_MAX_SECONDS = int(os.environ.get("HEADWAY_MAX_SECONDS", "3600"))
+    HEADWAY_RETENTION_DAYS = int(os.environ.get("HEADWAY_RETENTION_DAYS", "7"))
+
+    # Where the parsed static GTFS is cached between starts (see
+    # app/gtfs_static.py); defaults to a directory under the system tmp.
+    GTFS_CACHE_DIR = os.environ.get("GTFS_CACHE_DIR", "")
+
+    # Opt-in vehicle-position history (see app/history.py). Unset disables
+    # it; partitions older than the retention window are deleted, 0 keeps
+    # everything. Range queries are capped to HISTORY_MAX_QUERY_HOURS. Only
+    # the ingesting process writes it, so with a separate worker the web
+    # processes must see the same directory (a shared volume).
+    HISTORY_DIR = os.environ.get("HISTORY_DIR", "")
+    HISTORY_RETENTION_HOURS = int(os.environ.get("HISTORY_RETENTION_HOURS", str(24 * 30)))
+    HISTORY_MAX_QUERY_HOURS = int(os.environ.get("HISTORY_MAX_QUERY_HOURS", "24"))
+
     INGEST_TRIGGER_SECRET = os.environ.get("INGEST_TRIGGER_SECRET", "")
 
+    # Prometheus-format ingest stage and request latency metrics (see
+    # app/metrics.py) on GET /metrics. The standalone worker has no web
+    # server, so it serves them on METRICS_PORT instead (0 = not at all).
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+
+
+class WorkerConfig(Config):
+    """The standalone ingest worker (app/worker.py) schedules ingests
+    itself and publishes its own snapshots, and serves no API requests.
+    """
+
+    ENABLE_SCHEDULER = False
+    LIVE_REFRESH_SECONDS = 0
+    SERVE_REQUESTS = False
+
 
 class TestConfig(Config):
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
     ENABLE_SCHEDULER = False
+    ARRIVALS_GC_IN_BACKGROUND = False
+    FEED_DECODE_PROCESSES = 0
+    HISTORY_DIR = ""
+    INGEST_LEADER_LOCK = "none"
+    LIVE_REFRESH_SECONDS = 0
     TESTING = True
@@ -0,0 +1,209 @@
+"""
+Keeping several processes on one database in step: exactly one of them
+ingests, and the rest pick up its results.
+
+Ingest leadership is a lock held for as long as the leader process lives.
+On Postgres it's a session-level advisory lock on a dedicated connection,
+so it covers every host using the database. Otherwise (SQLite, which is
+single-host anyway) it's an exclusive `flock` on INGEST_LOCK_FILE. Each
+scheduled tick calls `ingest_if_leader()`: the holder ingests, everyone
+else tries to take the lock and, failing, does nothing. A dead leader's
+connection or file handle goes with it, so the next tick elsewhere takes
+over. However many workers run, the feeds are fetched once a cycle.
+
+Processes that don't ingest (web workers, see app/worker.py for the
+ingest side) run a follower thread instead. Every LIVE_REFRESH_SECONDS it
+looks for successful IngestRuns newer than the one its live snapshot
+reflects and, if there are any, republishes the snapshot from the
+database (which also feeds /api/stream) and, when those runs added route
+segments, rebuilds the state derived from them.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any
+
+from flask import Flask, current_app
+from sqlalchemy import text
+
+from app import database, live_state
+from app.extensions import db
+from app.models import IngestRun
+
+try:  # POSIX only; without it only the advisory lock (or none) is available
+    import fcntl
+except ImportError:  # pragma: no cover - depends on the platform
+    fcntl = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+_EXTENSION_KEY = "coordination"
+
+# pg_advisory_lock key shared by every process of this app ("nycingst")
+_ADVISORY_LOCK_KEY = 0x6E7963696E677374
+
+
+class IngestLeader:
+    """This process's claim on ingest leadership. `acquire()` is cheap to
+    call every cycle: it re-checks a held lock and otherwise tries (without
+    blocking) to take it.
+    """
+
+    def __init__(self, mode: str, lock_file: str) -> None:
+        self.mode = mode
+        self.lock_file = lock_file
+        self._held: Any = None  # the connection or file object holding the lock
+        self._lock = threading.Lock()
+
+    @property
+    def is_leader(self) -> bool:
+        return self._held is not None
+
+    def _resolved_mode(self) -> str:
+        if self.mode != "auto":
+            return self.mode
+        return "advisory" if db.engine.dialect.name == "postgresql" else "file"
+
+    def acquire(self) -> bool:
+        with self._lock:
+            mode = self._resolved_mode()
+            if mode == "none":
+                return True
+            if self._held is not None and mode == "advisory" and not self._still_connected():
+                logger.warning("Lost the ingest leader connection, standing down")
+                self._release_locked()
+            if self._held is None:
+                self._held = self._try_advisory() if mode == "advisory" else self._try_file()
+                if self._held is not None:
+                    logger.info("This process (pid %d) is now the ingest leader", os.getpid())
+            return self._held is not None
+
+    def release(self) -> None:
+        with self._lock:
+            self._release_locked()
+
+    def _try_advisory(self) -> Any:
+        conn = database.ingest_engine().connect().execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            if conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": _ADVISORY_LOCK_KEY}).scalar():
+                return conn
+        except Exception:
+            logger.exception("Could not try the ingest advisory lock")
+        conn.close()
+        return None
+
+    def _still_connected(self) -> bool:
+        try:
+            self._held.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            return False
+
+    def _try_file(self) -> Any:
+        if fcntl is None:
+            raise RuntimeError("File-based ingest locking needs fcntl; set INGEST_LEADER_LOCK=advisory or none")
+        handle = open(self.lock_file, "a+")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return None
+        handle.seek(0)
+        handle.truncate()
+        handle.write(f"{os.getpid()}\n")
+        handle.flush()
+        return handle
+
+    def _release_locked(self) -> None:
+        held, self._held = self._held, None
+        if held is None:
+            return
+        try:
+            if self._resolved_mode() == "advisory":
+                held.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+        except Exception:  # the connection is gone, and the lock with it
+            pass
+        finally:
+            held.close()
+
+
+def default_lock_file() -> str:
+    return os.path.join(tempfile.gettempdir(), "nyc-transit-hub-ingest.lock")
+
+
+def init_app(app: Flask) -> None:
+    app.extensions[_EXTENSION_KEY] = IngestLeader(
+        app.config["INGEST_LEADER_LOCK"], app.config["INGEST_LOCK_FILE"] or default_lock_file()
+    )
+
+
+def leader() -> IngestLeader:
+    current: IngestLeader = current_app.extensions[_EXTENSION_KEY]
+    return current
+
+
+def ingest_if_leader(hold: bool = True) -> IngestRun | None:
+    """Run one ingest cycle if this process is (or can become) the ingest
+    leader; None if another process holds leadership. Scheduled cycles keep
+    leadership between runs. A one-off run (`hold=False`, the manual
+    trigger) hands back a lock it took just for the run, so a process that
+    never schedules ingests can't keep the real worker from ingesting.
+    """
+    current = leader()
+    was_leader = current.is_leader
+    if not current.acquire():
+        return None
+    from app.etl import run_ingest
+
+    try:
+        return run_ingest()
+    finally:
+        if not hold and not was_leader:
+            current.release()
+
+
+def follow_once() -> bool:
+    """Republish the live snapshot if another process has completed an
+    ingest since it was last built. Returns whether anything changed.
+    """
+    seen = live_state.published_ingest_run_id()
+    latest, new_segments = (
+        db.session.query(db.func.max(IngestRun.id), db.func.sum(IngestRun.new_segment_count))
+        .filter(IngestRun.status == "success", IngestRun.id > (seen or 0))
+        .one()
+    )
+    db.session.rollback()  # don't hold a read transaction open between polls
+    if latest is None:
+        return False
+    live_state.publish_from_db(latest)
+    if new_segments:
+        from app.etl import refresh_segment_derived_state
+
+        refresh_segment_derived_state()
+    return True
+
+
+def start_follower(app: Flask) -> threading.Thread:
+    """Poll for other processes' ingests every LIVE_REFRESH_SECONDS in a
+    daemon thread.
+    """
+    interval = app.config["LIVE_REFRESH_SECONDS"]
+
+    def _loop() -> None:
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                if leader().is_leader:
+                    continue  # this process ingests and publishes itself
+                try:
+                    follow_once()
+                except Exception:
+                    logger.exception("Refreshing the live snapshot from the database failed")
+                    db.session.rollback()
+
+    thread = threading.Thread(target=_loop, name="live-state-follower", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,171 @@
+"""
+Connection pools.
+
+Request threads and the ingest already get separate sessions (each app
+context has its own), but by default they'd draw connections from one
+engine's pool, so a slow ingest holding connections -- plus the ingest
+leader's advisory lock, which holds one for the life of the process --
+leaves fewer for the API's reads. `init_app` therefore configures two
+engines from the DB_POOL_* / DB_INGEST_* settings:
+
+  * the default engine, for request threads and everything else;
+  * an "ingest" bind on the same database with its own small pool, used
+    by code running under `writer()` (run_ingest, the arrivals GC) and by
+    the leader lock (`ingest_engine()`).
+
+`Session.get_bind` does the routing, so the ingest code keeps using
+`db.session` unchanged. Both pools time their checkouts; `pool_stats()`
+reports size, usage and wait times for /api/health.
+
+In-memory SQLite keeps Flask-SQLAlchemy's single shared connection: a
+second engine would open a second, empty database.
+"""
+
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from flask import Flask, current_app
+from flask_sqlalchemy.session import Session as _FlaskSession
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import Pool, QueuePool
+
+INGEST_BIND = "ingest"
+
+_writing: ContextVar[bool] = ContextVar("database_writing", default=False)
+
+
+class TimedQueuePool(QueuePool):
+    """A QueuePool that counts checkouts and how long each waited for a
+    connection (including opening a new one), and checkouts that timed out.
+    Keeps its configured `max_overflow`, which QueuePool doesn't expose.
+    """
+
+    def __init__(self, creator: Any, pool_size: int = 5, max_overflow: int = 10, **kwargs: Any) -> None:
+        super().__init__(creator, pool_size=pool_size, max_overflow=max_overflow, **kwargs)
+        self.max_overflow = max_overflow
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _do_get(self) -> Any:
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        waited = time.perf_counter() - started
+        with self._stats_lock:
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        return connection
+
+
+class Session(_FlaskSession):
+    """Flask-SQLAlchemy's session, except that under `writer()` it uses the
+    ingest engine, when there is one.
+    """
+
+    def get_bind(self, mapper: Any = None, clause: Any = None, bind: Any = None, **kwargs: Any) -> Any:
+        if bind is None and _writing.get():
+            engine = self._db.engines.get(INGEST_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def writer() -> Iterator[None]:
+    """Route `db.session` work in this context to the ingest engine. Also
+    usable as a decorator. A transaction the session already had open on
+    the default engine stays open alongside until its next commit.
+    """
+    token = _writing.set(True)
+    try:
+        yield
+    finally:
+        _writing.reset(token)
+
+
+def _is_memory_sqlite(uri: str) -> bool:
+    url = make_url(uri)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def _pool_options(config: Any, size: int, overflow: int) -> dict[str, Any]:
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": size,
+        "max_overflow": overflow,
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+    }
+
+
+def init_app(app: Flask) -> None:
+    """Fill in SQLALCHEMY_ENGINE_OPTIONS and the ingest bind from the pool
+    settings. Call before `db.init_app(app)`; options already present in
+    SQLALCHEMY_ENGINE_OPTIONS win.
+    """
+    config = app.config
+    uri = config["SQLALCHEMY_DATABASE_URI"]
+    if _is_memory_sqlite(uri):
+        return
+    config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        **_pool_options(config, config["DB_POOL_SIZE"], config["DB_MAX_OVERFLOW"]),
+        **(config.get("SQLALCHEMY_ENGINE_OPTIONS") or {}),
+    }
+    if config["DB_INGEST_POOL_SIZE"] > 0:
+        config["SQLALCHEMY_BINDS"] = {
+            INGEST_BIND: {
+                "url": uri,
+                **_pool_options(config, config["DB_INGEST_POOL_SIZE"], config["DB_INGEST_MAX_OVERFLOW"]),
+            },
+            **(config.get("SQLALCHEMY_BINDS") or {}),
+        }
+
+
+def _engines() -> dict[str | None, Engine]:
+    engines: dict[str | None, Engine] = current_app.extensions["sqlalchemy"].engines
+    return engines
+
+
+def ingest_engine() -> Engine:
+    """The engine the ingest writes through: its own, or the default one."""
+    engines = _engines()
+    return engines.get(INGEST_BIND) or engines[None]
+
+
+def _describe(pool: Pool) -> dict[str, Any]:
+    stats: dict[str, Any] = {"class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+        )
+    if isinstance(pool, TimedQueuePool):
+        stats.update(
+            max_overflow=pool.max_overflow,
+            checkouts=pool.checkouts,
+            timeouts=pool.timeouts,
+            wait_ms_mean=round(pool.wait_seconds_total / pool.checkouts * 1000, 3) if pool.checkouts else 0.0,
+            wait_ms_max=round(pool.wait_seconds_max * 1000, 3),
+        )
+    return stats
+
+
+def pool_stats() -> dict[str, dict[str, Any]]:
+    """Each engine's pool ("default", and "ingest" when it has its own)."""
+    return {key or "default": _describe(engine.pool) for key, engine in _engines().items()}
@@ -12,20 +12,54 @@ The ETL pipeline behind the resume bullet. Two jobs:
 
 `trip_to_vehicle_record` is kept as a pure function (no I/O) so it can be
 unit tested against a plain stub object instead of a live feed connection --
-see tests/test_etl.py.
+see tests/test_etl.py. So is `normalize_trips`, which reduces a feed's trips
+to the plain tuples the writers take; it runs next to the protobuf decoding
+in a process pool (FeedDecoder), so only compact records reach the
+interpreter that also serves requests.
 """
 
-import csv
+import atexit
+import hashlib
+import json
 import logging
-import os
-from datetime import datetime
-from typing import Any
-
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+import requests
+from flask import current_app
 from nyct_gtfs import NYCTFeed
+from sqlalchemy import or_
+from sqlalchemy.dialects import postgresql, sqlite
 
+from app import database, headways, history, live_state, metrics, route_stops, spatial, static_responses
 from app.extensions import db
+from app.geometry import SIMPLIFY_TOLERANCES_M, pack_points, simplify_polyline
+from app.gtfs_static import DATA_DIR, input_digest, static_gtfs
+from app.live_state import LiveSnapshot
 from app.mta_alerts import fetch_alerts_feed_dict, parse_alerts_feed_dict
-from app.models import IngestRun, RouteSegment, RouteShape, ServiceAlert, Station, StopArrival, VehicleSnapshot
+from app.models import (
+    AlertRoute,
+    AlertRouteBucket,
+    AlertRouteCount,
+    IngestRun,
+    RouteSegment,
+    RouteShape,
+    RouteShapeLevel,
+    ServiceAlert,
+    SnapshotPointer,
+    StaticDataVersion,
+    Station,
+    StopArrival,
+    VehicleSnapshot,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -33,32 +67,28 @@ logger = logging.getLogger(__name__)
 # at the same A-division feed, so fetching both would just double-count it.
 FEED_GROUPS = ["1", "A", "B", "G", "J", "N", "L", "SI"]
 
-_STOPS_TXT_PATH = os.path.join(os.path.dirname(__file__), "data", "stops.txt")
-_TRIPS_TXT_PATH = os.path.join(os.path.dirname(__file__), "data", "trips.txt")
-_SHAPES_TXT_PATH = os.path.join(os.path.dirname(__file__), "data", "shapes.txt")
-
-_child_to_parent_cache: dict[str, str] | None = None
+# Path of each group's feed under MTA_FEED_BASE_URL -- mirrors the table
+# nyct_gtfs keeps internally, so the base URL can be pointed at a local
+# stand-in server in tests.
+_FEED_PATHS = {
+    "1": "nyct%2Fgtfs",
+    "A": "nyct%2Fgtfs-ace",
+    "B": "nyct%2Fgtfs-bdfm",
+    "G": "nyct%2Fgtfs-g",
+    "J": "nyct%2Fgtfs-jz",
+    "N": "nyct%2Fgtfs-nqrw",
+    "L": "nyct%2Fgtfs-l",
+    "SI": "nyct%2Fgtfs-si",
+}
 
 
 def _load_child_to_parent_map() -> dict[str, str]:
-    """Build a lookup from directional child stop id (e.g. "228N", as
-    reported by VehiclePosition.stop_id in the realtime feed) to its parent
-    station id (e.g. "228", as stored in `Station`). Cached at module level
-    since the static file never changes at runtime.
+    """Lookup from directional child stop id (e.g. "228N", as reported by
+    VehiclePosition.stop_id in the realtime feed) to its parent station id
+    (e.g. "228", as stored in `Station`). Built once per process by the
+    static GTFS loader.
     """
-    global _child_to_parent_cache
-    if _child_to_parent_cache is not None:
-        return _child_to_parent_cache
-
-    mapping: dict[str, str] = {}
-    with open(_STOPS_TXT_PATH, newline="", encoding="utf-8") as f:
-        for row in csv.DictReader(f):
-            parent = row.get("parent_station")
-            if parent:
-                mapping[row["stop_id"]] = parent
-
-    _child_to_parent_cache = mapping
-    return mapping
+    return static_gtfs().child_to_parent
 
 
 def resolve_parent_stop_id(stop_id: str | None, child_to_parent: dict[str, str]) -> str | None:
@@ -78,7 +108,7 @@ def trip_to_segment_pairs(trip: Any, child_to_parent: dict[str, str]) -> list[tu
     operating data instead: each currently-scheduled trip's ordered stop
     list is a real, observed path along that route. Aggregated across many
     trips over several ingest cycles, the union of these edges converges on
-    the full route shape -- see _ingest_route_segments().
+    the full route shape -- see _write_route_segments().
 
     Pure function: takes any object exposing `.route_id` and
     `.stop_time_updates` (each with `.stop_id`) -- see tests/test_etl.py.
@@ -92,74 +122,136 @@ def trip_to_segment_pairs(trip: Any, child_to_parent: dict[str, str]) -> list[tu
     return pairs
 
 
-def seed_stations() -> int:
-    """Idempotently load parent stations (location_type == "1") from the
-    bundled static GTFS stops.txt. Safe to call on every startup.
+def _static_version_matches(name: str, digest: str) -> bool:
+    version = db.session.get(StaticDataVersion, name)
+    return version is not None and version.digest == digest
+
+
+def _record_static_version(name: str, digest: str) -> None:
+    version = db.session.get(StaticDataVersion, name)
+    if version is None:
+        db.session.add(StaticDataVersion(name=name, digest=digest, applied_at=datetime.utcnow()))
+    else:
+        version.digest = digest
+        version.applied_at = datetime.utcnow()
+
+
+def _insert_ignoring_conflicts(model: Any, rows: list[dict[str, Any]]) -> None:
+    """Bulk insert that tolerates rows a concurrently starting worker has
+    just written (ON CONFLICT DO NOTHING where supported).
+    """
+    if not rows:
+        return
+    insert = _upsert_insert()
+    if insert is None:
+        db.session.bulk_insert_mappings(model, rows)
+        return
+    for start in range(0, len(rows), _INSERT_CHUNK_ROWS):
+        db.session.execute(insert(model).values(rows[start:start + _INSERT_CHUNK_ROWS]).on_conflict_do_nothing())
+
+
+def seed_stations(data_dir: str = DATA_DIR) -> int:
+    """Load parent stations (location_type == "1") from the bundled static
+    GTFS stops.txt. Skipped outright while stops.txt still matches the
+    fingerprint recorded in static_data_versions; otherwise only new and
+    changed stations are written, in bulk. Stations dropped from the file
+    are kept, since live rows may still reference them. Returns the number
+    of stations inserted.
     """
-    inserted = 0
-    with open(_STOPS_TXT_PATH, newline="", encoding="utf-8") as f:
-        for row in csv.DictReader(f):
-            if row.get("location_type") != "1":
-                continue  # skip direction-specific child stops (e.g. "101N")
-
-            existing = db.session.get(Station, row["stop_id"])
-            if existing is None:
-                db.session.add(
-                    Station(
-                        stop_id=row["stop_id"],
-                        name=row["stop_name"],
-                        lat=float(row["stop_lat"]),
-                        lon=float(row["stop_lon"]),
-                    )
-                )
-                inserted += 1
+    digest = input_digest("stops.txt", data_dir=data_dir)
+    if _static_version_matches("stations", digest):
+        return 0
 
+    existing = {
+        row.stop_id: (row.name, row.lat, row.lon)
+        for row in db.session.query(Station.stop_id, Station.name, Station.lat, Station.lon)
+    }
+    inserts, updates = [], []
+    for stop in static_gtfs(data_dir).parent_stations():  # skips directional children (e.g. "101N")
+        row = {"stop_id": stop.stop_id, "name": stop.name, "lat": stop.lat, "lon": stop.lon}
+        current = existing.get(stop.stop_id)
+        if current is None:
+            inserts.append(row)
+        elif current != (stop.name, stop.lat, stop.lon):
+            updates.append(row)
+
+    _insert_ignoring_conflicts(Station, inserts)
+    db.session.bulk_update_mappings(Station, updates)
+    _record_static_version("stations", digest)
     db.session.commit()
-    return inserted
+    if inserts or updates:
+        logger.info("Seeded stations: %d new, %d updated", len(inserts), len(updates))
+    return len(inserts)
 
 
-def seed_shapes() -> int:
-    """Idempotently load route polylines from the bundled shapes.txt + trips.txt.
-    Each GTFS shape_id becomes one RouteShape row. Safe to call on every startup.
+def seed_shapes(data_dir: str = DATA_DIR) -> int:
+    """Load route polylines from the bundled shapes.txt + trips.txt, one
+    RouteShape row per GTFS shape_id. Skipped while both files match the
+    recorded fingerprint; otherwise new shapes are inserted, changed ones
+    updated and ones no longer in the data deleted, in bulk. Returns the
+    number of shapes inserted.
     """
-    import json
-
-    if RouteShape.query.count() > 0:
+    digest = input_digest("trips.txt", "shapes.txt", data_dir=data_dir)
+    if _static_version_matches("shapes", digest):
+        return 0
+    gtfs = static_gtfs(data_dir)
+    if not gtfs.shape_points:
+        # shapes.txt isn't part of the nyct-gtfs bundle (see README); without
+        # it the map falls back to the segment layer built at ingest time.
+        logger.info("No shapes.txt in %s, skipping shape seeding", data_dir)
         return 0
 
-    # Build shape_id -> route_id from trips.txt (take first occurrence)
-    shape_to_route: dict[str, str] = {}
-    with open(_TRIPS_TXT_PATH, newline="", encoding="utf-8") as f:
-        for row in csv.DictReader(f):
-            sid = row.get("shape_id", "").strip()
-            rid = row.get("route_id", "").strip()
-            if sid and rid and sid not in shape_to_route:
-                shape_to_route[sid] = rid
-
-    # Build shape_id -> ordered list of [lat, lon] from shapes.txt
-    shape_points: dict[str, list[tuple[int, float, float]]] = {}
-    with open(_SHAPES_TXT_PATH, newline="", encoding="utf-8") as f:
-        for row in csv.DictReader(f):
-            sid = row.get("shape_id", "").strip()
-            if sid not in shape_to_route:
-                continue
-            seq = int(row["shape_pt_sequence"])
-            lat = float(row["shape_pt_lat"])
-            lon = float(row["shape_pt_lon"])
-            shape_points.setdefault(sid, []).append((seq, lat, lon))
-
-    inserted = 0
-    for shape_id, route_id in shape_to_route.items():
-        pts = shape_points.get(shape_id)
-        if not pts:
-            continue
-        pts.sort(key=lambda t: t[0])
-        points_json = json.dumps([[lat, lon] for _, lat, lon in pts])
-        db.session.add(RouteShape(shape_id=shape_id, route_id=route_id, points_json=points_json))
-        inserted += 1
-
+    desired: dict[str, dict[str, Any]] = {}
+    for shape_id, shape in gtfs.shapes.items():
+        points = gtfs.shape_points.get(shape_id)
+        if points is not None and len(points):
+            desired[shape_id] = {
+                "shape_id": shape_id,
+                "route_id": shape.route_id,
+                "point_count": len(points),
+                "points_blob": pack_points(points),
+            }
+
+    # Only reached when the files changed, so comparing full bodies is fine
+    existing = {
+        row.shape_id: (row.route_id, row.points_blob)
+        for row in db.session.query(RouteShape.shape_id, RouteShape.route_id, RouteShape.points_blob)
+    }
+    inserts = [row for shape_id, row in desired.items() if shape_id not in existing]
+    updates = [
+        row
+        for shape_id, row in desired.items()
+        if shape_id in existing and existing[shape_id] != (row["route_id"], row["points_blob"])
+    ]
+    removed = [shape_id for shape_id in existing if shape_id not in desired]
+
+    # Simplified levels follow their shape: dropped with it, recomputed
+    # only for shapes that are new or whose points changed.
+    stale = removed + [row["shape_id"] for row in updates]
+    if stale:
+        db.session.query(RouteShapeLevel).filter(RouteShapeLevel.shape_id.in_(stale)).delete(
+            synchronize_session=False
+        )
+    if removed:
+        db.session.query(RouteShape).filter(RouteShape.shape_id.in_(removed)).delete(synchronize_session=False)
+    db.session.bulk_update_mappings(RouteShape, updates)
+    _insert_ignoring_conflicts(RouteShape, inserts)
+    levels = []
+    for row in inserts + updates:
+        points = gtfs.shape_points[row["shape_id"]]
+        for tolerance in SIMPLIFY_TOLERANCES_M:
+            simplified = simplify_polyline(points, tolerance)
+            levels.append({
+                "shape_id": row["shape_id"],
+                "tolerance_m": tolerance,
+                "point_count": len(simplified),
+                "points_blob": pack_points(simplified),
+            })
+    _insert_ignoring_conflicts(RouteShapeLevel, levels)
+    _record_static_version("shapes", digest)
     db.session.commit()
-    return inserted
+    logger.info("Seeded shapes: %d new, %d updated, %d removed", len(inserts), len(updates), len(removed))
+    return len(inserts)
 
 
 def trip_to_vehicle_record(trip: Any) -> dict[str, Any] | None:
@@ -183,39 +275,399 @@ def trip_to_vehicle_record(trip: Any) -> dict[str, Any] | None:
     }
 
 
-def _fetch_live_trips() -> list[Any]:
-    """Fetch all 8 NYCT feeds once and return a flat list of trips. Both
-    vehicle positions and route-segment geometry are derived from this same
-    fetch -- there's no reason to hit the MTA endpoint twice per cycle.
+# Field order of the tuples in FeedRecords
+VEHICLE_RECORD_FIELDS = (
+    "trip_id", "route_id", "direction", "headsign", "stop_id", "location_status", "has_delay_alert",
+    "last_position_update",
+)
+ARRIVAL_RECORD_FIELDS = ("trip_id", "route_id", "direction", "headsign", "stop_id", "arrival_time")
+
+# Only arrivals this far ahead are stored
+ARRIVAL_HORIZON_SECONDS = 90 * 60
+_EPOCH = datetime(1970, 1, 1)
+
+
+@dataclass
+class FeedRecords:
+    """Trips reduced to what the ingest writes: plain tuples, with stop ids
+    already resolved to known parent stations. This is all that comes back
+    from a decode process, rather than the feed's Trip objects.
     """
-    trips = []
-    for group in FEED_GROUPS:
-        try:
-            feed = NYCTFeed(group)
-        except Exception:  # network/parse errors on one feed shouldn't sink the run
-            logger.exception("Failed to fetch feed group %s", group)
-            continue
-        trips.extend(feed.trips)
-    return trips
 
+    vehicles: list[tuple] = field(default_factory=list)  # VEHICLE_RECORD_FIELDS
+    segments: set[tuple[str, str, str]] = field(default_factory=set)
+    arrivals: list[tuple] = field(default_factory=list)  # ARRIVAL_RECORD_FIELDS
+    trip_count: int = 0
+
+    def extend(self, other: "FeedRecords") -> None:
+        self.vehicles.extend(other.vehicles)
+        self.segments.update(other.segments)
+        self.arrivals.extend(other.arrivals)
+        self.trip_count += other.trip_count
+
+
+def normalize_trips(
+    trips: list[Any], child_to_parent: dict[str, str], known_stop_ids: set[str], now_ts: float
+) -> FeedRecords:
+    """Reduce trips to FeedRecords: vehicles via trip_to_vehicle_record,
+    edges between consecutive stops, and the arrivals due within
+    ARRIVAL_HORIZON_SECONDS of `now_ts`. Anything at a stop that isn't a
+    known station is dropped. Pure function, see tests/test_etl.py.
+
+    One pass over each trip's stop_time_updates yields both its edges (the
+    same ones trip_to_segment_pairs gives) and its arrivals. Each child
+    stop id is resolved to its parent, and checked against the known
+    stations, once per call rather than once per update; arrival times are
+    compared as naive UTC datetimes and only the kept ones converted.
+    """
+    records = FeedRecords(trip_count=len(trips))
+    vehicles, segments, arrivals = records.vehicles, records.segments, records.arrivals
+    now = _EPOCH + timedelta(seconds=now_ts)
+    cutoff = now + timedelta(seconds=ARRIVAL_HORIZON_SECONDS)
+
+    # child stop id -> (parent id, is a known station); a feed repeats the
+    # same few hundred stops across thousands of updates
+    resolved: dict[str | None, tuple[str | None, bool]] = {}
+
+    def resolve(stop_id: str | None) -> tuple[str | None, bool]:
+        parent = resolve_parent_stop_id(stop_id, child_to_parent)
+        entry = resolved[stop_id] = (parent, parent in known_stop_ids)
+        return entry
 
-def _ingest_vehicles(trips: list[Any], child_to_parent: dict[str, str], known_stop_ids: set[str]) -> int:
-    records = []
     for trip in trips:
-        record = trip_to_vehicle_record(trip)
-        if not record:
+        vehicle = trip_to_vehicle_record(trip)
+        if vehicle:
+            vehicle["stop_id"], known = resolved.get(vehicle["stop_id"]) or resolve(vehicle["stop_id"])
+            if known:
+                vehicles.append(tuple(vehicle[name] for name in VEHICLE_RECORD_FIELDS))
+
+        route_id = trip.route_id
+        head = (trip.trip_id, route_id, trip.direction, trip.headsign_text)
+        previous: str | None = None
+        for update in trip.stop_time_updates:
+            parent, known = resolved.get(update.stop_id) or resolve(update.stop_id)
+            if not known or parent is None:
+                previous = None
+                continue
+            if previous is not None and parent != previous:
+                segments.add((route_id, parent, previous) if parent < previous else (route_id, previous, parent))
+            previous = parent
+            # nyct-gtfs returns naive datetime in UTC
+            arr = update.arrival or update.departure
+            if arr is None or arr < now or arr > cutoff:
+                continue
+            arrivals.append((*head, parent, int((arr - _EPOCH).total_seconds())))
+    return records
+
+
+def decode_feed(
+    content: bytes, url: str, child_to_parent: dict[str, str], known_stop_ids: set[str], now_ts: float
+) -> FeedRecords:
+    """Parse one GTFS-RT payload and normalize its trips. Module-level so
+    it can be shipped to a decode process.
+    """
+    feed = NYCTFeed(url, fetch_immediately=False)
+    feed.load_gtfs_bytes(content)
+    return normalize_trips(feed.trips, child_to_parent, known_stop_ids, now_ts)
+
+
+@dataclass
+class FeedFetchResult:
+    """Outcome of fetching one feed group. `trips` (or `records`, when the
+    fetch was given a decoder) is empty and `error` is set when the group
+    was skipped (network/parse failure or timeout).
+    """
+
+    group: str
+    trips: list[Any] = field(default_factory=list)
+    records: FeedRecords | None = None
+    latency_seconds: float = 0.0  # download and decode
+    decode_seconds: float = 0.0
+    byte_count: int = 0
+    error: str | None = None
+
+
+# Turns (payload, url) into FeedRecords; see FeedDecoder
+Decoder = Callable[[bytes, str], FeedRecords]
+
+
+def _fetch_feed_group(group: str, url: str, timeout: float, decode: Decoder | None = None) -> FeedFetchResult:
+    started = time.perf_counter()
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    result = FeedFetchResult(group=group, byte_count=len(response.content))
+    downloaded = time.perf_counter()
+    if decode is not None:
+        result.records = decode(response.content, url)
+    else:
+        feed = NYCTFeed(url, fetch_immediately=False)
+        feed.load_gtfs_bytes(response.content)
+        result.trips = feed.trips
+    finished = time.perf_counter()
+    result.latency_seconds = finished - started
+    result.decode_seconds = finished - downloaded
+    return result
+
+
+def fetch_feed_groups(
+    groups: list[str],
+    url_for: Callable[[str], str],
+    feed_timeout: float,
+    cycle_deadline: float,
+    max_workers: int,
+    decode: Decoder | None = None,
+) -> list[FeedFetchResult]:
+    """Fetch and parse every feed group concurrently on a bounded thread
+    pool. `feed_timeout` is handed to each HTTP request; `cycle_deadline`
+    caps the whole stage, so one hung feed can't push the cycle past the
+    ingest interval. Groups that fail or miss the deadline come back with
+    `error` set instead of raising -- one bad feed shouldn't sink the run.
+    With `decode`, each payload is handed to it as soon as it arrives and
+    the result carries `records` instead of `trips`.
+    """
+    results: dict[str, FeedFetchResult] = {}
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="feed-fetch")
+    futures = {
+        executor.submit(_fetch_feed_group, group, url_for(group), feed_timeout, decode): group for group in groups
+    }
+    try:
+        for future in as_completed(futures, timeout=cycle_deadline):
+            group = futures[future]
+            try:
+                results[group] = future.result()
+            except Exception as exc:  # network/parse errors on one feed
+                logger.warning("Failed to fetch feed group %s: %s", group, exc)
+                results[group] = FeedFetchResult(group=group, error=str(exc))
+    except FuturesTimeoutError:
+        for group in groups:
+            if group not in results:
+                logger.warning("Feed group %s missed the %.1fs fetch deadline", group, cycle_deadline)
+                results[group] = FeedFetchResult(group=group, latency_seconds=cycle_deadline, error="deadline exceeded")
+    finally:
+        # Don't block the cycle on stragglers; their results are discarded.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return [results[group] for group in groups]
+
+
+class FeedDecoder:
+    """Decodes and normalizes feed payloads (see decode_feed) for one
+    ingest cycle: in the app's pool of FEED_DECODE_PROCESSES processes, so
+    protobuf parsing and the trip walk use other cores and don't hold the
+    GIL that request threads need, or inline when that's 0. A pool that
+    breaks (a decode process died) is replaced on the next cycle; this
+    cycle's remaining payloads are decoded inline.
+    """
+
+    def __init__(
+        self, pool: ProcessPoolExecutor | None, child_to_parent: dict[str, str], known_stop_ids: set[str], now_ts: float
+    ) -> None:
+        self.pool = pool
+        self.broken = False
+        self._context = (child_to_parent, known_stop_ids, now_ts)
+
+    def __call__(self, content: bytes, url: str) -> FeedRecords:
+        if self.pool is not None and not self.broken:
+            try:
+                return self.pool.submit(decode_feed, content, url, *self._context).result()
+            except BrokenProcessPool:
+                logger.warning("Feed decode pool broke, decoding inline for this cycle")
+                self.broken = True
+        return decode_feed(content, url, *self._context)
+
+
+def _decode_pool() -> ProcessPoolExecutor | None:
+    """This app's decode process pool, started on first use."""
+    processes = current_app.config["FEED_DECODE_PROCESSES"]
+    if processes <= 0:
+        return None
+    pool = current_app.extensions.get("feed_decode_pool")
+    if pool is None:
+        # Not fork: the ingest runs alongside scheduler and request threads
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        pool = current_app.extensions["feed_decode_pool"] = ProcessPoolExecutor(processes, mp_context=context)
+        atexit.register(pool.shutdown, wait=False, cancel_futures=True)
+    return pool
+
+
+def _fetch_live_records(child_to_parent: dict[str, str], known_stop_ids: set[str], now_ts: float) -> FeedRecords:
+    """Fetch all 8 NYCT feeds once and return their normalized records.
+    Vehicle positions, route-segment geometry and arrivals are all derived
+    from this same fetch -- there's no reason to hit the MTA endpoint more
+    than once per cycle. Each payload is decoded as soon as it arrives, so
+    decoding overlaps the slower feeds' downloads.
+    """
+    config = current_app.config
+    base_url = config["MTA_FEED_BASE_URL"].rstrip("/")
+    decoder = FeedDecoder(_decode_pool(), child_to_parent, known_stop_ids, now_ts)
+    results = fetch_feed_groups(
+        FEED_GROUPS,
+        url_for=lambda group: f"{base_url}/{_FEED_PATHS[group]}",
+        feed_timeout=config["FEED_TIMEOUT_SECONDS"],
+        cycle_deadline=config["FEED_CYCLE_DEADLINE_SECONDS"],
+        max_workers=config["FEED_FETCH_WORKERS"],
+        decode=decoder,
+    )
+    if decoder.broken:
+        current_app.extensions.pop("feed_decode_pool").shutdown(wait=False, cancel_futures=True)
+
+    registry = metrics.registry()
+    records = FeedRecords()
+    for result in results:
+        if result.records is None:
+            registry.feed_errors.inc(result.group)
             continue
-        record["stop_id"] = resolve_parent_stop_id(record["stop_id"], child_to_parent)
-        if record["stop_id"] in known_stop_ids:
-            records.append(record)
+        registry.feed_fetch_seconds.observe(result.latency_seconds - result.decode_seconds, result.group)
+        registry.feed_decode_seconds.observe(result.decode_seconds, result.group)
+        registry.feed_bytes.inc(result.group, amount=result.byte_count)
+        logger.info(
+            "Fetched feed group %s: %d trips, %d bytes in %.3fs",
+            result.group, result.records.trip_count, result.byte_count, result.latency_seconds,
+        )
+        records.extend(result.records)
+    return records
+
+
+@dataclass
+class VehicleIngestResult:
+    """Row counts from one diffed write of `vehicle_snapshots`."""
+
+    total: int = 0
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+
+
+# A train sitting at the same stop with the same status hasn't moved, so
+# its row is left alone rather than rewritten every cycle.
+_VEHICLE_DIFF_FIELDS = ("stop_id", "location_status", "has_delay_alert")
+
+
+def _write_vehicles(vehicles: list[tuple]) -> VehicleIngestResult:
+    """Diff this cycle's vehicles against the table by trip_id: insert new
+    trips, update only rows whose stop/status changed, delete trips that
+    have left the feed. Nothing is committed here: run_ingest commits the
+    vehicles, segments and arrivals together, so readers never see a
+    half-empty table (or one cycle's vehicles with the last one's
+    arrivals), and unchanged rows aren't churned into dead tuples.
+    """
+    # Keyed by trip_id: a trip listed twice keeps its last record
+    records = {vehicle[0]: dict(zip(VEHICLE_RECORD_FIELDS, vehicle)) for vehicle in vehicles}
+
+    existing: dict[str, Any] = {}
+    stale_ids: list[int] = []
+    columns = [getattr(VehicleSnapshot, name) for name in _VEHICLE_DIFF_FIELDS]
+    for row in db.session.query(VehicleSnapshot.id, VehicleSnapshot.trip_id, *columns):
+        if row.trip_id in records and row.trip_id not in existing:
+            existing[row.trip_id] = row
+        else:
+            stale_ids.append(row.id)  # gone from the feed (or a duplicate)
+
+    now = datetime.utcnow()
+    inserts = []
+    updates = []
+    for trip_id, record in records.items():
+        row = existing.get(trip_id)
+        if row is None:
+            inserts.append({**record, "observed_at": now})
+        elif any(getattr(row, name) != record[name] for name in _VEHICLE_DIFF_FIELDS):
+            updates.append({**record, "id": row.id, "observed_at": now})
+
+    if stale_ids:
+        db.session.query(VehicleSnapshot).filter(VehicleSnapshot.id.in_(stale_ids)).delete(
+            synchronize_session=False
+        )
+    db.session.bulk_update_mappings(VehicleSnapshot, updates)
+    db.session.bulk_insert_mappings(VehicleSnapshot, inserts)
+
+    return VehicleIngestResult(
+        total=len(records), inserted=len(inserts), updated=len(updates), deleted=len(stale_ids)
+    )
+
+
+def _upsert_insert() -> Callable[..., Any] | None:
+    """The dialect-specific `insert()` construct that supports ON CONFLICT
+    (Postgres and SQLite), or None on backends without it.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    return None
 
-    VehicleSnapshot.query.delete()
-    db.session.bulk_insert_mappings(VehicleSnapshot, records)
-    db.session.commit()
-    return len(records)
+
+_INSERT_CHUNK_ROWS = 1000
+
+
+class SegmentKeyCache:
+    """Process-level set of (route_id, stop_id_a, stop_id_b) keys already in
+    route_segments, so each cycle doesn't have to reload the whole table to
+    find out which edges are new.
+
+    Seeded from the table once, then kept current as this process inserts.
+    Each cycle compares its size against a cheap COUNT(*): if another worker
+    has written segments in the meantime, the counts differ and the keys are
+    reloaded. Inserts ignore conflicts anyway, so a stale cache only costs
+    a wasted insert attempt, never a failed cycle.
+    """
+
+    def __init__(self) -> None:
+        self.keys: set[tuple[str, str, str]] = set()
+        self.seeded = False
+
+    def sync(self) -> bool:
+        """Make sure the cache matches the table. Returns True if segments
+        written elsewhere were picked up (i.e. derived state is stale).
+        """
+        count = db.session.query(db.func.count(RouteSegment.id)).scalar()
+        if self.seeded and len(self.keys) == count:
+            return False
+        was_seeded = self.seeded
+        self.keys = {
+            tuple(row)
+            for row in db.session.query(RouteSegment.route_id, RouteSegment.stop_id_a, RouteSegment.stop_id_b)
+        }
+        self.seeded = True
+        return was_seeded
+
+
+def _segment_key_cache() -> SegmentKeyCache:
+    cache: SegmentKeyCache = current_app.extensions.setdefault("segment_keys", SegmentKeyCache())
+    return cache
+
+
+def _insert_segments(keys: set[tuple[str, str, str]]) -> int:
+    """Bulk-insert new edges, ignoring ones another writer already added.
+    Returns the number of rows actually inserted.
+    """
+    now = datetime.utcnow()
+    rows = [{"route_id": r, "stop_id_a": a, "stop_id_b": b, "first_seen_at": now} for r, a, b in sorted(keys)]
+    insert = _upsert_insert()
+    if insert is not None:
+        inserted = 0
+        # Chunked to stay under SQLite's bound-parameter limit on a cold start
+        for start in range(0, len(rows), _INSERT_CHUNK_ROWS):
+            stmt = insert(RouteSegment).values(rows[start:start + _INSERT_CHUNK_ROWS]).on_conflict_do_nothing(
+                index_elements=[RouteSegment.route_id, RouteSegment.stop_id_a, RouteSegment.stop_id_b]
+            )
+            inserted += db.session.execute(stmt).rowcount  # type: ignore[attr-defined]
+        return inserted
+
+    route_ids = {r for r, _, _ in keys}
+    present = {
+        tuple(row)
+        for row in db.session.query(RouteSegment.route_id, RouteSegment.stop_id_a, RouteSegment.stop_id_b).filter(
+            RouteSegment.route_id.in_(route_ids)
+        )
+    }
+    rows = [row for row in rows if (row["route_id"], row["stop_id_a"], row["stop_id_b"]) not in present]
+    db.session.bulk_insert_mappings(RouteSegment, rows)
+    return len(rows)
 
 
-def _ingest_route_segments(trips: list[Any], child_to_parent: dict[str, str], known_stop_ids: set[str]) -> int:
+def _write_route_segments(segments: set[tuple[str, str, str]]) -> int:
     """Unlike vehicles, segments accumulate rather than reset each cycle --
     a route's shape doesn't change minute to minute, so there's no reason
     to forget an edge just because this particular cycle didn't see a trip
@@ -223,80 +675,276 @@ def _ingest_route_segments(trips: list[Any], child_to_parent: dict[str, str], kn
     line layer fills in as more of each route's real stop patterns are
     observed; see trip_to_segment_pairs() for why this approach exists at
     all instead of reading a static shapes.txt.
+
+    Known edges come from SegmentKeyCache rather than a full table load;
+    only edges missing from it are sent to the database, in one statement,
+    within the caller's transaction. Should that be rolled back, the cache
+    holds keys the table doesn't, and the next sync() reloads it.
     """
-    existing = {(s.route_id, s.stop_id_a, s.stop_id_b) for s in RouteSegment.query.all()}
-    new_count = 0
+    cache = _segment_key_cache()
+    if cache.sync():
+        refresh_segment_derived_state()  # another worker added edges
+    known = cache.keys
 
-    for trip in trips:
-        for route_id, stop_a, stop_b in trip_to_segment_pairs(trip, child_to_parent):
-            key = (route_id, stop_a, stop_b)
-            if key in existing or stop_a not in known_stop_ids or stop_b not in known_stop_ids:
-                continue
-            existing.add(key)
-            db.session.add(RouteSegment(route_id=route_id, stop_id_a=stop_a, stop_id_b=stop_b))
-            new_count += 1
+    candidates = segments - known
 
-    db.session.commit()
+    if not candidates:
+        return 0
+
+    new_count = _insert_segments(candidates)
+    known.update(candidates)
+    if new_count < len(candidates):
+        # Some of "our" new edges were already written by another worker,
+        # so this process's derived state is missing them too.
+        refresh_segment_derived_state()
     return new_count
 
 
-def _ingest_arrivals(trips: list[Any], child_to_parent: dict[str, str], known_stop_ids: set[str]) -> int:
-    """Build the stop_arrivals table from each active trip's stop_time_updates.
-    Only stores future arrivals (next ~90 minutes). Table is fully replaced
-    each ingest cycle.
-    """
-    from datetime import timezone
-    now_ts = datetime.utcnow().replace(tzinfo=timezone.utc).timestamp()
-    cutoff = now_ts + 90 * 60  # 90 minutes ahead
+ARRIVALS_POINTER = "stop_arrivals"
 
-    records = []
-    for trip in trips:
-        for update in trip.stop_time_updates:
-            arr = update.arrival or update.departure
-            if arr is None:
-                continue
-            # nyct-gtfs returns naive datetime in UTC
-            arr_ts = arr.replace(tzinfo=timezone.utc).timestamp()
-            if arr_ts < now_ts or arr_ts > cutoff:
-                continue
-            parent = resolve_parent_stop_id(update.stop_id, child_to_parent)
-            if parent not in known_stop_ids:
-                continue
-            records.append({
-                "trip_id": trip.trip_id,
-                "route_id": trip.route_id,
-                "direction": trip.direction,
-                "headsign": trip.headsign_text,
-                "stop_id": parent,
-                "arrival_time": int(arr_ts),
-            })
 
-    StopArrival.query.delete()
+def _write_arrivals(arrivals: list[tuple]) -> int:
+    """Build the next generation of stop_arrivals from this cycle's
+    upcoming arrivals (the next ARRIVAL_HORIZON_SECONDS, see
+    normalize_trips).
+
+    Rows are written under a fresh generation id and the pointer is flipped
+    in the same (caller's) transaction, so readers switch from one complete snapshot
+    to the next with no empty or half-written window. Nothing is deleted
+    here -- see collect_arrival_generations().
+    """
+    # Row-locks the pointer on Postgres so two overlapping ingests can't
+    # claim the same generation; SQLite serializes writers anyway.
+    pointer = db.session.get(SnapshotPointer, ARRIVALS_POINTER, with_for_update=True)
+    if pointer is None:
+        pointer = SnapshotPointer(name=ARRIVALS_POINTER, generation=0)
+        db.session.add(pointer)
+    generation = pointer.generation + 1
+
+    records = [{"generation": generation, **dict(zip(ARRIVAL_RECORD_FIELDS, arrival))} for arrival in arrivals]
     db.session.bulk_insert_mappings(StopArrival, records)
-    db.session.commit()
+    pointer.generation = generation
+    pointer.updated_at = datetime.utcnow()
     return len(records)
 
 
-def _ingest_alerts() -> int:
-    feed_dict = fetch_alerts_feed_dict()
-    records = parse_alerts_feed_dict(feed_dict)
+def collect_arrival_generations(keep: int = 2) -> int:
+    """Delete stop_arrivals rows older than the newest `keep` generations.
+    The previous generation is kept by default as a grace period for reads
+    that resolved the pointer just before the flip.
+    """
+    pointer = db.session.get(SnapshotPointer, ARRIVALS_POINTER)
+    if pointer is None:
+        return 0
+    deleted = (
+        db.session.query(StopArrival)
+        .filter(StopArrival.generation <= pointer.generation - keep)
+        .delete(synchronize_session=False)
+    )
+    db.session.commit()
+    return deleted
+
+
+def _collect_arrival_generations_in_background() -> None:
+    """Run the arrivals GC off the ingest's critical path, in a daemon thread
+    with its own app context (and therefore its own session/connection).
+    """
+    app = current_app._get_current_object()  # type: ignore[attr-defined]
+
+    def _target() -> None:
+        with app.app_context(), database.writer():
+            try:
+                collect_arrival_generations()
+            except Exception:
+                logger.exception("stop_arrivals garbage collection failed")
+                db.session.rollback()
+
+    threading.Thread(target=_target, name="arrivals-gc", daemon=True).start()
+
+
+def _record_headways(previous: LiveSnapshot, current: LiveSnapshot) -> None:
+    """Record the arrivals observed between two cycles and drop analytics
+    rows past retention. Logged, never raised: analytics must not be able
+    to fail an ingest cycle.
+    """
+    try:
+        headways.record_cycle(previous, current)
+        retention = timedelta(days=current_app.config["HEADWAY_RETENTION_DAYS"])
+        headways.purge(current.built_at - retention)
+    except Exception:
+        logger.exception("Headway analytics update failed")
+        db.session.rollback()
+
+
+@dataclass
+class AlertIngestResult:
+    """Row counts from one batched upsert of `service_alerts`."""
+
+    total: int = 0
+    written: int = 0  # inserted or content changed
+    touched: int = 0  # unchanged, last-seen marker refreshed
+    expired: int = 0
+
+
+_ALERT_CONTENT_FIELDS = ("header_text", "routes", "starts_at", "ends_at")
+
+
+def _alert_content_hash(record: dict[str, Any]) -> str:
+    content = [record[name] for name in _ALERT_CONTENT_FIELDS]
+    return hashlib.sha1(json.dumps(content, default=str).encode()).hexdigest()
 
-    for record in records:
-        alert = ServiceAlert.query.filter_by(external_id=record["external_id"]).first()
-        if alert is None:
-            alert = ServiceAlert(external_id=record["external_id"])
-            db.session.add(alert)
 
-        alert.header_text = record["header_text"]
-        alert.routes = record["routes"]
-        alert.starts_at = record["starts_at"]
-        alert.ends_at = record["ends_at"]
-        alert.last_seen_at = datetime.utcnow()
+def _upsert_alerts(rows: list[dict[str, Any]]) -> None:
+    """One INSERT ... ON CONFLICT (external_id) DO UPDATE for every new or
+    changed alert on Postgres/SQLite; elsewhere, one prefetch of the
+    affected rows and in-place updates.
+    """
+    insert = _upsert_insert()
+    if insert is not None:
+        stmt = insert(ServiceAlert).values(rows)
+        updated = ("content_hash", "last_seen_at", "last_seen_run_id", *_ALERT_CONTENT_FIELDS)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ServiceAlert.external_id],
+            set_={name: stmt.excluded[name] for name in updated},
+        )
+        db.session.execute(stmt)
+        return
+
+    by_id = {row["external_id"]: row for row in rows}
+    existing = ServiceAlert.query.filter(ServiceAlert.external_id.in_(by_id)).all()
+    for alert in existing:
+        for name, value in by_id.pop(alert.external_id).items():
+            setattr(alert, name, value)
+    db.session.add_all(ServiceAlert(**row) for row in by_id.values())
+
+
+def _ingest_alerts(run_id: int) -> AlertIngestResult:
+    """Set-based alert ingest: one prefetch of (external_id, hash), one
+    upsert for new/changed alerts, and one UPDATE of the last-seen marker
+    for the unchanged ones. Alerts absent from the feed for
+    ALERT_EXPIRY_CYCLES runs are deleted.
+    """
+    feed_dict = fetch_alerts_feed_dict()
+    records = {record["external_id"]: record for record in parse_alerts_feed_dict(feed_dict)}
+
+    # Unchanged alerts aren't rewritten, but their last-seen marker is
+    # bumped every run, so an alert expires exactly N runs after it was
+    # last in the feed
+    expiry_cycles = current_app.config["ALERT_EXPIRY_CYCLES"]
+
+    known = {
+        row.external_id: row
+        for row in db.session.query(
+            ServiceAlert.external_id, ServiceAlert.content_hash, ServiceAlert.last_seen_run_id, ServiceAlert.routes
+        ).filter(ServiceAlert.external_id.in_(records))
+    }
 
+    now = datetime.utcnow()
+    changed = []
+    touch_ids = []
+    route_changes: dict[str, tuple[set[str], set[str]]] = {}  # external_id -> (old routes, new routes)
+    for external_id, record in records.items():
+        content_hash = _alert_content_hash(record)
+        row = known.get(external_id)
+        if row is None or row.content_hash != content_hash:
+            changed.append({**record, "content_hash": content_hash, "last_seen_at": now, "last_seen_run_id": run_id})
+            old_routes = _split_routes(row.routes) if row else set()
+            new_routes = _split_routes(record["routes"])
+            if old_routes != new_routes:
+                route_changes[external_id] = (old_routes, new_routes)
+        elif row.last_seen_run_id != run_id:
+            touch_ids.append(external_id)
+
+    if changed:
+        _upsert_alerts(changed)
+    if touch_ids:
+        db.session.query(ServiceAlert).filter(ServiceAlert.external_id.in_(touch_ids)).update(
+            {"last_seen_at": now, "last_seen_run_id": run_id}, synchronize_session=False
+        )
+    expired = (
+        db.session.query(ServiceAlert.external_id, ServiceAlert.routes)
+        .filter(ServiceAlert.external_id.notin_(records))
+        .filter(
+            or_(ServiceAlert.last_seen_run_id.is_(None), ServiceAlert.last_seen_run_id <= run_id - expiry_cycles)
+        )
+        .all()
+    )
+    if expired:
+        db.session.query(ServiceAlert).filter(
+            ServiceAlert.external_id.in_([row.external_id for row in expired])
+        ).delete(synchronize_session=False)
+        route_changes.update({row.external_id: (_split_routes(row.routes), set()) for row in expired})
+    _apply_alert_route_changes(route_changes, now)
     db.session.commit()
-    return len(records)
 
+    return AlertIngestResult(total=len(records), written=len(changed), touched=len(touch_ids), expired=len(expired))
+
+
+def _split_routes(routes: str | None) -> set[str]:
+    return {route.strip() for route in (routes or "").split(",") if route.strip()}
 
+
+def _apply_alert_route_changes(changes: dict[str, tuple[set[str], set[str]]], now: datetime) -> None:
+    """Bring alert_routes, the per-route active counters and this hour's
+    raised/cleared buckets in line with the alerts whose route sets changed
+    (new alerts have an empty old set, expired ones an empty new set). Only
+    the touched routes' counter and bucket rows are read or written.
+    """
+    if not changes:
+        return
+    db.session.query(AlertRoute).filter(AlertRoute.external_id.in_(changes)).delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(
+        AlertRoute,
+        [{"route_id": route, "external_id": ext} for ext, (_, new) in changes.items() for route in new],
+    )
+
+    raised: dict[str, int] = {}
+    cleared: dict[str, int] = {}
+    for old, new in changes.values():
+        for route in new - old:
+            raised[route] = raised.get(route, 0) + 1
+        for route in old - new:
+            cleared[route] = cleared.get(route, 0) + 1
+    touched = set(raised) | set(cleared)
+
+    counts = {c.route_id: c for c in AlertRouteCount.query.filter(AlertRouteCount.route_id.in_(touched))}
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    buckets = {
+        b.route_id: b
+        for b in AlertRouteBucket.query.filter(
+            AlertRouteBucket.bucket_start == hour, AlertRouteBucket.route_id.in_(touched)
+        )
+    }
+    for route in touched:
+        count = counts.get(route)
+        if count is None:
+            count = AlertRouteCount(route_id=route, active_count=0)
+            db.session.add(count)
+        count.active_count = max(0, count.active_count + raised.get(route, 0) - cleared.get(route, 0))
+        count.updated_at = now
+
+        bucket = buckets.get(route)
+        if bucket is None:
+            bucket = AlertRouteBucket(route_id=route, bucket_start=hour, raised=0, cleared=0)
+            db.session.add(bucket)
+        bucket.raised += raised.get(route, 0)
+        bucket.cleared += cleared.get(route, 0)
+
+
+def refresh_segment_derived_state() -> None:
+    """Rebuild everything derived from route_segments once new edges land:
+    the pre-serialized /route-segments body, the per-route stop orders and
+    the station -> served-routes map. A no-op in processes that don't
+    serve requests.
+    """
+    if not current_app.config["SERVE_REQUESTS"]:
+        return
+    static_responses.rebuild("route-segments")
+    route_stops.invalidate()
+    spatial.rebuild_routes()
+
+
+@database.writer()
 def run_ingest() -> IngestRun:
     """The recurring ETL job. Always commits an IngestRun row, even on
     failure, so /api/health has something honest to report.
@@ -305,22 +953,62 @@ def run_ingest() -> IngestRun:
     db.session.add(run)
     db.session.commit()
 
+    previous: LiveSnapshot | None = None
     try:
+        if current_app.config["HEADWAY_ANALYTICS_ENABLED"]:
+            # What the live tables held before this cycle, to infer arrivals from
+            previous = live_state.current_snapshot()
         known_stop_ids = {row[0] for row in db.session.query(Station.stop_id).all()}
         child_to_parent = _load_child_to_parent_map()
-        trips = _fetch_live_trips()
-
-        run.vehicle_count = _ingest_vehicles(trips, child_to_parent, known_stop_ids)
-        run.new_segment_count = _ingest_route_segments(trips, child_to_parent, known_stop_ids)
-        _ingest_arrivals(trips, child_to_parent, known_stop_ids)
-        run.alert_count = _ingest_alerts()
+        with metrics.stage("fetch"):
+            feed = _fetch_live_records(child_to_parent, known_stop_ids, time.time())
+
+        with metrics.stage("vehicles"):
+            vehicles = _write_vehicles(feed.vehicles)
+        run.vehicle_count = vehicles.total
+        run.vehicles_inserted = vehicles.inserted
+        run.vehicles_updated = vehicles.updated
+        run.vehicles_deleted = vehicles.deleted
+        with metrics.stage("segments"):
+            run.new_segment_count = _write_route_segments(feed.segments)
+        with metrics.stage("arrivals"):
+            arrival_count = _write_arrivals(feed.arrivals)
+        # One commit for the whole live picture; the alerts feed is fetched
+        # afterwards so no write transaction is held open across a request
+        with metrics.stage("commit"):
+            db.session.commit()
+        metrics.record_rows(
+            "vehicle_snapshots", insert=vehicles.inserted, update=vehicles.updated, delete=vehicles.deleted
+        )
+        metrics.record_rows("route_segments", insert=run.new_segment_count)
+        metrics.record_rows("stop_arrivals", insert=arrival_count)
+        with metrics.stage("alerts"):
+            alerts = _ingest_alerts(run.id)
+        run.alert_count = alerts.total
+        metrics.record_rows("service_alerts", upsert=alerts.written, touch=alerts.touched, delete=alerts.expired)
         run.status = "success"
     except Exception as exc:  # pragma: no cover - exercised via integration, not unit tests
         logger.exception("Ingest run failed")
+        db.session.rollback()  # none of this cycle's live writes land
         run.status = "error"
         run.error_message = str(exc)
     finally:
         run.finished_at = datetime.utcnow()
         db.session.commit()
+        metrics.registry().ingest_runs.inc(run.status)
+
+    if run.status == "success":
+        with metrics.stage("publish"):
+            snapshot = live_state.publish_from_db(run.id)
+            history.record(snapshot)
+            if previous is not None:
+                _record_headways(previous, snapshot)
+            if run.new_segment_count:
+                refresh_segment_derived_state()
+        if current_app.config["ARRIVALS_GC_IN_BACKGROUND"]:
+            _collect_arrival_generations_in_background()
+        else:
+            with metrics.stage("gc"):
+                collect_arrival_generations()
 
     return run
@@ -1,3 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+from app.database import Session
+
+db = SQLAlchemy(session_options={"class_": Session})
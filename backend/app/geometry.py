@@ -0,0 +1,146 @@
+"""
+Flat-earth geometry helpers for placing stations along route polylines.
+
+Both projections return the cumulative arc-length parameter in [0..1] of
+the point on the polyline nearest to a given lat/lon, using a local
+equirectangular approximation around NYC (plenty accurate at city scale).
+`project_point_onto_polyline` is the straightforward per-segment loop, kept
+as the reference implementation; `project_points_onto_polyline` does the
+same computation for many points against every segment at once in NumPy,
+which is what the API uses.
+
+Also here: the packed binary form route shapes are stored in, and the
+Douglas-Peucker simplification behind the lower-detail shape levels.
+"""
+
+import math
+from typing import Sequence
+
+import numpy as np
+
+NYC_LATITUDE = 40.7
+METERS_PER_DEG_LAT = 111_000.0
+METERS_PER_DEG_LON = 111_000.0 * math.cos(math.radians(NYC_LATITUDE))
+
+# Bounds the (points x segments) intermediate arrays to a few MB each
+_CHUNK_CELLS = 250_000
+
+
+def project_point_onto_polyline(lat: float, lon: float, points: Sequence[Sequence[float]]) -> float:
+    """Return cumulative arc-length parameter [0..1] of the nearest point
+    on the polyline to (lat, lon), using a flat-earth approximation at NYC.
+    """
+    px, py = lon * METERS_PER_DEG_LON, lat * METERS_PER_DEG_LAT
+    cum = 0.0
+    best_t = 0.0
+    best_d = float("inf")
+    for i in range(len(points) - 1):
+        ax, ay = points[i][1] * METERS_PER_DEG_LON, points[i][0] * METERS_PER_DEG_LAT
+        bx, by = points[i + 1][1] * METERS_PER_DEG_LON, points[i + 1][0] * METERS_PER_DEG_LAT
+        seg = math.hypot(bx - ax, by - ay)
+        if seg < 1e-6:
+            continue
+        t = max(0.0, min(1.0, ((px - ax) * (bx - ax) + (py - ay) * (by - ay)) / seg**2))
+        d = math.hypot(px - (ax + t * (bx - ax)), py - (ay + t * (by - ay)))
+        if d < best_d:
+            best_d = d
+            best_t = cum + t * seg
+        cum += seg
+    return best_t / cum if cum > 0 else 0.0
+
+
+def project_points_onto_polyline(latlons: np.ndarray, polyline: np.ndarray) -> np.ndarray:
+    """Batched `project_point_onto_polyline`: project every (lat, lon) row
+    of `latlons` (shape (N, 2)) onto `polyline` (shape (M, 2)) in one
+    vectorized pass and return the N arc-length parameters.
+    """
+    latlons = np.asarray(latlons, dtype=np.float64).reshape(-1, 2)
+    polyline = np.asarray(polyline, dtype=np.float64).reshape(-1, 2)
+    if len(latlons) == 0:
+        return np.empty(0)
+
+    xy = polyline[:, ::-1] * (METERS_PER_DEG_LON, METERS_PER_DEG_LAT)
+    a, b = xy[:-1], xy[1:]
+    ab = b - a
+    seg = np.hypot(ab[:, 0], ab[:, 1])
+    keep = seg >= 1e-6  # zero-length segments contribute nothing
+    a, ab, seg = a[keep], ab[keep], seg[keep]
+    total = seg.sum()
+    if len(seg) == 0 or total <= 0:
+        return np.zeros(len(latlons))
+    cum_before = np.concatenate(([0.0], np.cumsum(seg)[:-1]))
+
+    p = latlons[:, ::-1] * (METERS_PER_DEG_LON, METERS_PER_DEG_LAT)
+    out = np.empty(len(p))
+    rows_per_chunk = max(1, _CHUNK_CELLS // len(seg))
+    for start in range(0, len(p), rows_per_chunk):
+        chunk = p[start:start + rows_per_chunk, None, :]  # (n, 1, 2) against (S, 2)
+        ap = chunk - a
+        t = np.clip((ap * ab).sum(axis=2) / seg**2, 0.0, 1.0)
+        closest = ap - t[..., None] * ab
+        dist = np.hypot(closest[..., 0], closest[..., 1])
+        best = dist.argmin(axis=1)  # first minimum, same tie-break as the loop
+        rows = np.arange(len(best))
+        out[start:start + len(best)] = cum_before[best] + t[rows, best] * seg[best]
+    out /= total
+    return out
+
+
+# Route shapes are stored as little-endian int32 pairs of micro-degrees:
+# 8 bytes a point, exact to the 6 decimals GTFS publishes.
+_PACKED_DTYPE = np.dtype("<i4")
+_MICRODEGREES = 1_000_000
+
+# Douglas-Peucker tolerances, in metres, of the precomputed shape levels
+SIMPLIFY_TOLERANCES_M = (5, 20, 80)
+
+
+def metres_per_pixel(zoom: float) -> float:
+    """Ground resolution of a 256 px web-mercator tile at NYC's latitude."""
+    return 156543.03392 * math.cos(math.radians(NYC_LATITUDE)) / 2**zoom
+
+
+def pack_points(points: np.ndarray) -> bytes:
+    """(N, 2) [lat, lon] array -> packed bytes (see `unpack_points`)."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return np.round(points * _MICRODEGREES).astype(_PACKED_DTYPE).tobytes()
+
+
+def unpack_points(blob: bytes) -> np.ndarray:
+    """Packed bytes -> (N, 2) float64 [lat, lon] array. No parsing involved."""
+    return np.frombuffer(blob, dtype=_PACKED_DTYPE).reshape(-1, 2) / _MICRODEGREES
+
+
+def simplify_polyline(points: np.ndarray, tolerance_m: float) -> np.ndarray:
+    """Douglas-Peucker: drop vertices of an (N, 2) [lat, lon] polyline while
+    keeping every original vertex within `tolerance_m` metres of the result.
+    Endpoints are always kept. Iterative, with each split's distances
+    computed in one NumPy pass.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    n = len(points)
+    if n <= 2:
+        return points
+    xy = points[:, ::-1] * (METERS_PER_DEG_LON, METERS_PER_DEG_LAT)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        a, ab = xy[first], xy[last] - xy[first]
+        inner = xy[first + 1:last] - a
+        length_sq = float(ab @ ab)
+        if length_sq > 0:
+            t = np.clip((inner @ ab) / length_sq, 0.0, 1.0)
+            inner = inner - t[:, None] * ab
+        dist = np.hypot(inner[:, 0], inner[:, 1])
+        worst = int(dist.argmax())
+        if dist[worst] > tolerance_m:
+            split = first + 1 + worst
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
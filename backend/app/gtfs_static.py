@@ -0,0 +1,275 @@
+"""
+One loader for the bundled static GTFS files (stops.txt, trips.txt and,
+when present, shapes.txt).
+
+Every consumer -- station seeding, shape seeding, the child -> parent stop
+map used by the ingest, and the shape -> direction map behind
+/routes/<id>/stops -- used to re-read these with `csv.DictReader`, building
+a dict per row, on every process start. Here each file is parsed once,
+with a plain `csv.reader` and header positions, into compact `__slots__`
+records (shape points go straight into one NumPy array per shape). Only
+what the app actually uses is kept: trips.txt's 20k rows collapse to one
+record per shape.
+
+The parsed result is saved to GTFS_CACHE_DIR as plain column arrays in an
+.npz file, under a key derived from the files' SHA-256, so later starts --
+including every extra web worker -- skip CSV parsing entirely. Editing any
+file changes the key; a missing, stale or unreadable cache just means one
+parse and a rewrite. The default directory is under the shared system tmp,
+so the cache is loaded with `allow_pickle=False`: a planted file can at
+worst fail to load or describe wrong stops, never run code.
+"""
+
+import csv
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+import numpy as np
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+_FILES = ("stops.txt", "trips.txt", "shapes.txt")
+# Bump when the cached arrays change shape
+_FORMAT_VERSION = 2
+
+
+class StopRecord:
+    __slots__ = ("stop_id", "name", "lat", "lon", "location_type", "parent_station")
+
+    def __init__(
+        self, stop_id: str, name: str, lat: float, lon: float, location_type: str, parent_station: str
+    ) -> None:
+        self.stop_id = stop_id
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+        self.location_type = location_type
+        self.parent_station = parent_station
+
+
+class ShapeRecord:
+    """What trips.txt says about a shape (taken from its first trip)."""
+
+    __slots__ = ("shape_id", "route_id", "direction_id", "headsign")
+
+    def __init__(self, shape_id: str, route_id: str, direction_id: int, headsign: str) -> None:
+        self.shape_id = shape_id
+        self.route_id = route_id
+        self.direction_id = direction_id
+        self.headsign = headsign
+
+
+class StaticGtfs:
+    """Parsed static GTFS. `shape_points` maps shape_id to an (N, 2) float
+    array of [lat, lon] in shape_pt_sequence order; it's empty without
+    shapes.txt.
+    """
+
+    __slots__ = ("stops", "shapes", "shape_points", "child_to_parent")
+
+    def __init__(
+        self, stops: list[StopRecord], shapes: dict[str, ShapeRecord], shape_points: dict[str, np.ndarray]
+    ) -> None:
+        self.stops = stops
+        self.shapes = shapes
+        self.shape_points = shape_points
+        self.child_to_parent = {s.stop_id: s.parent_station for s in stops if s.parent_station}
+
+    def parent_stations(self) -> Iterator[StopRecord]:
+        return (s for s in self.stops if s.location_type == "1")
+
+
+@contextmanager
+def _csv(path: str) -> Iterator[tuple[dict[str, int], Iterator[list[str]]]]:
+    """Header positions plus a streaming row reader (lists, not dicts)."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = {name.strip(): i for i, name in enumerate(next(reader, []))}
+        yield header, reader
+
+
+def _parse_stops(path: str) -> list[StopRecord]:
+    with _csv(path) as (col, rows):
+        i_id, i_name, i_lat, i_lon = col["stop_id"], col["stop_name"], col["stop_lat"], col["stop_lon"]
+        i_type, i_parent = col.get("location_type"), col.get("parent_station")
+        return [
+            StopRecord(
+                row[i_id],
+                row[i_name],
+                float(row[i_lat]),
+                float(row[i_lon]),
+                row[i_type] if i_type is not None else "",
+                row[i_parent].strip() if i_parent is not None else "",
+            )
+            for row in rows
+        ]
+
+
+def _parse_trips(path: str) -> dict[str, ShapeRecord]:
+    shapes: dict[str, ShapeRecord] = {}
+    with _csv(path) as (col, rows):
+        i_shape, i_route = col.get("shape_id"), col["route_id"]
+        i_dir, i_headsign = col.get("direction_id"), col.get("trip_headsign")
+        if i_shape is None:
+            return shapes
+        for row in rows:
+            shape_id = row[i_shape].strip()
+            if not shape_id or shape_id in shapes:
+                continue
+            try:
+                direction = int(row[i_dir]) if i_dir is not None else 0
+            except ValueError:
+                direction = 0
+            headsign = row[i_headsign].strip() if i_headsign is not None else ""
+            shapes[shape_id] = ShapeRecord(shape_id, row[i_route].strip(), direction, headsign)
+    return shapes
+
+
+def _parse_shapes(path: str) -> dict[str, np.ndarray]:
+    if not os.path.exists(path):
+        return {}
+    raw: dict[str, list[tuple[int, float, float]]] = {}
+    with _csv(path) as (col, rows):
+        i_shape, i_seq = col["shape_id"], col["shape_pt_sequence"]
+        i_lat, i_lon = col["shape_pt_lat"], col["shape_pt_lon"]
+        for row in rows:
+            raw.setdefault(row[i_shape].strip(), []).append(
+                (int(row[i_seq]), float(row[i_lat]), float(row[i_lon]))
+            )
+    points = {}
+    for shape_id, pts in raw.items():
+        pts.sort(key=lambda p: p[0])
+        points[shape_id] = np.array([(lat, lon) for _, lat, lon in pts], dtype=np.float64)
+    return points
+
+
+def parse(data_dir: str = DATA_DIR) -> StaticGtfs:
+    """Parse the CSVs in `data_dir` (no cache involved)."""
+    return StaticGtfs(
+        _parse_stops(os.path.join(data_dir, "stops.txt")),
+        _parse_trips(os.path.join(data_dir, "trips.txt")),
+        _parse_shapes(os.path.join(data_dir, "shapes.txt")),
+    )
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def input_digest(*names: str, data_dir: str = DATA_DIR) -> str:
+    """SHA-256 over the named static files' names and contents; a missing
+    file contributes only its absence, so adding or removing it counts as
+    a change too.
+    """
+    digest = hashlib.sha256()
+    for name in names:
+        path = os.path.join(data_dir, name)
+        digest.update(f"{name}:{_file_sha256(path) if os.path.exists(path) else '-'}\n".encode())
+    return digest.hexdigest()
+
+
+def files_digest(data_dir: str = DATA_DIR) -> str:
+    """Key for the parsed-data cache: every input file plus the cache format."""
+    return hashlib.sha256(f"v{_FORMAT_VERSION}:{input_digest(*_FILES, data_dir=data_dir)}".encode()).hexdigest()
+
+
+def default_cache_dir() -> str:
+    if has_app_context() and current_app.config.get("GTFS_CACHE_DIR"):
+        configured: str = current_app.config["GTFS_CACHE_DIR"]
+        return configured
+    return os.environ.get("GTFS_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "nyc-transit-hub-gtfs")
+
+
+def _to_arrays(gtfs: StaticGtfs) -> dict[str, np.ndarray]:
+    """Column arrays for the cache: plain strings and numbers only."""
+    shape_ids = list(gtfs.shape_points)
+    points = [gtfs.shape_points[shape_id] for shape_id in shape_ids]
+    return {
+        "stop_id": np.array([s.stop_id for s in gtfs.stops], dtype=str),
+        "stop_name": np.array([s.name for s in gtfs.stops], dtype=str),
+        "stop_lat": np.array([s.lat for s in gtfs.stops], dtype=np.float64),
+        "stop_lon": np.array([s.lon for s in gtfs.stops], dtype=np.float64),
+        "location_type": np.array([s.location_type for s in gtfs.stops], dtype=str),
+        "parent_station": np.array([s.parent_station for s in gtfs.stops], dtype=str),
+        "shape_id": np.array([r.shape_id for r in gtfs.shapes.values()], dtype=str),
+        "route_id": np.array([r.route_id for r in gtfs.shapes.values()], dtype=str),
+        "direction_id": np.array([r.direction_id for r in gtfs.shapes.values()], dtype=np.int64),
+        "headsign": np.array([r.headsign for r in gtfs.shapes.values()], dtype=str),
+        "points_shape_id": np.array(shape_ids, dtype=str),
+        "points_count": np.array([len(p) for p in points], dtype=np.int64),
+        "points": np.concatenate(points) if points else np.empty((0, 2), dtype=np.float64),
+    }
+
+
+def _from_arrays(arrays: dict[str, np.ndarray]) -> StaticGtfs:
+    stops = [
+        StopRecord(str(stop_id), str(name), float(lat), float(lon), str(location_type), str(parent))
+        for stop_id, name, lat, lon, location_type, parent in zip(
+            arrays["stop_id"], arrays["stop_name"], arrays["stop_lat"].tolist(), arrays["stop_lon"].tolist(),
+            arrays["location_type"], arrays["parent_station"],
+        )
+    ]
+    shapes = {
+        str(shape_id): ShapeRecord(str(shape_id), str(route_id), int(direction_id), str(headsign))
+        for shape_id, route_id, direction_id, headsign in zip(
+            arrays["shape_id"], arrays["route_id"], arrays["direction_id"].tolist(), arrays["headsign"]
+        )
+    }
+    bounds = np.cumsum(arrays["points_count"])[:-1]
+    shape_points = {
+        str(shape_id): points
+        for shape_id, points in zip(arrays["points_shape_id"], np.split(arrays["points"], bounds))
+    }
+    return StaticGtfs(stops, shapes, shape_points)
+
+
+def load_cached(data_dir: str = DATA_DIR, cache_dir: str | None = None) -> StaticGtfs:
+    """Load from the array cache if it matches the files, otherwise parse
+    and (best effort) write the cache for next time.
+    """
+    cache_dir = cache_dir or default_cache_dir()
+    cache_path = os.path.join(cache_dir, f"static-{files_digest(data_dir)[:24]}.npz")
+    try:
+        with np.load(cache_path, allow_pickle=False) as cached:
+            return _from_arrays({name: cached[name] for name in cached.files})
+    except FileNotFoundError:
+        pass
+    except Exception:
+        logger.warning("Unreadable static GTFS cache %s, re-parsing", cache_path, exc_info=True)
+
+    gtfs = parse(data_dir)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, allow_pickle=False, **_to_arrays(gtfs))
+        os.replace(tmp, cache_path)
+    except OSError:
+        logger.warning("Could not write static GTFS cache to %s", cache_dir, exc_info=True)
+    return gtfs
+
+
+_loaded: dict[str, StaticGtfs] = {}
+_load_lock = threading.Lock()
+
+
+def static_gtfs(data_dir: str = DATA_DIR) -> StaticGtfs:
+    """The parsed static GTFS for this process, loaded on first use."""
+    gtfs = _loaded.get(data_dir)
+    if gtfs is None:
+        with _load_lock:
+            gtfs = _loaded.get(data_dir)
+            if gtfs is None:
+                gtfs = _loaded[data_dir] = load_cached(data_dir)
+    return gtfs
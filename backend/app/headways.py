@@ -0,0 +1,265 @@
+"""
+Observed headways, gaps and bunching per route, direction and station.
+
+The feeds only carry *predictions*; nothing says when a train actually got
+somewhere. After each ingest, the previous and new LiveSnapshots are
+compared to infer those moments:
+
+  * a trip now STOPPED_AT a station it wasn't stopped at last cycle
+    arrived there (at its feed timestamp, or the cycle time), and
+  * a trip whose current stop moved on from one it was never seen stopped
+    at passed it between cycles -- at last cycle's predicted arrival for
+    that stop, clamped into the interval between the two cycles.
+
+Each inferred arrival is stored in `observed_arrivals` together with its
+headway (the time since the previous train of the same route and direction
+at that station, tracked in `headway_state`). Headways are also folded into
+hourly `headway_buckets` counters -- count, sum, sum of squares, bunched and
+gap tallies -- so the stats endpoints answer any rolling window by summing
+a few buckets instead of rescanning history.
+"""
+
+import math
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from flask import current_app
+
+from app.extensions import db
+from app.live_state import LiveSnapshot
+from app.models import HeadwayBucket, HeadwayState, ObservedArrival
+
+_STOPPED = "STOPPED_AT"
+
+
+@dataclass(frozen=True)
+class ObservedStop:
+    trip_id: str
+    route_id: str
+    direction: str
+    stop_id: str
+    arrived_at: datetime
+
+
+def _utc(ts: int) -> datetime:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).replace(tzinfo=None)
+
+
+def _predicted_arrival(snapshot: LiveSnapshot, trip_id: str, stop_id: str) -> datetime | None:
+    for row in snapshot.arrivals_by_stop.get(stop_id, ()):
+        if row["trip_id"] == trip_id:
+            return _utc(row["arrival_time"])
+    return None
+
+
+def infer_arrivals(previous: LiveSnapshot, current: LiveSnapshot) -> list[ObservedStop]:
+    """Arrivals that happened between two consecutive snapshots, oldest first."""
+    before = {v["trip_id"]: v for v in previous.vehicles}
+    found = []
+    for vehicle in current.vehicles:
+        prev = before.get(vehicle["trip_id"])
+        stop_id = vehicle["stop_id"]
+        stopped_before = prev is not None and prev["location_status"] == _STOPPED
+
+        if prev is not None and prev["stop_id"] and prev["stop_id"] != stop_id and not stopped_before:
+            # Moved past a stop without ever being seen stopped there
+            passed_at = _predicted_arrival(previous, vehicle["trip_id"], prev["stop_id"])
+            if passed_at is None:
+                passed_at = previous.built_at + (current.built_at - previous.built_at) / 2
+            passed_at = min(max(passed_at, previous.built_at), current.built_at)
+            found.append(
+                ObservedStop(vehicle["trip_id"], vehicle["route_id"], vehicle.get("direction") or "",
+                             prev["stop_id"], passed_at)
+            )
+
+        if (
+            stop_id
+            and vehicle["location_status"] == _STOPPED
+            and not (stopped_before and prev is not None and prev["stop_id"] == stop_id)
+        ):
+            arrived_at = current.built_at
+            if vehicle.get("last_position_update"):
+                arrived_at = min(datetime.fromisoformat(vehicle["last_position_update"]), current.built_at)
+            found.append(
+                ObservedStop(vehicle["trip_id"], vehicle["route_id"], vehicle.get("direction") or "",
+                             stop_id, arrived_at)
+            )
+
+    found.sort(key=lambda a: a.arrived_at)
+    return found
+
+
+def _bucket_start(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def record_arrivals(arrivals: list[ObservedStop]) -> int:
+    """Persist observed arrivals and fold their headways into the hourly
+    buckets, in one transaction. One prefetch each for the affected
+    headway_state and headway_buckets rows. Returns how many headways were
+    counted.
+    """
+    if not arrivals:
+        return 0
+    config = current_app.config
+    bunched_below = config["HEADWAY_BUNCHING_SECONDS"]
+    gap_above = config["HEADWAY_GAP_SECONDS"]
+    service_break = config["HEADWAY_MAX_SECONDS"]
+
+    route_ids = {a.route_id for a in arrivals}
+    stop_ids = {a.stop_id for a in arrivals}
+    states = {
+        (s.route_id, s.direction, s.stop_id): s
+        for s in HeadwayState.query.filter(HeadwayState.route_id.in_(route_ids), HeadwayState.stop_id.in_(stop_ids))
+    }
+    hours = {_bucket_start(a.arrived_at) for a in arrivals}
+    buckets = {
+        (b.route_id, b.direction, b.stop_id, b.bucket_start): b
+        for b in HeadwayBucket.query.filter(
+            HeadwayBucket.bucket_start.in_(hours), HeadwayBucket.stop_id.in_(stop_ids)
+        )
+    }
+
+    rows = []
+    counted = 0
+    for arrival in arrivals:
+        key = (arrival.route_id, arrival.direction, arrival.stop_id)
+        state = states.get(key)
+        headway = None
+        if state is None:
+            state = states[key] = HeadwayState(
+                route_id=arrival.route_id, direction=arrival.direction, stop_id=arrival.stop_id,
+                last_trip_id=arrival.trip_id, last_arrived_at=arrival.arrived_at,
+            )
+            db.session.add(state)
+        elif arrival.trip_id == state.last_trip_id or arrival.arrived_at <= state.last_arrived_at:
+            continue  # the same train seen again, or a late inference already superseded
+        else:
+            seconds = (arrival.arrived_at - state.last_arrived_at).total_seconds()
+            if seconds <= service_break:  # longer than that is a service break, not a headway
+                headway = int(seconds)
+            state.last_trip_id = arrival.trip_id
+            state.last_arrived_at = arrival.arrived_at
+
+        rows.append(
+            {
+                "trip_id": arrival.trip_id,
+                "route_id": arrival.route_id,
+                "direction": arrival.direction,
+                "stop_id": arrival.stop_id,
+                "arrived_at": arrival.arrived_at,
+                "headway_s": headway,
+            }
+        )
+        if headway is None:
+            continue
+
+        bucket_key = (*key, _bucket_start(arrival.arrived_at))
+        bucket = buckets.get(bucket_key)
+        if bucket is None:
+            bucket = buckets[bucket_key] = HeadwayBucket(
+                route_id=arrival.route_id, direction=arrival.direction, stop_id=arrival.stop_id,
+                bucket_start=bucket_key[3], count=0, sum_s=0.0, sumsq_s=0.0, bunched=0, gaps=0,
+            )
+            db.session.add(bucket)
+        bucket.count += 1
+        bucket.sum_s += headway
+        bucket.sumsq_s += float(headway) ** 2
+        bucket.bunched += headway < bunched_below
+        bucket.gaps += headway > gap_above
+        counted += 1
+
+    db.session.bulk_insert_mappings(ObservedArrival, rows)
+    db.session.commit()
+    return counted
+
+
+def record_cycle(previous: LiveSnapshot, current: LiveSnapshot) -> int:
+    """Infer and record the arrivals between two published snapshots."""
+    return record_arrivals(infer_arrivals(previous, current))
+
+
+def purge(before: datetime) -> int:
+    """Delete observations and buckets older than `before`."""
+    deleted: int = ObservedArrival.query.filter(ObservedArrival.arrived_at < before).delete(synchronize_session=False)
+    HeadwayBucket.query.filter(HeadwayBucket.bucket_start < _bucket_start(before)).delete(synchronize_session=False)
+    HeadwayState.query.filter(HeadwayState.last_arrived_at < before).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def _summarize(count: int, total: float, total_sq: float, bunched: int, gaps: int) -> dict[str, Any]:
+    mean = total / count
+    stdev = math.sqrt(max(0.0, total_sq / count - mean * mean))
+    return {
+        "headways": count,
+        "mean_headway_s": round(mean, 1),
+        "stdev_headway_s": round(stdev, 1),
+        "cv": round(stdev / mean, 3) if mean else None,  # headway regularity; ~0 is perfectly even
+        "bunched": bunched,
+        "gaps": gaps,
+        "bunching_rate": round(bunched / count, 3),
+    }
+
+
+def _window_rows(hours: int, route_id: str | None, direction: str | None, stop_id: str | None) -> list[Any]:
+    since = _bucket_start(datetime.utcnow()) - timedelta(hours=hours - 1)
+    query = db.session.query(
+        HeadwayBucket.route_id,
+        HeadwayBucket.direction,
+        HeadwayBucket.stop_id,
+        db.func.sum(HeadwayBucket.count),
+        db.func.sum(HeadwayBucket.sum_s),
+        db.func.sum(HeadwayBucket.sumsq_s),
+        db.func.sum(HeadwayBucket.bunched),
+        db.func.sum(HeadwayBucket.gaps),
+    ).filter(HeadwayBucket.bucket_start >= since)
+    if route_id:
+        query = query.filter(HeadwayBucket.route_id == route_id)
+    if direction:
+        query = query.filter(HeadwayBucket.direction == direction)
+    if stop_id:
+        query = query.filter(HeadwayBucket.stop_id == stop_id)
+    rows: list[Any] = query.group_by(HeadwayBucket.route_id, HeadwayBucket.direction, HeadwayBucket.stop_id).all()
+    return rows
+
+
+def headway_stats(
+    hours: int, route_id: str | None = None, direction: str | None = None, stop_id: str | None = None
+) -> list[dict[str, Any]]:
+    """Per (route, direction, station) headway stats over the last `hours`
+    hourly buckets (the current, partial hour included).
+    """
+    stats = [
+        {"route_id": route, "direction": dir_, "stop_id": stop, **_summarize(*totals)}
+        for route, dir_, stop, *totals in _window_rows(hours, route_id, direction, stop_id)
+    ]
+    stats.sort(key=lambda s: (s["route_id"], s["direction"], s["stop_id"]))
+    return stats
+
+
+def bunching_summary(hours: int, route_id: str | None = None, worst: int = 5) -> list[dict[str, Any]]:
+    """Per (route, direction) totals over the window, worst-bunched first,
+    each with the `worst` stations with the most bunched arrivals.
+    """
+    grouped: dict[tuple[str, str], list[Any]] = {}
+    for route, dir_, stop, *totals in _window_rows(hours, route_id, None, None):
+        grouped.setdefault((route, dir_), []).append((stop, totals))
+
+    summary = []
+    for (route, dir_), stations in grouped.items():
+        totals = [sum(t[i] for _, t in stations) for i in range(5)]
+        hot = sorted((s for s in stations if s[1][3]), key=lambda s: s[1][3], reverse=True)[:worst]
+        summary.append(
+            {
+                "route_id": route,
+                "direction": dir_,
+                **_summarize(*totals),
+                "worst_stations": [
+                    {"stop_id": stop, "bunched": t[3], "headways": t[0]} for stop, t in hot
+                ],
+            }
+        )
+    summary.sort(key=lambda s: (s["bunching_rate"], s["bunched"]), reverse=True)
+    return summary
@@ -0,0 +1,248 @@
+"""
+Opt-in, append-only history of vehicle positions.
+
+`vehicle_snapshots` only ever holds the current cycle, so nothing about
+where trains *were* survives. When `HISTORY_DIR` is set, every successful
+ingest appends that cycle's positions to a compact on-disk store instead
+of a row-per-vehicle table (which would be millions of rows a week at 30 s
+cycles).
+
+Layout: one partition per UTC hour, as two files --
+
+    2025032812.bin         fixed-width little-endian records, appended
+    2025032812.dict.json   per-partition dictionaries for the string columns
+
+Each record is 10 bytes: observation time (uint32 epoch seconds) plus
+dictionary codes for trip, route, stop and status. Partitions are
+self-contained, so retention is just deleting old files, and a range query
+only opens the hours it overlaps and filters them with NumPy. The
+dictionary is always written before the records that use it, so a reader
+racing an append never sees a code it can't decode.
+
+Only the ingesting process writes, so when ingestion runs separately (the
+standalone worker in docker-compose.yml), HISTORY_DIR must be a directory
+the web processes share with it -- a common volume, not each container's
+own disk.
+"""
+
+import calendar
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable
+
+import numpy as np
+from flask import Flask, current_app
+
+from app.live_state import LiveSnapshot
+
+logger = logging.getLogger(__name__)
+
+_EXTENSION_KEY = "history"
+
+RECORD_DTYPE = np.dtype(
+    [("ts", "<u4"), ("trip", "<u2"), ("route", "<u1"), ("stop", "<u2"), ("status", "<u1")]
+)
+_COLUMNS = ("trip", "route", "stop", "status")
+_CODE_LIMITS = {name: np.iinfo(RECORD_DTYPE[name]).max for name in _COLUMNS}
+
+
+def _epoch(dt: datetime) -> int:
+    """Seconds since the epoch for a naive-UTC (or aware) datetime."""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc)
+    return calendar.timegm(dt.utctimetuple())
+
+
+def _partition_name(hour: int) -> str:
+    return datetime.fromtimestamp(hour * 3600, tz=timezone.utc).strftime("%Y%m%d%H")
+
+
+class _Partition:
+    """The hour currently being appended to, with its dictionaries in memory."""
+
+    def __init__(self, root: str, hour: int) -> None:
+        self.hour = hour
+        self.data_path = os.path.join(root, f"{_partition_name(hour)}.bin")
+        self.dict_path = os.path.join(root, f"{_partition_name(hour)}.dict.json")
+        self.values: dict[str, list[str]] = {name: [] for name in _COLUMNS}
+        if os.path.exists(self.dict_path):  # restarted mid-hour
+            with open(self.dict_path, encoding="utf-8") as f:
+                self.values.update(json.load(f))
+        self.codes = {name: {v: i for i, v in enumerate(vals)} for name, vals in self.values.items()}
+
+    def encode(self, column: str, value: str | None) -> tuple[int, bool]:
+        """Return (code, is_new) for `value`, adding it to the dictionary."""
+        value = value or ""
+        codes = self.codes[column]
+        code = codes.get(value)
+        if code is not None:
+            return code, False
+        code = len(self.values[column])
+        if code > _CODE_LIMITS[column]:
+            raise ValueError(f"history partition {self.data_path} has too many distinct {column} values")
+        codes[value] = code
+        self.values[column].append(value)
+        return code, True
+
+    def write_dictionary(self) -> None:
+        tmp = self.dict_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.values, f, separators=(",", ":"))
+        os.replace(tmp, self.dict_path)
+
+
+class HistoryStore:
+    """Hourly-partitioned position history rooted at `root`. One writer
+    (the ingest job) appends; any number of request threads may read.
+    """
+
+    def __init__(self, root: str, retention_hours: int = 0) -> None:
+        self.root = root
+        self.retention_hours = retention_hours
+        os.makedirs(root, exist_ok=True)
+        self._partition: _Partition | None = None
+        self._lock = threading.Lock()
+
+    def append(self, observed_at: datetime, vehicles: Iterable[dict[str, Any]]) -> int:
+        """Append one cycle's positions, all stamped `observed_at`. Returns
+        the number of records written.
+        """
+        ts = _epoch(observed_at)
+        hour = ts // 3600
+        with self._lock:
+            partition = self._partition
+            if partition is None or partition.hour != hour:
+                partition = self._partition = _Partition(self.root, hour)
+                self.prune(hour)
+
+            rows = []
+            dictionary_changed = False
+            for v in vehicles:
+                row = [ts]
+                for column, key in (("trip", "trip_id"), ("route", "route_id"), ("stop", "stop_id"),
+                                    ("status", "location_status")):
+                    code, is_new = partition.encode(column, v[key])
+                    row.append(code)
+                    dictionary_changed |= is_new
+                rows.append(tuple(row))
+            if not rows:
+                return 0
+
+            if dictionary_changed:
+                partition.write_dictionary()
+            with open(partition.data_path, "ab") as f:
+                f.write(np.array(rows, dtype=RECORD_DTYPE).tobytes())
+            return len(rows)
+
+    def prune(self, current_hour: int) -> int:
+        """Delete partitions older than the retention window. Returns how
+        many partitions were removed.
+        """
+        if self.retention_hours <= 0:
+            return 0
+        cutoff = _partition_name(current_hour - self.retention_hours)
+        removed = 0
+        for name in os.listdir(self.root):
+            stem = name.split(".", 1)[0]
+            if len(stem) == 10 and stem.isdigit() and stem < cutoff:
+                os.remove(os.path.join(self.root, name))
+                removed += name.endswith(".bin")
+        return removed
+
+    def has_partitions(self) -> bool:
+        """Whether any cycle has been recorded under `root` yet. A web
+        process that doesn't ingest only sees what the ingest process wrote,
+        so this stays False if the two don't share the directory.
+        """
+        return any(name.endswith(".bin") for name in os.listdir(self.root))
+
+    def _read_partition(self, hour: int) -> tuple[np.ndarray, dict[str, list[str]]] | None:
+        name = _partition_name(hour)
+        data_path = os.path.join(self.root, f"{name}.bin")
+        try:
+            # Records first, then the dictionary: every code in what we read
+            # is guaranteed to be in the (same or newer) dictionary.
+            with open(data_path, "rb") as f:
+                raw = f.read()
+            with open(os.path.join(self.root, f"{name}.dict.json"), encoding="utf-8") as f:
+                values = json.load(f)
+        except FileNotFoundError:
+            return None
+        usable = len(raw) - len(raw) % RECORD_DTYPE.itemsize  # ignore a torn trailing record
+        return np.frombuffer(raw[:usable], dtype=RECORD_DTYPE), values
+
+    def positions(
+        self,
+        start: datetime,
+        end: datetime,
+        route_id: str | None = None,
+        trip_id: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """Positions observed in [start, end), optionally for one route
+        and/or trip, in time order.
+        """
+        start_ts, end_ts = _epoch(start), _epoch(end)
+        out: list[dict[str, Any]] = []
+        for hour in range(start_ts // 3600, (end_ts - 1) // 3600 + 1):
+            loaded = self._read_partition(hour)
+            if loaded is None:
+                continue
+            records, values = loaded
+
+            mask = (records["ts"] >= start_ts) & (records["ts"] < end_ts)
+            for column, wanted in (("route", route_id), ("trip", trip_id)):
+                if wanted is None:
+                    continue
+                try:
+                    mask &= records[column] == values[column].index(wanted)
+                except ValueError:  # never seen in this hour
+                    mask[:] = False
+            matched = records[mask]
+
+            trips, routes, stops, statuses = (values[c] for c in _COLUMNS)
+            for ts, trip, route, stop, status in matched.tolist():
+                out.append(
+                    {
+                        "observed_at": datetime.fromtimestamp(ts, tz=timezone.utc)
+                        .replace(tzinfo=None)
+                        .isoformat(),
+                        "trip_id": trips[trip],
+                        "route_id": routes[route],
+                        "stop_id": stops[stop] or None,
+                        "location_status": statuses[status] or None,
+                    }
+                )
+        return out
+
+
+def init_app(app: Flask) -> None:
+    """Register a HistoryStore if HISTORY_DIR is configured; otherwise
+    history stays off and record() is a no-op.
+    """
+    root = app.config.get("HISTORY_DIR")
+    if root:
+        app.extensions[_EXTENSION_KEY] = HistoryStore(root, app.config.get("HISTORY_RETENTION_HOURS", 0))
+
+
+def store() -> HistoryStore | None:
+    return current_app.extensions.get(_EXTENSION_KEY)
+
+
+def record(snapshot: LiveSnapshot) -> None:
+    """Append a freshly published snapshot's vehicles. Failures are logged,
+    never raised -- history must not be able to fail an ingest cycle.
+    """
+    history = store()
+    if history is None:
+        return
+    try:
+        history.append(snapshot.built_at, snapshot.vehicles)
+    except Exception:
+        logger.exception("Failed to append vehicle positions to history")
+
+
+def max_query_window() -> timedelta:
+    return timedelta(hours=current_app.config.get("HISTORY_MAX_QUERY_HOURS", 24))
@@ -0,0 +1,211 @@
+"""
+In-process, read-only view of the "right now" data that the read API serves.
+
+The live tables only change once per ingest cycle, but the frontend polls
+them from every open tab, so re-querying the database on every request is
+wasted work. Instead, each successful `run_ingest` builds one immutable
+`LiveSnapshot` with the indexes the endpoints need (vehicles by route,
+arrivals by stop sorted by time, alerts by route) and publishes it with a
+single reference swap. Request handlers only ever read the published
+object, so they never see a half-updated state and never take a lock.
+
+The database remains the system of record: a process that hasn't run an
+ingest yet (cold start, or a web worker that doesn't ingest) builds its
+first snapshot from the persisted tables.
+"""
+
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Callable, Mapping
+
+from flask import Flask, current_app
+
+from app.extensions import db
+from app.models import AlertRoute, ServiceAlert, SnapshotPointer, Station, StopArrival, VehicleSnapshot
+
+_EXTENSION_KEY = "live_state"
+
+
+@dataclass(frozen=True)
+class StationInfo:
+    stop_id: str
+    name: str
+    lat: float
+    lon: float
+
+
+@dataclass(frozen=True)
+class LiveSnapshot:
+    """One ingest cycle's worth of live data, pre-indexed for the read API.
+    Every container is a tuple or read-only mapping; treat it as immutable.
+    """
+
+    built_at: datetime
+    stations: Mapping[str, StationInfo]
+    vehicles: tuple[dict[str, Any], ...]
+    vehicles_by_route: Mapping[str, tuple[dict[str, Any], ...]]
+    arrivals_by_stop: Mapping[str, tuple[dict[str, Any], ...]]  # each sorted by arrival_time
+    alerts: tuple[dict[str, Any], ...]
+    alerts_by_route: Mapping[str, tuple[dict[str, Any], ...]]
+
+
+def _freeze(groups: dict[str, list[dict[str, Any]]]) -> Mapping[str, tuple[dict[str, Any], ...]]:
+    return MappingProxyType({key: tuple(rows) for key, rows in groups.items()})
+
+
+def build_snapshot_from_db() -> LiveSnapshot:
+    """Assemble a snapshot from the persisted live tables. Column queries
+    only -- vehicles are joined to their station in Python from the
+    stations map rather than through the lazy `VehicleSnapshot.station`.
+    """
+    stations = {
+        row.stop_id: StationInfo(row.stop_id, row.name, row.lat, row.lon)
+        for row in db.session.query(Station.stop_id, Station.name, Station.lat, Station.lon)
+    }
+
+    vehicles = []
+    vehicles_by_route: dict[str, list[dict[str, Any]]] = {}
+    for v in db.session.query(
+        VehicleSnapshot.trip_id,
+        VehicleSnapshot.route_id,
+        VehicleSnapshot.direction,
+        VehicleSnapshot.headsign,
+        VehicleSnapshot.stop_id,
+        VehicleSnapshot.location_status,
+        VehicleSnapshot.has_delay_alert,
+        VehicleSnapshot.last_position_update,
+    ):
+        station = stations.get(v.stop_id)
+        record = {
+            "trip_id": v.trip_id,
+            "route_id": v.route_id,
+            "direction": v.direction,
+            "headsign": v.headsign,
+            "stop_id": v.stop_id,
+            "station_name": station.name if station else None,
+            "lat": station.lat if station else None,
+            "lon": station.lon if station else None,
+            "location_status": v.location_status,
+            "has_delay_alert": v.has_delay_alert,
+            "last_position_update": (
+                v.last_position_update.isoformat() if v.last_position_update else None
+            ),
+        }
+        vehicles.append(record)
+        vehicles_by_route.setdefault(v.route_id, []).append(record)
+
+    arrivals_by_stop: dict[str, list[dict[str, Any]]] = {}
+    for a in (
+        db.session.query(
+            StopArrival.trip_id,
+            StopArrival.route_id,
+            StopArrival.direction,
+            StopArrival.headsign,
+            StopArrival.stop_id,
+            StopArrival.arrival_time,
+        )
+        .filter(StopArrival.generation == SnapshotPointer.live_generation("stop_arrivals"))
+        .order_by(StopArrival.stop_id, StopArrival.arrival_time)
+    ):
+        arrivals_by_stop.setdefault(a.stop_id, []).append(
+            {
+                "trip_id": a.trip_id,
+                "route_id": a.route_id,
+                "direction": a.direction,
+                "headsign": a.headsign,
+                "arrival_time": a.arrival_time,
+            }
+        )
+
+    alerts = [a.to_dict() for a in ServiceAlert.query.order_by(ServiceAlert.starts_at.desc()).all()]
+    # Grouped through the alert_routes association (kept by _ingest_alerts)
+    # rather than by re-splitting each alert's comma-separated routes
+    routes_by_alert: dict[str, list[str]] = {}
+    for route_id, external_id in db.session.query(AlertRoute.route_id, AlertRoute.external_id):
+        routes_by_alert.setdefault(external_id, []).append(route_id)
+    alerts_by_route: dict[str, list[dict[str, Any]]] = {}
+    for alert in alerts:
+        for route in routes_by_alert.get(alert["id"], ()):
+            alerts_by_route.setdefault(route, []).append(alert)
+
+    return LiveSnapshot(
+        built_at=datetime.utcnow(),
+        stations=MappingProxyType(stations),
+        vehicles=tuple(vehicles),
+        vehicles_by_route=_freeze(vehicles_by_route),
+        arrivals_by_stop=_freeze(arrivals_by_stop),
+        alerts=tuple(alerts),
+        alerts_by_route=_freeze(alerts_by_route),
+    )
+
+
+PublishListener = Callable[["LiveSnapshot | None", LiveSnapshot], None]
+
+
+class LiveStateStore:
+    """Holds the currently published snapshot for one app. Publishing is a
+    plain attribute assignment, which is atomic under the GIL; the lock only
+    keeps concurrent cold-start requests from each building their own copy.
+    Listeners are called with (previous, new) after every publish.
+    """
+
+    def __init__(self) -> None:
+        self._snapshot: LiveSnapshot | None = None
+        self._cold_start_lock = threading.Lock()
+        self._listeners: list[PublishListener] = []
+        # The newest successful IngestRun the published snapshot reflects,
+        # when known (see app/coordination.py)
+        self.ingest_run_id: int | None = None
+
+    def add_listener(self, listener: PublishListener) -> None:
+        self._listeners.append(listener)
+
+    def publish(self, snapshot: LiveSnapshot, ingest_run_id: int | None = None) -> None:
+        previous = self._snapshot
+        self._snapshot = snapshot
+        if ingest_run_id is not None:
+            self.ingest_run_id = ingest_run_id
+        for listener in self._listeners:
+            listener(previous, snapshot)
+
+    def get(self) -> LiveSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self._cold_start_lock:
+            if self._snapshot is None:
+                self._snapshot = build_snapshot_from_db()
+            return self._snapshot
+
+
+def init_app(app: Flask) -> None:
+    app.extensions[_EXTENSION_KEY] = LiveStateStore()
+
+
+def add_publish_listener(app: Flask, listener: PublishListener) -> None:
+    app.extensions[_EXTENSION_KEY].add_listener(listener)
+
+
+def _store() -> LiveStateStore:
+    store: LiveStateStore = current_app.extensions[_EXTENSION_KEY]
+    return store
+
+
+def current_snapshot() -> LiveSnapshot:
+    return _store().get()
+
+
+def published_ingest_run_id() -> int | None:
+    return _store().ingest_run_id
+
+
+def publish_from_db(ingest_run_id: int | None = None) -> LiveSnapshot:
+    """Rebuild the snapshot from the database and swap it in. Called by
+    run_ingest once a cycle's writes have committed, and by processes that
+    don't ingest when they see that another one has.
+    """
+    snapshot = build_snapshot_from_db()
+    current_app.extensions[_EXTENSION_KEY].publish(snapshot, ingest_run_id)
+    return snapshot
@@ -0,0 +1,233 @@
+"""
+Process-local metrics in the Prometheus text exposition format, served on
+GET /metrics (and, from the standalone ingest worker, on METRICS_PORT).
+
+What's measured:
+
+  * each run_ingest stage's duration (fetch, vehicles, segments, arrivals,
+    commit, alerts, publish, gc) and how each run ended
+  * per feed group: download and decode/normalize latency, payload bytes,
+    and failures
+  * rows written per table and operation
+  * request latency per API endpoint, method and status
+
+Recording is a perf_counter() pair, a bisect over the bucket bounds and a
+short lock -- microseconds, so it stays on in production. Like the rest of
+app.extensions, the numbers belong to one process: with several web
+workers, each reports the requests it served, and the ingest stages are
+reported by whichever process ingests.
+"""
+
+import bisect
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import AbstractContextManager, contextmanager
+from typing import Any
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from flask import Flask, Response, current_app
+
+logger = logging.getLogger(__name__)
+
+_EXTENSION_KEY = "metrics"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Request latencies are mostly milliseconds; ingest stages run to seconds
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """A monotonically increasing count per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0)
+
+    def items(self) -> list[tuple[tuple[str, ...], float]]:
+        with self._lock:
+            return sorted(self._values.items())
+
+    def samples(self) -> Iterator[str]:
+        for labelvalues, value in self.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+
+
+class Histogram:
+    """Observations counted into fixed buckets per label combination.
+    Bounds are upper-inclusive, as Prometheus' `le` is; the +Inf bucket is
+    implied.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help_text: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = STAGE_BUCKETS
+    ) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: dict[tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *labelvalues: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def count(self, *labelvalues: str) -> int:
+        series = self._series.get(labelvalues)
+        return series[2] if series else 0
+
+    def total(self, *labelvalues: str) -> float:
+        series = self._series.get(labelvalues)
+        return series[1] if series else 0.0
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            snapshot = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        bucket_names = self.labelnames + ("le",)
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for labelvalues, (counts, total, count) in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                labels = _format_labels(bucket_names, labelvalues + (bound,))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class Metrics:
+    """Every metric this app records, and their rendering."""
+
+    def __init__(self) -> None:
+        self.request_seconds = Histogram(
+            "transit_http_request_duration_seconds", "Time to produce an API response.",
+            ("endpoint", "method", "status"), REQUEST_BUCKETS,
+        )
+        self.ingest_stage_seconds = Histogram(
+            "transit_ingest_stage_duration_seconds", "Duration of each run_ingest stage.", ("stage",)
+        )
+        self.ingest_runs = Counter("transit_ingest_runs_total", "Ingest runs by outcome.", ("status",))
+        self.feed_fetch_seconds = Histogram(
+            "transit_feed_fetch_duration_seconds", "Download time of one feed group's payload.", ("group",)
+        )
+        self.feed_decode_seconds = Histogram(
+            "transit_feed_decode_duration_seconds", "Decode and normalize time of one feed group's payload.",
+            ("group",),
+        )
+        self.feed_bytes = Counter("transit_feed_bytes_total", "Payload bytes fetched per feed group.", ("group",))
+        self.feed_errors = Counter("transit_feed_errors_total", "Feed group fetches skipped this cycle.", ("group",))
+        self.rows_written = Counter(
+            "transit_ingest_rows_total", "Rows written by the ingest, per table and operation.",
+            ("table", "operation"),
+        )
+
+    def all(self) -> list[Counter | Histogram]:
+        return [metric for metric in vars(self).values() if isinstance(metric, (Counter, Histogram))]
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.all():
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+def init_app(app: Flask) -> None:
+    app.extensions[_EXTENSION_KEY] = Metrics()
+    if app.config["METRICS_ENABLED"]:
+        app.add_url_rule("/metrics", "metrics", _metrics_view)
+
+
+def registry() -> Metrics:
+    metrics: Metrics = current_app.extensions[_EXTENSION_KEY]
+    return metrics
+
+
+def _metrics_view() -> Response:
+    return Response(registry().render(), content_type=CONTENT_TYPE, headers={"Cache-Control": "no-store"})
+
+
+def stage(name: str) -> AbstractContextManager[None]:
+    """`with stage("vehicles"):` -- time one run_ingest stage."""
+    return registry().ingest_stage_seconds.time(name)
+
+
+def record_rows(table: str, **counts: int) -> None:
+    rows = registry().rows_written
+    for operation, count in counts.items():
+        if count:
+            rows.inc(table, operation, amount=count)
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def serve(app: Flask, port: int) -> WSGIServer:
+    """Serve GET /metrics for a process without a web server of its own
+    (the ingest worker), on a daemon thread.
+    """
+    app_metrics: Metrics = app.extensions[_EXTENSION_KEY]
+
+    def _wsgi(environ: dict[str, Any], start_response: Callable[..., Any]) -> Iterable[bytes]:
+        if environ.get("PATH_INFO") != "/metrics":
+            start_response("404 Not Found", [("Content-Type", "text/plain")])
+            return [b"not found\n"]
+        body = app_metrics.render().encode()
+        start_response("200 OK", [("Content-Type", CONTENT_TYPE), ("Content-Length", str(len(body)))])
+        return [body]
+
+    server = make_server("", port, _wsgi, handler_class=_QuietHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info("Serving metrics on :%d/metrics", server.server_port)
+    return server
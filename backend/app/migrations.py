@@ -0,0 +1,198 @@
+"""
+Schema migrations, applied at startup by `upgrade()`.
+
+`db.create_all()` creates missing tables but never changes existing ones,
+so a database created by an older version of the app keeps its old
+columns and indexes forever. Each Migration here brings an existing table
+forward one step. Applied versions are recorded in `schema_migrations`.
+
+Every migration inspects the database before it changes anything. A
+freshly created database already matches the models, so on a new database
+the migrations find nothing to do and are just recorded. Each one still
+runs correctly against any older schema, however it was created. Write
+new ones the same way, append them with the next version number, and
+describe the columns and indexes explicitly rather than importing them
+from the models, which will keep changing. A change to a model that
+alters an existing table (a column, an index, a type) adds its migration
+in the same commit; new tables need none, create_all() makes them.
+
+On Postgres the whole upgrade runs in one transaction under an advisory
+lock, so web workers starting together apply it once. SQLite runs DDL
+outside transactions, but the inspect-first migrations tolerate a
+concurrent upgrade.
+"""
+
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import (
+    Column, Connection, ForeignKey, Index, Integer, LargeBinary, MetaData, String, Table, inspect, text,
+)
+from sqlalchemy.schema import CreateColumn
+
+from app.extensions import db
+from app.models import SchemaMigration
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_xact_lock key for schema upgrades ("nycschem")
+_MIGRATION_LOCK_KEY = 0x6E79637363686D65
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+
+
+def _columns(conn: Connection, table: str) -> set[str]:
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+def _indexes(conn: Connection, table: str) -> set[str]:
+    # Reflected index names are typed Optional; unnamed ones never match anyway
+    return {name for index in inspect(conn).get_indexes(table) if (name := index["name"]) is not None}
+
+
+def _add_columns(conn: Connection, table: str, *columns: Column) -> None:
+    existing = _columns(conn, table)
+    for column in columns:
+        if column.name not in existing:
+            ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {ddl}"))
+
+
+def _create_index(conn: Connection, table: str, name: str, *columns: str) -> None:
+    if name in _indexes(conn, table):
+        return
+    reflected = Table(table, MetaData(), autoload_with=conn)
+    Index(name, *(reflected.c[column] for column in columns)).create(conn)
+
+
+def _drop_index(conn: Connection, table: str, name: str) -> None:
+    if name in _indexes(conn, table):
+        conn.execute(text(f"DROP INDEX {name}"))
+
+
+def _alert_content_hash(conn: Connection) -> None:
+    _add_columns(conn, "service_alerts", Column("content_hash", String(40)), Column("last_seen_run_id", Integer))
+    _create_index(conn, "service_alerts", "ix_service_alerts_last_seen_run_id", "last_seen_run_id")
+
+
+def _stop_arrival_generations(conn: Connection) -> None:
+    # Rows from before generations count as generation 0, which the first
+    # garbage collection after two ingests removes
+    _add_columns(conn, "stop_arrivals", Column("generation", Integer, nullable=False, server_default="0"))
+
+
+def _ingest_run_vehicle_counts(conn: Connection) -> None:
+    _add_columns(
+        conn, "ingest_runs",
+        *(Column(name, Integer, server_default="0")
+          for name in ("vehicles_inserted", "vehicles_updated", "vehicles_deleted")),
+    )
+
+
+def _packed_route_shapes(conn: Connection) -> None:
+    """route_shapes went from a JSON text column to packed point blobs. The
+    rows are derived from the static GTFS, so the table is recreated empty
+    and its seeding fingerprint cleared: seed_shapes() then refills it.
+    """
+    if "points_json" not in _columns(conn, "route_shapes"):
+        return
+    if inspect(conn).has_table("route_shape_levels"):
+        conn.execute(text("DROP TABLE route_shape_levels"))
+    conn.execute(text("DROP TABLE route_shapes"))
+
+    metadata = MetaData()
+    Table(
+        "route_shapes", metadata,
+        Column("shape_id", String(64), primary_key=True),
+        Column("route_id", String(8), nullable=False, index=True),
+        Column("point_count", Integer, nullable=False),
+        Column("points_blob", LargeBinary, nullable=False),
+    )
+    Table(
+        "route_shape_levels", metadata,
+        Column("shape_id", String(64), ForeignKey("route_shapes.shape_id"), primary_key=True),
+        Column("tolerance_m", Integer, primary_key=True),
+        Column("point_count", Integer, nullable=False),
+        Column("points_blob", LargeBinary, nullable=False),
+    )
+    metadata.create_all(conn)
+    if inspect(conn).has_table("static_data_versions"):
+        conn.execute(text("DELETE FROM static_data_versions WHERE name = 'shapes'"))
+
+
+def _hot_path_indexes(conn: Connection) -> None:
+    """Indexes shaped like the hot reads: the live arrivals generation in
+    (stop_id, arrival_time) order, and /api/health's latest ingest run.
+    The old arrivals indexes are dropped since nothing else used them, so
+    each cycle's bulk insert maintains one index instead of two.
+    """
+    _create_index(
+        conn, "stop_arrivals", "ix_stop_arrivals_generation_stop_time", "generation", "stop_id", "arrival_time"
+    )
+    _drop_index(conn, "stop_arrivals", "ix_stop_arrivals_generation_stop")
+    _drop_index(conn, "stop_arrivals", "ix_stop_arrivals_stop_id")
+    _create_index(conn, "ingest_runs", "ix_ingest_runs_started_at", "started_at")
+
+
+def _alert_route_backfill(conn: Connection) -> None:
+    """alert_routes and alert_route_counts are kept in step by
+    _ingest_alerts; fill them once from alerts stored before they existed.
+    A table that already has rows is being maintained and is left alone.
+    """
+    if conn.execute(text("SELECT 1 FROM alert_routes LIMIT 1")).first() is not None:
+        return
+    pairs = []
+    counts: dict[str, int] = {}
+    for external_id, routes in conn.execute(text("SELECT external_id, routes FROM service_alerts")):
+        for route in {route.strip() for route in (routes or "").split(",") if route.strip()}:
+            pairs.append({"route_id": route, "external_id": external_id})
+            counts[route] = counts.get(route, 0) + 1
+    conn.execute(text("DELETE FROM alert_route_counts"))
+    if pairs:
+        conn.execute(text("INSERT INTO alert_routes (route_id, external_id) VALUES (:route_id, :external_id)"), pairs)
+        conn.execute(
+            text("INSERT INTO alert_route_counts (route_id, active_count, updated_at) VALUES (:route_id, :n, :now)"),
+            [{"route_id": route, "n": n, "now": datetime.utcnow()} for route, n in counts.items()],
+        )
+
+
+MIGRATIONS = [
+    Migration(1, "alert content hash", _alert_content_hash),
+    Migration(2, "stop arrival generations", _stop_arrival_generations),
+    Migration(3, "ingest run vehicle counts", _ingest_run_vehicle_counts),
+    Migration(4, "packed route shapes", _packed_route_shapes),
+    Migration(5, "hot path indexes", _hot_path_indexes),
+    Migration(6, "alert route backfill", _alert_route_backfill),
+]
+
+
+def upgrade() -> list[int]:
+    """Create missing tables, then apply pending migrations in order.
+    Returns the versions applied.
+    """
+    applied_now = []
+    with db.engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _MIGRATION_LOCK_KEY})
+        db.metadata.create_all(conn)
+        applied = set(conn.execute(db.select(SchemaMigration.version)).scalars())
+        for migration in MIGRATIONS:
+            if migration.version in applied:
+                continue
+            migration.upgrade(conn)
+            conn.execute(
+                db.insert(SchemaMigration).values(
+                    version=migration.version, name=migration.name, applied_at=datetime.utcnow()
+                )
+            )
+            applied_now.append(migration.version)
+    if applied_now:
+        logger.info("Applied schema migrations %s", applied_now)
+    return applied_now
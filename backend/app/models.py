@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Any
 
 from app.extensions import db
 
@@ -30,8 +31,8 @@ class VehicleSnapshot(db.Model):
     NYCT's realtime feed doesn't publish GPS coordinates for subway cars --
     only the stop a train is currently at/approaching/departing. We record
     that directly and let the API join it to `Station` for a map-friendly
-    lat/lon. The table is fully replaced on every ETL run (see etl.py),
-    so it always reflects "right now", not history.
+    lat/lon. Each ETL run diffs the feed against this table by trip_id (see
+    etl._write_vehicles), so it always reflects "right now", not history.
     """
 
     __tablename__ = "vehicle_snapshots"
@@ -47,29 +48,16 @@ class VehicleSnapshot(db.Model):
     last_position_update = db.Column(db.DateTime)
     observed_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    station = db.relationship("Station")
-
-    def to_dict(self) -> dict:
-        return {
-            "trip_id": self.trip_id,
-            "route_id": self.route_id,
-            "direction": self.direction,
-            "headsign": self.headsign,
-            "stop_id": self.stop_id,
-            "station_name": self.station.name if self.station else None,
-            "lat": self.station.lat if self.station else None,
-            "lon": self.station.lon if self.station else None,
-            "location_status": self.location_status,
-            "has_delay_alert": self.has_delay_alert,
-            "last_position_update": (
-                self.last_position_update.isoformat() if self.last_position_update else None
-            ),
-        }
+    # Never loaded per row: readers select the station's columns alongside
+    # (see live_state.build_snapshot_from_db), and "raise" keeps it that way
+    station = db.relationship("Station", lazy="raise")
 
 
 class ServiceAlert(db.Model):
     """An active MTA service alert, upserted by external alert id on every
     ETL run so we keep one row per alert instead of growing unbounded.
+    `content_hash` lets unchanged alerts be skipped, and alerts whose
+    `last_seen_run_id` falls too many ingest cycles behind are expired.
     """
 
     __tablename__ = "service_alerts"
@@ -80,7 +68,9 @@ class ServiceAlert(db.Model):
     routes = db.Column(db.String(128))  # comma-separated route ids
     starts_at = db.Column(db.DateTime)
     ends_at = db.Column(db.DateTime, nullable=True)
+    content_hash = db.Column(db.String(40))
     last_seen_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_seen_run_id = db.Column(db.Integer, index=True)
 
     def to_dict(self) -> dict:
         return {
@@ -92,6 +82,40 @@ class ServiceAlert(db.Model):
         }
 
 
+class AlertRoute(db.Model):
+    """One row per (route, alert) pair -- the indexable form of
+    `ServiceAlert.routes`, kept in step with it by `_ingest_alerts`.
+    """
+
+    __tablename__ = "alert_routes"
+
+    route_id = db.Column(db.String(8), primary_key=True)
+    external_id = db.Column(db.String(64), primary_key=True, index=True)
+
+
+class AlertRouteCount(db.Model):
+    """Number of active alerts affecting each route, adjusted by the deltas
+    of every alert ingest rather than recounted.
+    """
+
+    __tablename__ = "alert_route_counts"
+
+    route_id = db.Column(db.String(8), primary_key=True)
+    active_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class AlertRouteBucket(db.Model):
+    """Alerts raised on / cleared from each route per hour."""
+
+    __tablename__ = "alert_route_buckets"
+
+    route_id = db.Column(db.String(8), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True, index=True)
+    raised = db.Column(db.Integer, nullable=False, default=0)
+    cleared = db.Column(db.Integer, nullable=False, default=0)
+
+
 class RouteSegment(db.Model):
     """One edge between two adjacent stations on a route, used to draw the
     colored line geometry on the map. There's no static `shapes.txt` in the
@@ -111,55 +135,78 @@ class RouteSegment(db.Model):
     stop_id_b = db.Column(db.String(16), db.ForeignKey("stations.stop_id"), nullable=False)
     first_seen_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    station_a = db.relationship("Station", foreign_keys=[stop_id_a])
-    station_b = db.relationship("Station", foreign_keys=[stop_id_b])
-
-    def to_dict(self) -> dict:
-        return {
-            "route_id": self.route_id,
-            "a": {"stop_id": self.station_a.stop_id, "lat": self.station_a.lat, "lon": self.station_a.lon},
-            "b": {"stop_id": self.station_b.stop_id, "lat": self.station_b.lat, "lon": self.station_b.lon},
-        }
+    # Serialized from one joined query (static_responses._build_route_segments)
+    station_a = db.relationship("Station", foreign_keys=[stop_id_a], lazy="raise")
+    station_b = db.relationship("Station", foreign_keys=[stop_id_b], lazy="raise")
 
 
 class RouteShape(db.Model):
     """One GTFS shape (a continuous polyline of lat/lon points) for a subway
     route, seeded once from the MTA static shapes.txt + trips.txt files.
     Multiple shapes per route are normal -- each direction/variant gets its
-    own shape_id and row.
+    own shape_id and row. Points are stored packed (see
+    geometry.pack_points), not as JSON text, so readers never parse them.
     """
 
     __tablename__ = "route_shapes"
 
     shape_id = db.Column(db.String(64), primary_key=True)
     route_id = db.Column(db.String(8), nullable=False, index=True)
-    points_json = db.Column(db.Text, nullable=False)  # JSON [[lat, lon], ...]
+    point_count = db.Column(db.Integer, nullable=False, default=0)
+    points_blob = db.Column(db.LargeBinary, nullable=False)
 
     def to_dict(self) -> dict:
-        import json
+        from app.geometry import unpack_points
 
         return {
             "route_id": self.route_id,
             "shape_id": self.shape_id,
-            "points": json.loads(self.points_json),
+            "points": unpack_points(self.points_blob).tolist(),
         }
 
 
+class RouteShapeLevel(db.Model):
+    """A Douglas-Peucker simplification of one RouteShape at `tolerance_m`
+    metres (see geometry.SIMPLIFY_TOLERANCES_M), computed at seed time so
+    zoomed-out maps can fetch a fraction of the points.
+    """
+
+    __tablename__ = "route_shape_levels"
+
+    shape_id = db.Column(db.String(64), db.ForeignKey("route_shapes.shape_id"), primary_key=True)
+    tolerance_m = db.Column(db.Integer, primary_key=True)
+    point_count = db.Column(db.Integer, nullable=False)
+    points_blob = db.Column(db.LargeBinary, nullable=False)
+
+
 class StopArrival(db.Model):
     """Upcoming train arrivals at each station, rebuilt on every ingest cycle.
     Derived from the GTFS-RT TripUpdate feed's stop_time_updates, which carry
     predicted arrival datetimes for every scheduled stop on an active trip.
-    Only future arrivals are stored; the table is fully replaced each run.
+    Only future arrivals are stored.
+
+    Each cycle writes a complete new `generation` of rows and then flips the
+    "stop_arrivals" SnapshotPointer to it in the same transaction, so readers
+    filtering on the live generation always see exactly one whole snapshot.
+    Superseded generations are garbage-collected afterwards.
     """
 
     __tablename__ = "stop_arrivals"
+    # Matches the one read, publish_from_db: the live generation in
+    # (stop_id, arrival_time) order, straight off the index with no sort.
+    # Nothing looks arrivals up by stop_id alone, so it isn't indexed on
+    # its own -- one less index to maintain on every cycle's bulk insert.
+    __table_args__ = (
+        db.Index("ix_stop_arrivals_generation_stop_time", "generation", "stop_id", "arrival_time"),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
     trip_id = db.Column(db.String(64), nullable=False)
     route_id = db.Column(db.String(8), nullable=False)
     direction = db.Column(db.String(1))       # "N" or "S"
     headsign = db.Column(db.String(128))
-    stop_id = db.Column(db.String(16), db.ForeignKey("stations.stop_id"), nullable=False, index=True)
+    stop_id = db.Column(db.String(16), db.ForeignKey("stations.stop_id"), nullable=False)
     arrival_time = db.Column(db.Integer, nullable=False)  # Unix timestamp (UTC)
 
     def to_dict(self) -> dict:
@@ -173,6 +220,114 @@ class StopArrival(db.Model):
         }
 
 
+class SnapshotPointer(db.Model):
+    """Names the live generation of a generation-versioned table (currently
+    just `stop_arrivals`). Flipping `generation` is the atomic swap that
+    publishes a fully-written snapshot to readers.
+    """
+
+    __tablename__ = "snapshot_pointers"
+
+    name = db.Column(db.String(32), primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def live_generation(cls, name: str) -> Any:
+        """Scalar subquery for the live generation, so a read can filter on
+        it inside the same statement instead of a separate round trip.
+        """
+        return db.select(cls.generation).where(cls.name == name).scalar_subquery()
+
+
+class ObservedArrival(db.Model):
+    """When a trip actually reached a station, as inferred from consecutive
+    ingest cycles (see app/headways.py) -- unlike `stop_arrivals`, these are
+    observations, not predictions, and are kept until the retention window
+    expires. `headway_s` is the gap since the previous train of the same
+    route and direction at the same station, when there was one.
+    """
+
+    __tablename__ = "observed_arrivals"
+    __table_args__ = (
+        db.Index("ix_observed_arrivals_route_dir_stop_time", "route_id", "direction", "stop_id", "arrived_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    trip_id = db.Column(db.String(64), nullable=False)
+    route_id = db.Column(db.String(8), nullable=False)
+    direction = db.Column(db.String(1), nullable=False, default="")
+    stop_id = db.Column(db.String(16), nullable=False)
+    arrived_at = db.Column(db.DateTime, nullable=False, index=True)
+    headway_s = db.Column(db.Integer)
+
+    def to_dict(self) -> dict:
+        return {
+            "trip_id": self.trip_id,
+            "route_id": self.route_id,
+            "direction": self.direction,
+            "stop_id": self.stop_id,
+            "arrived_at": self.arrived_at.isoformat(),
+            "headway_s": self.headway_s,
+        }
+
+
+class HeadwayState(db.Model):
+    """Last observed arrival per (route, direction, station): the only state
+    needed to turn the next arrival there into a headway.
+    """
+
+    __tablename__ = "headway_state"
+
+    route_id = db.Column(db.String(8), primary_key=True)
+    direction = db.Column(db.String(1), primary_key=True)
+    stop_id = db.Column(db.String(16), primary_key=True)
+    last_trip_id = db.Column(db.String(64), nullable=False)
+    last_arrived_at = db.Column(db.DateTime, nullable=False)
+
+
+class HeadwayBucket(db.Model):
+    """Running headway aggregates per (route, direction, station, hour).
+    Each observed headway adds to its hour's counters, so any rolling window
+    is a SUM over a handful of buckets rather than a pass over raw history.
+    """
+
+    __tablename__ = "headway_buckets"
+
+    route_id = db.Column(db.String(8), primary_key=True)
+    direction = db.Column(db.String(1), primary_key=True)
+    stop_id = db.Column(db.String(16), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True, index=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    sum_s = db.Column(db.Float, nullable=False, default=0.0)
+    sumsq_s = db.Column(db.Float, nullable=False, default=0.0)
+    bunched = db.Column(db.Integer, nullable=False, default=0)
+    gaps = db.Column(db.Integer, nullable=False, default=0)
+
+
+class StaticDataVersion(db.Model):
+    """Fingerprint of the static GTFS input last applied to one seeded
+    dataset ("stations", "shapes"). Startup seeding is skipped while the
+    bundled files still hash to `digest`.
+    """
+
+    __tablename__ = "static_data_versions"
+
+    name = db.Column(db.String(32), primary_key=True)
+    digest = db.Column(db.String(64), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class SchemaMigration(db.Model):
+    """One applied schema migration (see app/migrations.py)."""
+
+    __tablename__ = "schema_migrations"
+
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 class IngestRun(db.Model):
     """Observability log for the ETL pipeline -- proof the background job is
     actually running, and a place to see failures without reading server logs.
@@ -181,11 +336,14 @@ class IngestRun(db.Model):
     __tablename__ = "ingest_runs"
 
     id = db.Column(db.Integer, primary_key=True)
-    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # /api/health's latest run
     finished_at = db.Column(db.DateTime)
     vehicle_count = db.Column(db.Integer, default=0)
     alert_count = db.Column(db.Integer, default=0)
     new_segment_count = db.Column(db.Integer, default=0)
+    vehicles_inserted = db.Column(db.Integer, default=0)
+    vehicles_updated = db.Column(db.Integer, default=0)
+    vehicles_deleted = db.Column(db.Integer, default=0)
     status = db.Column(db.String(16), default="running")  # running / success / error
     error_message = db.Column(db.Text)
 
@@ -196,6 +354,9 @@ class IngestRun(db.Model):
             "vehicle_count": self.vehicle_count,
             "alert_count": self.alert_count,
             "new_segment_count": self.new_segment_count,
+            "vehicles_inserted": self.vehicles_inserted,
+            "vehicles_updated": self.vehicles_updated,
+            "vehicles_deleted": self.vehicles_deleted,
             "status": self.status,
             "error_message": self.error_message,
         }
@@ -0,0 +1,221 @@
+"""
+Server-Sent Events channel that pushes what changed after each ingest.
+
+Instead of every open tab polling every endpoint on a timer, clients load
+the current state once over REST and then hold one `/api/stream`
+connection. Each time a new LiveSnapshot is published (see
+app/live_state.py), the previous and new snapshots are diffed once into a
+compact delta -- vehicles added/moved/removed, stations whose upcoming
+arrivals changed, alerts raised/cleared -- and broadcast to subscribers,
+each filtered down to the routes and stations that client asked for.
+
+Each open stream holds a request thread, so the web server needs threaded
+(gthread) or async workers -- see the Dockerfile. The broker caps how many
+streams one process holds open (STREAM_MAX_SUBSCRIBERS) so they can't take
+every thread from the REST endpoints; past that, /api/stream answers 503
+and clients fall back to polling.
+"""
+
+import json
+import queue
+import threading
+from datetime import timezone
+from typing import Any, Iterator
+
+from flask import Flask, current_app
+
+from app import live_state
+from app.live_state import LiveSnapshot
+
+_EXTENSION_KEY = "push"
+
+HEARTBEAT_SECONDS = 15.0
+# A subscriber this far behind is presumed gone; its oldest deltas are dropped
+_MAX_PENDING = 20
+# Retry-After sent with the 503 when the broker is full
+FULL_RETRY_AFTER_SECONDS = 30
+
+_MOVE_FIELDS = ("stop_id", "location_status", "has_delay_alert")
+
+
+def compute_delta(previous: LiveSnapshot, current: LiveSnapshot) -> dict[str, Any]:
+    """Diff two snapshots into the payload broadcast to clients."""
+    prev_vehicles = {v["trip_id"]: v for v in previous.vehicles}
+    curr_vehicles = {v["trip_id"]: v for v in current.vehicles}
+
+    added, moved = [], []
+    for trip_id, vehicle in curr_vehicles.items():
+        before = prev_vehicles.get(trip_id)
+        if before is None:
+            added.append(vehicle)
+        elif any(before[f] != vehicle[f] for f in _MOVE_FIELDS):
+            moved.append(vehicle)
+    removed = [
+        {"trip_id": trip_id, "route_id": v["route_id"]}
+        for trip_id, v in prev_vehicles.items()
+        if trip_id not in curr_vehicles
+    ]
+
+    arrivals = {
+        stop_id: list(rows)
+        for stop_id, rows in current.arrivals_by_stop.items()
+        if previous.arrivals_by_stop.get(stop_id) != rows
+    }
+    arrivals.update(
+        {stop_id: [] for stop_id in previous.arrivals_by_stop if stop_id not in current.arrivals_by_stop}
+    )
+
+    prev_alerts = {a["id"]: a for a in previous.alerts}
+    curr_alerts = {a["id"]: a for a in current.alerts}
+
+    return {
+        # Snapshots carry naive UTC; send the offset so browsers don't read it as local time
+        "built_at": current.built_at.replace(tzinfo=timezone.utc).isoformat(),
+        "vehicles": {"added": added, "moved": moved, "removed": removed},
+        "arrivals": arrivals,
+        "alerts": {
+            "added": [a for alert_id, a in curr_alerts.items() if prev_alerts.get(alert_id) != a],
+            "cleared": [
+                {"id": alert_id, "routes": a["routes"]}
+                for alert_id, a in prev_alerts.items()
+                if alert_id not in curr_alerts
+            ],
+        },
+    }
+
+
+TOPICS = frozenset({"vehicles", "alerts", "arrivals"})
+
+
+def filter_delta(
+    delta: dict[str, Any], routes: set[str] | None, stations: set[str], topics: frozenset[str] = TOPICS
+) -> dict[str, Any] | None:
+    """Cut a delta down to one subscription. `routes=None` means every route;
+    arrivals are only sent for explicitly subscribed stations, since the
+    full per-station set is large and a client only displays one or two.
+    Sections not in `topics` are left empty. Returns None if nothing in the
+    delta concerns this subscriber.
+    """
+
+    def wanted(route_ids: Any) -> bool:
+        if routes is None:
+            return True
+        if isinstance(route_ids, str):
+            return route_ids in routes
+        return any(r in routes for r in route_ids)
+
+    vehicles = {
+        key: [v for v in rows if "vehicles" in topics and wanted(v["route_id"])]
+        for key, rows in delta["vehicles"].items()
+    }
+    alerts = {
+        key: [a for a in rows if "alerts" in topics and wanted(a["routes"])] for key, rows in delta["alerts"].items()
+    }
+    arrivals = {
+        stop_id: rows for stop_id, rows in delta["arrivals"].items() if "arrivals" in topics and stop_id in stations
+    }
+
+    if not (any(vehicles.values()) or any(alerts.values()) or arrivals):
+        return None
+    return {"built_at": delta["built_at"], "vehicles": vehicles, "arrivals": arrivals, "alerts": alerts}
+
+
+class Subscription:
+    def __init__(self, routes: set[str] | None, stations: set[str], topics: frozenset[str] = TOPICS) -> None:
+        self.routes = routes
+        self.stations = stations
+        self.topics = topics
+        self.queue: queue.Queue[str] = queue.Queue(maxsize=_MAX_PENDING)
+
+    def offer(self, message: str) -> None:
+        while True:
+            try:
+                self.queue.put_nowait(message)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+
+class Broker:
+    """Fan-out of deltas to the open streams of one process."""
+
+    def __init__(self, max_subscribers: int = 0) -> None:
+        self._subscriptions: set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._max_subscribers = max_subscribers
+
+    def subscribe(
+        self, routes: set[str] | None, stations: set[str], topics: frozenset[str] = TOPICS
+    ) -> Subscription | None:
+        """Open a subscription, or return None if this process already holds
+        `max_subscribers` streams (0 means no limit).
+        """
+        subscription = Subscription(routes, stations, topics)
+        with self._lock:
+            if self._max_subscribers and len(self._subscriptions) >= self._max_subscribers:
+                return None
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def broadcast(self, delta: dict[str, Any]) -> int:
+        """Queue `delta` for every interested subscriber; returns how many."""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        sent = 0
+        for subscription in subscriptions:
+            payload = filter_delta(delta, subscription.routes, subscription.stations, subscription.topics)
+            if payload is not None:
+                subscription.offer(_sse("delta", payload))
+                sent += 1
+        return sent
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+
+def _sse(event: str, payload: dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n"
+
+
+def init_app(app: Flask) -> None:
+    """Register the broker and hook it to snapshot publication. Must run
+    after live_state.init_app().
+    """
+    app_broker = Broker(app.config["STREAM_MAX_SUBSCRIBERS"])
+    app.extensions[_EXTENSION_KEY] = app_broker
+
+    def _on_publish(previous: LiveSnapshot | None, current: LiveSnapshot) -> None:
+        # With no previous snapshot there's nothing to diff against; clients
+        # load the initial state over REST anyway.
+        if previous is not None and app_broker.subscriber_count:
+            app_broker.broadcast(compute_delta(previous, current))
+
+    live_state.add_publish_listener(app, _on_publish)
+
+
+def broker() -> Broker:
+    app_broker: Broker = current_app.extensions[_EXTENSION_KEY]
+    return app_broker
+
+
+def stream(subscription: Subscription, app_broker: Broker, heartbeat: float = HEARTBEAT_SECONDS) -> Iterator[str]:
+    """Body of an SSE response: deltas as they arrive, with a comment line
+    as a heartbeat so proxies don't time the connection out.
+    """
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                yield subscription.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+    finally:
+        app_broker.unsubscribe(subscription)
@@ -0,0 +1,129 @@
+"""
+Ordered stop lists per route and direction, for /api/routes/<id>/stops.
+
+A route's stations come from its accumulated `RouteSegment` edges; their
+order comes from projecting each station onto the route's longest GTFS
+shape in each direction and sorting by arc-length. None of that depends on
+live data, so it's computed once per route (batched through NumPy, see
+app/geometry.py) and cached. The endpoint then only has to merge in the
+current vehicles. The cache is warmed after shapes are seeded and dropped
+whenever an ingest cycle adds new segments.
+"""
+
+import threading
+from typing import Any
+
+import numpy as np
+from flask import Flask, current_app
+
+from app.extensions import db
+from app.geometry import project_points_onto_polyline, unpack_points
+from app.gtfs_static import static_gtfs
+from app.models import RouteSegment, RouteShape, Station
+
+_EXTENSION_KEY = "route_stops"
+
+# Stops that project within this fraction of the shape length of the
+# previous one are treated as the same position and dropped
+_DEDUPE_SPACING = 0.004
+
+
+def _shape_directions() -> dict[str, tuple[int, str]]:
+    """shape_id -> (direction_id, headsign), from the static GTFS loader."""
+    return {shape_id: (s.direction_id, s.headsign) for shape_id, s in static_gtfs().shapes.items()}
+
+
+def build_route_directions(route_id: str) -> list[dict[str, Any]] | None:
+    """Compute the ordered stops of each direction of `route_id`, without
+    vehicles. Returns None if the route has no known segments.
+    """
+    pairs = db.session.query(RouteSegment.stop_id_a, RouteSegment.stop_id_b).filter_by(route_id=route_id).all()
+    if not pairs:
+        return None
+
+    stop_ids = {a for a, _ in pairs} | {b for _, b in pairs}
+    # Ordered, so stations projecting to the same point tie-break by stop_id
+    stations = (
+        db.session.query(Station.stop_id, Station.name, Station.lat, Station.lon)
+        .filter(Station.stop_id.in_(stop_ids))
+        .order_by(Station.stop_id)
+        .all()
+    )
+    station_latlons = np.array([(s.lat, s.lon) for s in stations], dtype=np.float64)
+
+    # Pick one representative shape per direction_id (longest shape wins)
+    shape_dirs = _shape_directions()
+    best: dict[int, tuple[int, str, bytes]] = {}  # dir_id -> (point_count, headsign, points_blob)
+    for shape_id, point_count, points_blob in db.session.query(
+        RouteShape.shape_id, RouteShape.point_count, RouteShape.points_blob
+    ).filter_by(route_id=route_id).order_by(RouteShape.shape_id):
+        did, headsign = shape_dirs.get(shape_id, (0, ""))
+        prev = best.get(did)
+        if prev is None or point_count > prev[0]:
+            best[did] = (point_count, headsign, points_blob)
+
+    directions = []
+    for did in sorted(best):
+        _, headsign, points_blob = best[did]
+        params = sorted(
+            zip(
+                project_points_onto_polyline(station_latlons, unpack_points(points_blob)).tolist(),
+                range(len(stations)),
+            )
+        )
+
+        stops = []
+        prev_t = -1.0
+        for t, i in params:
+            if t - prev_t > _DEDUPE_SPACING:
+                s = stations[i]
+                stops.append({"stop_id": s.stop_id, "name": s.name, "lat": s.lat, "lon": s.lon})
+                prev_t = t
+
+        directions.append({"direction_id": did, "headsign": headsign, "stops": stops})
+    return directions
+
+
+class RouteStopCache:
+    """Per-app cache of build_route_directions() results, keyed by route."""
+
+    def __init__(self) -> None:
+        self._directions: dict[str, list[dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, route_id: str) -> list[dict[str, Any]] | None:
+        directions = self._directions.get(route_id)
+        if directions is not None:
+            return directions
+        with self._lock:
+            directions = self._directions.get(route_id)
+            if directions is None:
+                directions = build_route_directions(route_id)
+                if directions is not None:  # don't let bogus ids grow the cache
+                    self._directions[route_id] = directions
+            return directions
+
+    def warm(self) -> None:
+        route_ids = {row[0] for row in db.session.query(RouteSegment.route_id).distinct()}
+        for route_id in route_ids:
+            self.get(route_id)
+
+    def invalidate(self) -> None:
+        self._directions = {}
+
+
+def init_app(app: Flask) -> None:
+    app.extensions[_EXTENSION_KEY] = RouteStopCache()
+
+
+def route_directions(route_id: str) -> list[dict[str, Any]] | None:
+    cache: RouteStopCache = current_app.extensions[_EXTENSION_KEY]
+    return cache.get(route_id)
+
+
+def warm() -> None:
+    current_app.extensions[_EXTENSION_KEY].warm()
+
+
+def invalidate() -> None:
+    current_app.extensions[_EXTENSION_KEY].invalidate()
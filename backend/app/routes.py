@@ -1,65 +1,41 @@
-import csv
-import json
-import math
-import os
-
-from flask import Blueprint, current_app, jsonify, request
-
-from app.extensions import db
-from app.models import IngestRun, RouteSegment, RouteShape, ServiceAlert, Station, StopArrival, VehicleSnapshot
-
-_DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
-
-# shape_id -> (direction_id, headsign), built once on first use
-_shape_dir_cache: dict[str, tuple[int, str]] | None = None
-
-
-def _shape_directions() -> dict[str, tuple[int, str]]:
-    global _shape_dir_cache
-    if _shape_dir_cache is not None:
-        return _shape_dir_cache
-    result: dict[str, tuple[int, str]] = {}
-    with open(os.path.join(_DATA_DIR, "trips.txt"), newline="", encoding="utf-8") as f:
-        for row in csv.DictReader(f):
-            sid = row.get("shape_id", "").strip()
-            if sid and sid not in result:
-                try:
-                    did = int(row.get("direction_id", 0))
-                except ValueError:
-                    did = 0
-                result[sid] = (did, row.get("trip_headsign", "").strip())
-    _shape_dir_cache = result
-    return result
-
-
-def _project_onto_polyline(lat: float, lon: float, points: list) -> float:
-    """Return cumulative arc-length parameter [0..1] of the nearest point
-    on the polyline to (lat, lon), using a flat-earth approximation at NYC.
-    """
-    SLAT = 111_000.0
-    SLON = 111_000.0 * math.cos(math.radians(40.7))
-    px, py = lon * SLON, lat * SLAT
-    cum = 0.0
-    best_t = 0.0
-    best_d = float("inf")
-    total = 0.0
-    for i in range(len(points) - 1):
-        ax, ay = points[i][1] * SLON, points[i][0] * SLAT
-        bx, by = points[i + 1][1] * SLON, points[i + 1][0] * SLAT
-        seg = math.hypot(bx - ax, by - ay)
-        if seg < 1e-6:
-            continue
-        t = max(0.0, min(1.0, ((px - ax) * (bx - ax) + (py - ay) * (by - ay)) / seg**2))
-        d = math.hypot(px - (ax + t * (bx - ax)), py - (ay + t * (by - ay)))
-        if d < best_d:
-            best_d = d
-            best_t = cum + t * seg
-        cum += seg
-    total = cum
-    return best_t / total if total > 0 else 0.0
+import bisect
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask import Blueprint, Response, current_app, g, jsonify, request
+
+from app import coordination, database, headways, history, metrics, push, spatial, static_responses
+from app.geometry import SIMPLIFY_TOLERANCES_M, metres_per_pixel
+from app.live_state import current_snapshot
+from app.route_stops import route_directions
+from app.models import AlertRouteBucket, AlertRouteCount, IngestRun
 
 api_bp = Blueprint("api", __name__)
 
+WALKING_RADIUS_M = 400
+MAX_NEAR_RADIUS_M = 5000
+MAX_STATS_WINDOW_HOURS = 24 * 7
+MAX_MAP_ZOOM = 22
+
+
+@api_bp.before_request
+def _start_request_timer() -> None:
+    g.request_started = time.perf_counter()
+
+
+@api_bp.after_request
+def _record_request_latency(response: Response) -> Response:
+    """Per-endpoint latency for /metrics. Labelled by view name rather than
+    path, so /stations/<stop_id>/arrivals is one series, not one per
+    station. Streams are timed to their first byte.
+    """
+    started = g.pop("request_started", None)
+    if started is not None:
+        metrics.registry().request_seconds.observe(
+            time.perf_counter() - started, request.endpoint or "", request.method, str(response.status_code)
+        )
+    return response
+
 
 @api_bp.get("/health")
 def health() -> tuple:
@@ -68,126 +44,146 @@ def health() -> tuple:
         {
             "status": "ok",
             "last_ingest_run": last_run.to_dict() if last_run else None,
+            "database_pools": database.pool_stats(),
         }
     )
 
 
 @api_bp.get("/stations")
-def list_stations() -> tuple:
-    stations = Station.query.all()
-    return jsonify([s.to_dict() for s in stations])
+def list_stations() -> Response:
+    return static_responses.serve("stations")
 
 
 @api_bp.get("/vehicles")
-def list_vehicles() -> tuple:
-    query = VehicleSnapshot.query
+def list_vehicles() -> Response:
+    snapshot = current_snapshot()
     route = request.args.get("route")
     if route:
-        query = query.filter(VehicleSnapshot.route_id == route.upper())
-    vehicles = query.all()
-    return jsonify([v.to_dict() for v in vehicles])
+        return jsonify(list(snapshot.vehicles_by_route.get(route.upper(), ())))
+    return jsonify(list(snapshot.vehicles))
 
 
 @api_bp.get("/alerts")
-def list_alerts() -> tuple:
-    alerts = ServiceAlert.query.order_by(ServiceAlert.starts_at.desc()).all()
-    return jsonify([a.to_dict() for a in alerts])
+def list_alerts() -> Response:
+    snapshot = current_snapshot()
+    route = request.args.get("route")
+    if route:
+        return jsonify(list(snapshot.alerts_by_route.get(route.upper(), ())))
+    return jsonify(list(snapshot.alerts))
 
 
 @api_bp.get("/route-segments")
-def list_route_segments() -> tuple:
+def list_route_segments() -> Response:
     """Line geometry for the map -- accumulated edges between adjacent
     stations on each route, derived from real stop sequences (see
     app/etl.py for why there's no static shapes.txt backing this).
+    Pre-serialized; rebuilt whenever an ingest cycle adds new edges.
     """
-    segments = RouteSegment.query.all()
-    return jsonify([s.to_dict() for s in segments])
+    return static_responses.serve("route-segments")
+
+
+def _shape_level() -> tuple[int | None, bool]:
+    """The simplification level for `?tolerance=` (metres) or `?zoom=`
+    (web-map zoom, one pixel's width as the tolerance): the coarsest stored
+    level within it, None for full detail. Second item False if invalid.
+    """
+    try:
+        if "tolerance" in request.args:
+            tolerance = float(request.args["tolerance"])
+        elif "zoom" in request.args:
+            zoom = float(request.args["zoom"])
+            if not 0 <= zoom <= MAX_MAP_ZOOM:
+                return None, False
+            tolerance = metres_per_pixel(zoom)
+        else:
+            return None, True
+    except ValueError:
+        return None, False
+    if not 0 <= tolerance < float("inf"):
+        return None, False
+    levels = [t for t in SIMPLIFY_TOLERANCES_M if t <= tolerance]
+    return (max(levels) if levels else None), True
 
 
 @api_bp.get("/route-shapes")
-def list_route_shapes() -> tuple:
-    """Full GTFS polyline geometry for every subway route, seeded from the
+def list_route_shapes() -> Response | tuple:
+    """GTFS polyline geometry for every subway route, seeded from the
     bundled shapes.txt. Each entry is one continuous polyline (shape_id) with
     its ordered lat/lon points. Multiple polylines per route_id are normal.
+    Full detail by default; `?zoom=` or `?tolerance=` (metres) selects a
+    precomputed Douglas-Peucker simplification with a fraction of the
+    points. Pre-serialized at startup, served with ETag revalidation.
     """
-    shapes = RouteShape.query.all()
-    return jsonify([s.to_dict() for s in shapes])
+    level, valid = _shape_level()
+    if not valid:
+        return jsonify({"error": f"zoom must be in [0, {MAX_MAP_ZOOM}] and tolerance a non-negative number"}), 400
+    return static_responses.serve(static_responses.route_shapes_name(level))
 
 
 @api_bp.get("/routes/<route_id>/stops")
-def route_stops(route_id: str) -> tuple:
+def route_stops(route_id: str) -> Response | tuple:
     """Ordered stop list per direction for a route, derived by projecting each
     station onto the route's GTFS shape polyline and sorting by arc-length.
     Also includes current vehicle positions.
     """
     rid = route_id.upper()
 
-    segments = RouteSegment.query.filter_by(route_id=rid).all()
-    if not segments:
+    # Station order per direction is precomputed (see app/route_stops.py);
+    # only the live vehicles need merging in per request.
+    directions = route_directions(rid)
+    if directions is None:
         return jsonify({"error": "route not found"}), 404
 
-    stop_ids = {seg.stop_id_a for seg in segments} | {seg.stop_id_b for seg in segments}
-    stations = {s.stop_id: s for s in Station.query.filter(Station.stop_id.in_(stop_ids)).all()}
-
-    shapes = RouteShape.query.filter_by(route_id=rid).all()
-    shape_dirs = _shape_directions()
-
-    # Pick one representative shape per direction_id (longest shape wins)
-    best: dict[int, tuple[int, str, list]] = {}  # dir_id -> (point_count, headsign, points)
-    for shape in shapes:
-        did, headsign = shape_dirs.get(shape.shape_id, (0, ""))
-        pts = json.loads(shape.points_json)
-        prev = best.get(did)
-        if prev is None or len(pts) > prev[0]:
-            best[did] = (len(pts), headsign, pts)
-
     # Current vehicles grouped by (direction_id, stop_id)
-    vehicles = VehicleSnapshot.query.filter_by(route_id=rid).all()
     vehicles_by_dir_stop: dict[tuple[int, str], list] = {}
-    for v in vehicles:
-        if v.stop_id and v.direction is not None:
+    for v in current_snapshot().vehicles_by_route.get(rid, ()):
+        if v["stop_id"] and v["direction"] is not None:
             # GTFS direction_id: 0 = first listed, 1 = opposite.
             # Real-time feed uses "N"/"S" strings; map to int.
-            v_did = 0 if v.direction in ("N", "W") else 1
-            key = (v_did, v.stop_id)
-            vehicles_by_dir_stop.setdefault(key, []).append(v.to_dict())
-
-    directions = []
-    for did in sorted(best):
-        _, headsign, pts = best[did]
-        # Project every station onto this shape and sort by arc-length
-        params = [(
-            _project_onto_polyline(st.lat, st.lon, pts),
-            sid,
-        ) for sid, st in stations.items()]
-        params.sort()
-
-        # Deduplicate stops that project to nearly the same position
-        filtered: list[tuple[float, str]] = []
-        prev_t = -1.0
-        for t, sid in params:
-            if t - prev_t > 0.004:
-                filtered.append((t, sid))
-                prev_t = t
-
-        stops = []
-        for _, sid in filtered:
-            st = stations[sid]
-            stops.append({
-                "stop_id": sid,
-                "name": st.name,
-                "lat": st.lat,
-                "lon": st.lon,
-                "vehicles": vehicles_by_dir_stop.get((did, sid), []),
-            })
-
-        directions.append({
-            "direction_id": did,
-            "headsign": headsign,
-            "stops": stops,
-        })
-
-    return jsonify({"route_id": rid, "directions": directions})
+            v_did = 0 if v["direction"] in ("N", "W") else 1
+            key = (v_did, v["stop_id"])
+            vehicles_by_dir_stop.setdefault(key, []).append(v)
+
+    return jsonify({
+        "route_id": rid,
+        "directions": [
+            {
+                **direction,
+                "stops": [
+                    {**stop, "vehicles": vehicles_by_dir_stop.get((direction["direction_id"], stop["stop_id"]), [])}
+                    for stop in direction["stops"]
+                ],
+            }
+            for direction in directions
+        ],
+    })
+
+
+@api_bp.get("/stations/near")
+def stations_near() -> Response | tuple:
+    """Stations within `radius` metres (default 400, max 5000) of a point,
+    nearest first, each with the routes known to serve it.
+    """
+    try:
+        lat = float(request.args["lat"])
+        lon = float(request.args["lon"])
+        radius = float(request.args.get("radius", WALKING_RADIUS_M))
+    except (KeyError, ValueError):
+        return jsonify({"error": "lat and lon query parameters are required numbers"}), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or not (0 < radius <= MAX_NEAR_RADIUS_M):
+        return jsonify({"error": "lat/lon out of range or radius not in (0, 5000]"}), 400
+
+    return jsonify([
+        {
+            "stop_id": s.stop_id,
+            "name": s.name,
+            "lat": s.lat,
+            "lon": s.lon,
+            "distance_m": int(s.distance_m),
+            "routes": list(spatial.routes_serving(s.stop_id)),
+        }
+        for s in spatial.near_point(lat, lon, radius)
+    ])
 
 
 @api_bp.get("/stations/<stop_id>/arrivals")
@@ -199,64 +195,32 @@ def station_arrivals(stop_id: str) -> tuple:
     Also returns nearby stations (within ~400 m walking distance) so the
     frontend can show walkable connections.
     """
-    import time
-
     now_ts = int(time.time())
 
-    station = db.session.get(Station, stop_id)
+    snapshot = current_snapshot()
+    station = snapshot.stations.get(stop_id)
     if station is None:
         return jsonify({"error": "Station not found"}), 404
 
-    arrivals_q = (
-        StopArrival.query
-        .filter_by(stop_id=stop_id)
-        .filter(StopArrival.arrival_time >= now_ts)
-        .order_by(StopArrival.arrival_time)
-        .limit(40)
-        .all()
-    )
+    # Already sorted by arrival_time -- skip past departed trains, take 40
+    upcoming = snapshot.arrivals_by_stop.get(stop_id, ())
+    start = bisect.bisect_left(upcoming, now_ts, key=lambda a: a["arrival_time"])
 
     arrivals = []
-    for a in arrivals_q:
-        minutes = max(0, (a.arrival_time - now_ts) // 60)
-        arrivals.append({
-            "trip_id": a.trip_id,
-            "route_id": a.route_id,
-            "direction": a.direction,
-            "headsign": a.headsign,
-            "arrival_time": a.arrival_time,
-            "minutes_away": minutes,
-        })
-
-    # Walkable connections: stations within ~400 m (≈ 0.0036 degrees)
-    WALK_THRESH = 0.0036
-    nearby = Station.query.filter(
-        Station.stop_id != stop_id,
-        Station.lat.between(station.lat - WALK_THRESH, station.lat + WALK_THRESH),
-        Station.lon.between(station.lon - WALK_THRESH, station.lon + WALK_THRESH),
-    ).all()
-
-    connections = []
-    for s in nearby:
-        dist_m = math.hypot(
-            (s.lat - station.lat) * 111_000,
-            (s.lon - station.lon) * 111_000 * math.cos(math.radians(station.lat)),
-        )
-        if dist_m <= 400:
-            # What routes serve this nearby station?
-            route_ids = list({
-                seg.route_id
-                for seg in RouteSegment.query.filter(
-                    (RouteSegment.stop_id_a == s.stop_id) | (RouteSegment.stop_id_b == s.stop_id)
-                ).all()
-            })
-            connections.append({
-                "stop_id": s.stop_id,
-                "name": s.name,
-                "distance_m": int(dist_m),
-                "routes": sorted(route_ids),
-            })
-    connections.sort(key=lambda c: c["distance_m"])
+    for a in upcoming[start:start + 40]:
+        minutes = max(0, (a["arrival_time"] - now_ts) // 60)
+        arrivals.append({**a, "minutes_away": minutes})
+
+    # Walkable connections: stations within ~400 m, from the in-memory grid
+    connections = [
+        {
+            "stop_id": s.stop_id,
+            "name": s.name,
+            "distance_m": int(s.distance_m),
+            "routes": list(spatial.routes_serving(s.stop_id)),
+        }
+        for s in spatial.nearby(stop_id, WALKING_RADIUS_M)
+    ]
 
     return jsonify({
         "stop_id": stop_id,
@@ -267,37 +231,164 @@ def station_arrivals(stop_id: str) -> tuple:
 
 
 @api_bp.get("/stats/alerts-by-route")
-def alerts_by_route() -> tuple:
+def alerts_by_route() -> Response:
     """Aggregated counts feeding the D3 bar chart: how many active alerts
-    are currently affecting each route.
+    are currently affecting each route. Read straight from the per-route
+    counters that each alert ingest keeps up to date.
+    """
+    counts = (
+        AlertRouteCount.query.filter(AlertRouteCount.active_count > 0)
+        .order_by(AlertRouteCount.active_count.desc(), AlertRouteCount.route_id)
+        .all()
+    )
+    return jsonify([{"route": c.route_id, "count": c.active_count} for c in counts])
+
+
+@api_bp.get("/stats/alerts-history")
+def alerts_history() -> Response | tuple:
+    """Alerts raised on and cleared from each route per hour, over the last
+    `hours` (default 24, max 168), oldest hour first. `?route=` narrows it
+    to one route.
+    """
+    try:
+        hours = int(request.args.get("hours", 24))
+    except ValueError:
+        hours = 0
+    if not 0 < hours <= MAX_STATS_WINDOW_HOURS:
+        return jsonify({"error": "hours must be an integer in [1, 168]"}), 400
+    since = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+    query = AlertRouteBucket.query.filter(AlertRouteBucket.bucket_start >= since)
+    route = request.args.get("route")
+    if route:
+        query = query.filter(AlertRouteBucket.route_id == route.upper())
+    return jsonify([
+        {"route": b.route_id, "hour": b.bucket_start.isoformat(), "raised": b.raised, "cleared": b.cleared}
+        for b in query.order_by(AlertRouteBucket.bucket_start, AlertRouteBucket.route_id)
+    ])
+
+
+def _stats_window_hours() -> int | None:
+    """`?hours=` for the headway stats (default 3), or None if invalid."""
+    try:
+        hours = int(request.args.get("hours", 3))
+    except ValueError:
+        return None
+    return hours if 0 < hours <= MAX_STATS_WINDOW_HOURS else None
+
+
+@api_bp.get("/stats/headways")
+def headway_stats() -> Response | tuple:
+    """Observed headways per route, direction and station over the last
+    `hours` (default 3, max 168, to hourly granularity): count, mean,
+    standard deviation, coefficient of variation, bunched and gap counts.
+    Filter with `route`, `direction` (N/S) and `stop`.
     """
-    counts: dict[str, int] = {}
-    for alert in ServiceAlert.query.all():
-        for route in (alert.routes or "").split(","):
-            route = route.strip()
-            if route:
-                counts[route] = counts.get(route, 0) + 1
-
-    data = sorted(
-        ({"route": route, "count": count} for route, count in counts.items()),
-        key=lambda row: row["count"],
-        reverse=True,
+    hours = _stats_window_hours()
+    if hours is None:
+        return jsonify({"error": "hours must be an integer in [1, 168]"}), 400
+    route = request.args.get("route")
+    direction = request.args.get("direction")
+    return jsonify(
+        headways.headway_stats(
+            hours,
+            route_id=route.upper() if route else None,
+            direction=direction.upper() if direction else None,
+            stop_id=request.args.get("stop"),
+        )
+    )
+
+
+@api_bp.get("/stats/bunching")
+def bunching_stats() -> Response | tuple:
+    """Bunching per route and direction over the last `hours` (default 3),
+    most bunched first, with the stations where it happens most.
+    """
+    hours = _stats_window_hours()
+    if hours is None:
+        return jsonify({"error": "hours must be an integer in [1, 168]"}), 400
+    route = request.args.get("route")
+    return jsonify(headways.bunching_summary(hours, route_id=route.upper() if route else None))
+
+
+def _parse_utc(value: str) -> datetime:
+    """ISO-8601 timestamp -> naive UTC datetime (naive input is taken as UTC)."""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+@api_bp.get("/history/positions")
+def history_positions() -> Response | tuple:
+    """Recorded vehicle positions in [start, end), in time order, optionally
+    for one `route` and/or `trip`. Only available when HISTORY_DIR is set
+    (and shared with the ingest process); the window is capped at
+    HISTORY_MAX_QUERY_HOURS.
+    """
+    store = history.store()
+    if store is None:
+        return jsonify({"error": "position history is not enabled"}), 404
+    try:
+        start = _parse_utc(request.args["start"])
+        end = _parse_utc(request.args["end"])
+    except (KeyError, ValueError):
+        return jsonify({"error": "start and end query parameters must be ISO-8601 timestamps"}), 400
+    if not start < end or end - start > history.max_query_window():
+        return jsonify({"error": "start must precede end, within the maximum query window"}), 400
+    if not store.has_partitions():
+        # Either nothing has been ingested yet or HISTORY_DIR isn't the
+        # directory the ingest process writes to; an empty list would hide both
+        return jsonify({"error": "no position history has been recorded in HISTORY_DIR yet; "
+                                 "it must be shared with the ingest process"}), 503
+
+    route = request.args.get("route")
+    positions = store.positions(
+        start, end, route_id=route.upper() if route else None, trip_id=request.args.get("trip")
+    )
+    return jsonify({"start": start.isoformat(), "end": end.isoformat(), "positions": positions})
+
+
+@api_bp.get("/stream")
+def live_stream() -> Response | tuple:
+    """Server-Sent Events stream of per-cycle deltas (see app/push.py).
+
+    `?routes=A,C,E` limits vehicle and alert changes to those routes (all
+    routes if omitted); `?stations=127,A27` opts in to upcoming-arrival
+    changes for those stations; `?topics=arrivals` limits which sections
+    are sent at all (vehicles, alerts, arrivals; default all). Answers 503
+    once this process holds STREAM_MAX_SUBSCRIBERS streams.
+    """
+
+    def _ids(name: str) -> set[str]:
+        return {part.strip() for part in request.args.get(name, "").split(",") if part.strip()}
+
+    routes = {r.upper() for r in _ids("routes")} or None
+    topics = frozenset(_ids("topics") & push.TOPICS) or push.TOPICS
+    app_broker = push.broker()
+    subscription = app_broker.subscribe(routes, _ids("stations"), topics)
+    if subscription is None:
+        body = jsonify({"error": "too many open streams, poll the REST endpoints instead"})
+        return body, 503, {"Retry-After": str(push.FULL_RETRY_AFTER_SECONDS)}
+    return Response(
+        push.stream(subscription, app_broker),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    return jsonify(data)
 
 
 @api_bp.post("/ingest/run")
 def trigger_ingest() -> tuple:
     """Manual trigger for the ETL job, gated behind a shared secret. Useful
     as a fallback if the in-process scheduler isn't available (e.g. a
-    serverless/cold-start hosting environment), or just for testing.
+    serverless/cold-start hosting environment), or just for testing. Answers
+    409 while another process holds ingest leadership.
     """
     secret = current_app.config.get("INGEST_TRIGGER_SECRET")
     if secret and request.headers.get("X-Ingest-Secret") != secret:
         return jsonify({"error": "unauthorized"}), 401
 
-    from app.etl import run_ingest
-
-    run = run_ingest()
+    run = coordination.ingest_if_leader(hold=False)
+    if run is None:
+        return jsonify({"error": "another process is the ingest leader"}), 409
     status_code = 200 if run.status == "success" else 502
     return jsonify(run.to_dict()), status_code
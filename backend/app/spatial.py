@@ -0,0 +1,152 @@
+"""
+In-memory spatial index over the seeded stations, plus a station -> routes
+map, for "what's within walking distance" lookups.
+
+Stations never move at runtime, so they're bucketed once into a uniform
+lat/lon grid (cells ~250 m on a side). A radius query only looks at the
+cells overlapping the query circle instead of range-scanning the unindexed
+lat/lon columns in the database. The served-routes map is derived from
+`route_segments` and rebuilt whenever an ingest cycle adds new edges.
+"""
+
+import math
+import threading
+from dataclasses import dataclass
+
+from flask import Flask, current_app
+
+from app.extensions import db
+from app.models import RouteSegment, Station
+
+_EXTENSION_KEY = "spatial"
+
+METERS_PER_DEG = 111_000.0
+_CELL_METERS = 250.0
+_CELL_DEG = _CELL_METERS / METERS_PER_DEG
+
+
+@dataclass(frozen=True)
+class NearbyStation:
+    stop_id: str
+    name: str
+    lat: float
+    lon: float
+    distance_m: float
+
+
+def _distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Equirectangular distance, scaled at the first point's latitude."""
+    return math.hypot(
+        (lat2 - lat1) * METERS_PER_DEG,
+        (lon2 - lon1) * METERS_PER_DEG * math.cos(math.radians(lat1)),
+    )
+
+
+class StationIndex:
+    """Uniform-grid index of stations. Cells are square in degrees of
+    latitude; longitude cells are widened so they cover at least the same
+    ground distance at NYC's latitude.
+    """
+
+    def __init__(self, stations: list[tuple[str, str, float, float]]) -> None:
+        self._lon_cell_deg = _CELL_DEG / math.cos(math.radians(40.7))
+        self._stations = {stop_id: (stop_id, name, lat, lon) for stop_id, name, lat, lon in stations}
+        self._cells: dict[tuple[int, int], list[tuple[str, str, float, float]]] = {}
+        for station in self._stations.values():
+            self._cells.setdefault(self._cell(station[2], station[3]), []).append(station)
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return math.floor(lat / _CELL_DEG), math.floor(lon / self._lon_cell_deg)
+
+    def __contains__(self, stop_id: str) -> bool:
+        return stop_id in self._stations
+
+    def near_point(self, lat: float, lon: float, radius_m: float) -> list[NearbyStation]:
+        """Stations within `radius_m` of (lat, lon), nearest first."""
+        reach = math.ceil(radius_m / _CELL_METERS)
+        row, col = self._cell(lat, lon)
+        found = []
+        for r in range(row - reach, row + reach + 1):
+            for c in range(col - reach, col + reach + 1):
+                for stop_id, name, s_lat, s_lon in self._cells.get((r, c), ()):
+                    dist = _distance_m(lat, lon, s_lat, s_lon)
+                    if dist <= radius_m:
+                        found.append(NearbyStation(stop_id, name, s_lat, s_lon, dist))
+        found.sort(key=lambda s: s.distance_m)
+        return found
+
+    def near_station(self, stop_id: str, radius_m: float) -> list[NearbyStation]:
+        """Other stations within `radius_m` of `stop_id`, nearest first."""
+        station = self._stations.get(stop_id)
+        if station is None:
+            return []
+        return [s for s in self.near_point(station[2], station[3], radius_m) if s.stop_id != stop_id]
+
+
+class SpatialState:
+    def __init__(self) -> None:
+        self.stations: StationIndex | None = None
+        self.routes_by_station: dict[str, tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+
+    def rebuild_stations(self) -> StationIndex:
+        rows = db.session.query(Station.stop_id, Station.name, Station.lat, Station.lon).all()
+        self.stations = StationIndex([tuple(row) for row in rows])
+        return self.stations
+
+    def rebuild_routes(self) -> None:
+        routes: dict[str, set[str]] = {}
+        for route_id, stop_a, stop_b in db.session.query(
+            RouteSegment.route_id, RouteSegment.stop_id_a, RouteSegment.stop_id_b
+        ):
+            routes.setdefault(stop_a, set()).add(route_id)
+            routes.setdefault(stop_b, set()).add(route_id)
+        self.routes_by_station = {stop_id: tuple(sorted(ids)) for stop_id, ids in routes.items()}
+
+    def index(self) -> StationIndex:
+        stations = self.stations
+        if stations is None:
+            with self._lock:
+                stations = self.stations
+                if stations is None:
+                    self.rebuild_routes()
+                    stations = self.rebuild_stations()
+        return stations
+
+
+def init_app(app: Flask) -> None:
+    app.extensions[_EXTENSION_KEY] = SpatialState()
+
+
+def _state() -> SpatialState:
+    state: SpatialState = current_app.extensions[_EXTENSION_KEY]
+    return state
+
+
+def rebuild() -> None:
+    """Rebuild the station grid and the served-routes map (after seeding)."""
+    state = _state()
+    state.rebuild_routes()
+    state.rebuild_stations()
+
+
+def rebuild_routes() -> None:
+    """Refresh only the served-routes map (after new segments are ingested)."""
+    _state().rebuild_routes()
+
+
+def nearby(stop_id: str, radius_m: float = 400) -> list[NearbyStation]:
+    """Other stations within `radius_m` metres of `stop_id`, nearest first."""
+    return _state().index().near_station(stop_id, radius_m)
+
+
+def near_point(lat: float, lon: float, radius_m: float = 400) -> list[NearbyStation]:
+    """Stations within `radius_m` metres of (lat, lon), nearest first."""
+    return _state().index().near_point(lat, lon, radius_m)
+
+
+def routes_serving(stop_id: str) -> tuple[str, ...]:
+    """Route ids with at least one known segment touching `stop_id`."""
+    state = _state()
+    state.index()  # make sure the routes map has been built at least once
+    return state.routes_by_station.get(stop_id, ())
@@ -0,0 +1,180 @@
+"""
+Pre-serialized responses for the endpoints whose data only changes at
+seed time (stations, route shapes at each simplification level) or
+rarely (route segments, which grow as new edges are observed).
+
+Rather than loading every row through the ORM and re-encoding JSON on each
+request, each body is built once, compressed up front (gzip, plus brotli
+when the optional `brotli` package is installed) and tagged with a content
+hash. Requests then cost a header check: a matching `If-None-Match` gets a
+bodiless 304, anything else gets the stored bytes in the best encoding the
+client accepts.
+"""
+
+import functools
+import gzip
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from typing import Callable
+
+from flask import Flask, Response, current_app, request
+
+from app.extensions import db
+from app.geometry import SIMPLIFY_TOLERANCES_M, unpack_points
+from app.models import RouteSegment, RouteShape, RouteShapeLevel, Station
+
+try:  # optional: `pip install brotli` (see the "brotli" extra in pyproject.toml)
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+_EXTENSION_KEY = "static_responses"
+
+
+@dataclass(frozen=True)
+class PrecomputedResponse:
+    etag: str
+    identity: bytes
+    gzip: bytes
+    br: bytes | None
+
+
+def precompute(body: bytes) -> PrecomputedResponse:
+    return PrecomputedResponse(
+        etag=hashlib.sha256(body).hexdigest()[:32],
+        identity=body,
+        gzip=gzip.compress(body, compresslevel=9, mtime=0),
+        br=brotli.compress(body, quality=9) if brotli is not None else None,
+    )
+
+
+def _build_stations() -> bytes:
+    rows = db.session.query(Station.stop_id, Station.name, Station.lat, Station.lon).order_by(Station.stop_id)
+    return current_app.json.dumps(
+        [{"stop_id": r.stop_id, "name": r.name, "lat": r.lat, "lon": r.lon} for r in rows]
+    ).encode()
+
+
+def _build_route_shapes(tolerance_m: int | None = None) -> bytes:
+    """Every shape at full resolution, or at one simplification level.
+    Shapes without a stored level (none should be) fall back to full detail.
+    """
+    query = db.session.query(RouteShape.shape_id, RouteShape.route_id, RouteShape.points_blob)
+    if tolerance_m is not None:
+        query = db.session.query(
+            RouteShape.shape_id,
+            RouteShape.route_id,
+            db.func.coalesce(RouteShapeLevel.points_blob, RouteShape.points_blob),
+        ).outerjoin(
+            RouteShapeLevel,
+            (RouteShapeLevel.shape_id == RouteShape.shape_id) & (RouteShapeLevel.tolerance_m == tolerance_m),
+        )
+    parts = [
+        '{"points":%s,"route_id":%s,"shape_id":%s}'
+        % (json.dumps(unpack_points(blob).tolist()), json.dumps(route_id), json.dumps(shape_id))
+        for shape_id, route_id, blob in query.order_by(RouteShape.shape_id)
+    ]
+    return ("[" + ",".join(parts) + "]").encode()
+
+
+def route_shapes_name(tolerance_m: int | None = None) -> str:
+    """Cache key of the route-shapes response at a simplification level."""
+    return "route-shapes" if tolerance_m is None else f"route-shapes@{tolerance_m}"
+
+
+def _build_route_segments() -> bytes:
+    """Every edge with both endpoints' positions, in one joined statement."""
+    a, b = db.aliased(Station), db.aliased(Station)
+    rows = (
+        db.session.query(RouteSegment.route_id, a.stop_id, a.lat, a.lon, b.stop_id, b.lat, b.lon)
+        .join(a, a.stop_id == RouteSegment.stop_id_a)
+        .join(b, b.stop_id == RouteSegment.stop_id_b)
+        .order_by(RouteSegment.id)
+    )
+    return current_app.json.dumps(
+        [
+            {
+                "route_id": route_id,
+                "a": {"stop_id": a_id, "lat": a_lat, "lon": a_lon},
+                "b": {"stop_id": b_id, "lat": b_lat, "lon": b_lon},
+            }
+            for route_id, a_id, a_lat, a_lon, b_id, b_lat, b_lon in rows
+        ]
+    ).encode()
+
+
+_BUILDERS: dict[str, Callable[[], bytes]] = {
+    "stations": _build_stations,
+    "route-shapes": _build_route_shapes,
+    "route-segments": _build_route_segments,
+    **{
+        route_shapes_name(tolerance): functools.partial(_build_route_shapes, tolerance)
+        for tolerance in SIMPLIFY_TOLERANCES_M
+    },
+}
+
+
+class StaticResponseCache:
+    """Per-app store of precomputed responses, keyed by name."""
+
+    def __init__(self) -> None:
+        self._responses: dict[str, PrecomputedResponse] = {}
+        self._lock = threading.Lock()
+
+    def rebuild(self, name: str) -> PrecomputedResponse:
+        response = precompute(_BUILDERS[name]())
+        self._responses[name] = response
+        return response
+
+    def get(self, name: str) -> PrecomputedResponse:
+        response = self._responses.get(name)
+        if response is not None:
+            return response
+        with self._lock:
+            return self._responses.get(name) or self.rebuild(name)
+
+
+def init_app(app: Flask) -> None:
+    app.extensions[_EXTENSION_KEY] = StaticResponseCache()
+
+
+def rebuild(*names: str) -> None:
+    """Re-render the named responses from the database, e.g. after seeding
+    or once an ingest cycle has added route segments.
+    """
+    cache = current_app.extensions[_EXTENSION_KEY]
+    for name in names or tuple(_BUILDERS):
+        cache.rebuild(name)
+
+
+def _negotiate(precomputed: PrecomputedResponse) -> tuple[bytes, str | None]:
+    accepted = request.accept_encodings
+    if precomputed.br is not None and accepted["br"]:
+        return precomputed.br, "br"
+    if accepted["gzip"]:
+        return precomputed.gzip, "gzip"
+    return precomputed.identity, None
+
+
+def serve(name: str) -> Response:
+    """Answer the current request from the named precomputed response,
+    honoring If-None-Match and Accept-Encoding.
+    """
+    precomputed: PrecomputedResponse = current_app.extensions[_EXTENSION_KEY].get(name)
+
+    # One weak validator for every encoding of the same JSON document
+    if request.if_none_match.contains_weak(precomputed.etag):
+        response = Response(status=304)
+    else:
+        body, encoding = _negotiate(precomputed)
+        response = Response(body, mimetype="application/json")
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+
+    response.set_etag(precomputed.etag, weak=True)
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
+
@@ -0,0 +1,57 @@
+"""
+Standalone ingest worker: `python -m app.worker`.
+
+Runs the ingest on INGEST_INTERVAL_SECONDS in its own process, so web
+workers (ENABLE_SCHEDULER=false) only serve requests and follow its
+results through the database (see app/coordination.py). Starting more
+than one worker is safe -- only the ingest leader fetches; the others
+stand by and take over if it dies.
+"""
+
+import logging
+from datetime import datetime
+
+from apscheduler.schedulers.blocking import BlockingScheduler
+from flask import Flask
+
+from app import create_app, metrics
+from app.config import WorkerConfig
+from app.coordination import ingest_if_leader, leader
+
+logger = logging.getLogger(__name__)
+
+
+def run(app: Flask) -> None:
+    """Block, running one leader-gated ingest per interval."""
+
+    def _job() -> None:
+        with app.app_context():
+            ingest_if_leader()
+
+    if app.config["METRICS_ENABLED"] and app.config["METRICS_PORT"]:
+        metrics.serve(app, app.config["METRICS_PORT"])
+
+    scheduler = BlockingScheduler()
+    scheduler.add_job(
+        _job,
+        "interval",
+        seconds=app.config["INGEST_INTERVAL_SECONDS"],
+        id="ingest_job",
+        next_run_time=datetime.now(),
+        max_instances=1,
+        coalesce=True,
+    )
+    logger.info("Ingest worker started, every %ss", app.config["INGEST_INTERVAL_SECONDS"])
+    try:
+        scheduler.start()
+    finally:
+        with app.app_context():
+            leader().release()
+
+
+def main() -> None:
+    run(create_app(WorkerConfig))
+
+
+if __name__ == "__main__":
+    main()
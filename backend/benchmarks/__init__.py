@@ -0,0 +1,3 @@
+"""Standalone performance benchmarks. Run from backend/, e.g.
+`python -m benchmarks.bench_projection`. Not collected by pytest.
+"""
@@ -0,0 +1,122 @@
+"""
+Incremental headway buckets vs recomputing from raw observations.
+
+Loads a synthetic week of observed arrivals (trains every ~6 minutes on
+`--routes` routes x 2 directions x `--stops` stations, with jitter so some
+bunch) into an in-memory SQLite database through `record_arrivals`, then
+compares, for a 3 h and a 1-week window:
+
+  * buckets : the /api/stats/headways path -- SUM over hourly buckets
+  * raw     : re-deriving the same stats from `observed_arrivals`, ordering
+              each station's arrivals and differencing them
+
+It also reports the per-cycle cost of the incremental update itself.
+
+    python -m benchmarks.bench_headways [--days 7] [--routes 4] [--stops 20]
+"""
+
+import argparse
+import math
+import random
+import time
+from datetime import datetime, timedelta
+
+from app import create_app
+from app.config import TestConfig
+from app.extensions import db
+from app.headways import ObservedStop, headway_stats, record_arrivals
+from app.models import ObservedArrival
+
+
+def _synthetic_arrivals(start: datetime, days: int, routes: int, stops: int, seed: int = 1) -> list[ObservedStop]:
+    rng = random.Random(seed)
+    arrivals = []
+    end = start + timedelta(days=days)
+    for r in range(routes):
+        for direction in "NS":
+            for s in range(stops):
+                moment, trip = start + timedelta(seconds=rng.uniform(0, 360)), 0
+                while moment < end:
+                    arrivals.append(ObservedStop(f"{r}{direction}{trip}", f"R{r}", direction, f"S{s}", moment))
+                    moment += timedelta(seconds=max(20.0, rng.gauss(360, 150)))
+                    trip += 1
+    arrivals.sort(key=lambda a: a.arrived_at)
+    return arrivals
+
+
+def _recompute_from_raw(hours: int) -> int:
+    since = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+    by_key: dict[tuple, list[datetime]] = {}
+    for route, direction, stop, arrived_at in (
+        db.session.query(ObservedArrival.route_id, ObservedArrival.direction, ObservedArrival.stop_id,
+                         ObservedArrival.arrived_at)
+        .filter(ObservedArrival.arrived_at >= since)
+        .order_by(ObservedArrival.arrived_at)
+    ):
+        by_key.setdefault((route, direction, stop), []).append(arrived_at)
+    for times in by_key.values():
+        gaps = [(b - a).total_seconds() for a, b in zip(times, times[1:])]
+        if gaps:
+            mean = sum(gaps) / len(gaps)
+            math.sqrt(sum((g - mean) ** 2 for g in gaps) / len(gaps))
+    return len(by_key)
+
+
+def _time(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--routes", type=int, default=4)
+    parser.add_argument("--stops", type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        end = datetime.utcnow().replace(microsecond=0)
+        start = end - timedelta(days=args.days)
+        arrivals = _synthetic_arrivals(start, args.days, args.routes, args.stops)
+
+        # Load history an hour at a time, then time ordinary 30 s cycles
+        tail = [a for a in arrivals if a.arrived_at >= end - timedelta(minutes=10)]
+        history = arrivals[: len(arrivals) - len(tail)]
+        started = time.perf_counter()
+        batch_start = 0
+        for i in range(1, len(history) + 1):
+            if i == len(history) or history[i].arrived_at.hour != history[batch_start].arrived_at.hour:
+                record_arrivals(history[batch_start:i])
+                batch_start = i
+        load_s = time.perf_counter() - started
+
+        cycles = 0
+        started = time.perf_counter()
+        cycle_start = tail[0].arrived_at if tail else end
+        batch: list[ObservedStop] = []
+        for a in tail:
+            if a.arrived_at - cycle_start >= timedelta(seconds=30):
+                record_arrivals(batch)
+                cycles += 1
+                batch, cycle_start = [], a.arrived_at
+            batch.append(a)
+        cycle_s = (time.perf_counter() - started) / max(cycles, 1)
+
+        print(f"{len(arrivals):,} observed arrivals over {args.days} days "
+              f"({args.routes} routes x 2 directions x {args.stops} stations); loaded in {load_s:.1f} s")
+        print(f"  incremental update : {cycle_s * 1000:8.2f} ms per 30 s cycle "
+              f"(~{len(tail) / max(cycles, 1):.0f} arrivals)")
+        for hours in (3, 24 * args.days):
+            buckets = _time(lambda: headway_stats(hours))
+            raw = _time(lambda: _recompute_from_raw(hours), repeat=2)
+            print(f"  {hours:4d} h window     : buckets {buckets * 1000:8.2f} ms | raw {raw * 1000:9.2f} ms "
+                  f"({raw / buckets:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
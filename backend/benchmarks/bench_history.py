@@ -0,0 +1,72 @@
+"""
+Footprint and scan speed of the position history store (app/history.py).
+
+Appends a synthetic stretch of ingest cycles -- `--vehicles` trains on ~25
+routes every 30 s -- then times a "positions for route X over N hours"
+query. For comparison it prints what the same data would cost as one row
+per vehicle in a plain table, estimated at ~120 bytes a row (five short
+strings plus a timestamp, before index overhead).
+
+    python -m benchmarks.bench_history [--hours 24] [--vehicles 500] [--query-hours 6]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app.history import RECORD_DTYPE, HistoryStore
+
+_ROUTES = list("1234567ABCDEFGJLMNQRWZ") + ["GS", "FS", "H", "SI"]
+_STATUSES = ["STOPPED_AT", "IN_TRANSIT_TO", "INCOMING_AT"]
+_TABLE_ROW_BYTES = 120
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--vehicles", type=int, default=500)
+    parser.add_argument("--query-hours", type=int, default=6)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    start = datetime(2025, 3, 24, 0, 0, 0)
+    cycles = args.hours * 120
+    with tempfile.TemporaryDirectory() as root:
+        store = HistoryStore(root)
+        started = time.perf_counter()
+        for cycle in range(cycles):
+            trip_base = cycle // 240 * args.vehicles  # trips turn over every ~2 h
+            vehicles = [
+                {
+                    "trip_id": f"{trip_base + i:06d}_{_ROUTES[i % len(_ROUTES)]}..N",
+                    "route_id": _ROUTES[i % len(_ROUTES)],
+                    "stop_id": str(100 + rng.randrange(450)),
+                    "location_status": rng.choice(_STATUSES),
+                }
+                for i in range(args.vehicles)
+            ]
+            store.append(start + timedelta(seconds=30 * cycle), vehicles)
+        append_s = time.perf_counter() - started
+
+        records = cycles * args.vehicles
+        footprint = sum(os.path.getsize(os.path.join(root, name)) for name in os.listdir(root))
+
+        q_start = start + timedelta(hours=args.hours // 2)
+        q_end = q_start + timedelta(hours=args.query_hours)
+        started = time.perf_counter()
+        found = store.positions(q_start, q_end, route_id="A")
+        query_s = time.perf_counter() - started
+
+    print(f"{records:,} positions ({cycles} cycles x {args.vehicles} vehicles, {args.hours} h)")
+    print(f"  append        : {append_s / cycles * 1000:8.2f} ms per cycle")
+    print(f"  on disk       : {footprint / 1e6:8.1f} MB  ({footprint / records:.1f} B/position, "
+          f"{RECORD_DTYPE.itemsize} B record + dictionaries)")
+    print(f"  row-per-vehicle table, est.: {records * _TABLE_ROW_BYTES / 1e6:8.1f} MB")
+    print(f"  route A, {args.query_hours} h : {query_s * 1000:8.2f} ms  ({len(found):,} positions)")
+
+
+if __name__ == "__main__":
+    main()
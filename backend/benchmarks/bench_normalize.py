@@ -0,0 +1,196 @@
+"""
+Fused single-pass trip normalization vs the three separate passes it replaced.
+
+Builds a synthetic feed the size of a busy weekday cycle (`--trips` trips
+spread over `--routes` routes, each trip listing its next ~`--stops` stops
+by real child stop id from the static GTFS) and compares:
+
+  * three-pass : vehicles, then trip_to_segment_pairs, then arrivals, each
+                 walking the trips and resolving parent stations again
+  * fused      : normalize_trips -- one walk over each trip's updates, with
+                 each stop resolved once per feed
+
+Both must produce the same records. It then times the cycle's writes on a
+file-backed SQLite database, committing after each of the three writers
+vs once for all of them (what run_ingest does).
+
+    python -m benchmarks.bench_normalize [--trips 600] [--routes 25] [--stops 30] [--cycles 10]
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from app import create_app
+from app.config import TestConfig
+from app.etl import (
+    ARRIVAL_HORIZON_SECONDS,
+    VEHICLE_RECORD_FIELDS,
+    FeedRecords,
+    _write_arrivals,
+    _write_route_segments,
+    _write_vehicles,
+    collect_arrival_generations,
+    normalize_trips,
+    resolve_parent_stop_id,
+    trip_to_segment_pairs,
+    trip_to_vehicle_record,
+)
+from app.extensions import db
+from app.gtfs_static import static_gtfs
+
+
+@dataclass
+class _Update:
+    stop_id: str
+    arrival: datetime | None
+    departure: datetime | None = None
+
+
+@dataclass
+class _Trip:
+    """The attributes of nyct_gtfs.Trip that the ETL reads."""
+
+    trip_id: str
+    route_id: str
+    direction: str
+    headsign_text: str
+    location: str
+    underway: bool = True
+    location_status: str = "IN_TRANSIT_TO"
+    has_delay_alert: bool = False
+    last_position_update: datetime = field(default_factory=datetime.utcnow)
+    stop_time_updates: list[_Update] = field(default_factory=list)
+
+
+def _synthetic_trips(trips: int, routes: int, stops: int, now: datetime, seed: int = 1) -> list[_Trip]:
+    rng = random.Random(seed)
+    children = sorted(static_gtfs().child_to_parent)
+    patterns = []
+    for r in range(routes):
+        start = rng.randrange(len(children) - 2 * stops)
+        patterns.append(children[start:start + 2 * stops])
+
+    feed = []
+    for t in range(trips):
+        r = t % routes
+        pattern = patterns[r] if t % 2 else patterns[r][::-1]
+        offset = rng.randrange(stops)
+        upcoming = pattern[offset:offset + stops]
+        moment = now - timedelta(seconds=rng.uniform(0, 120))  # the first stop is often just behind
+        updates = []
+        for stop_id in upcoming:
+            updates.append(_Update(stop_id, moment))
+            moment += timedelta(seconds=rng.uniform(60, 240))
+        feed.append(_Trip(f"{t:06d}_R{r}", f"R{r}", "NS"[t % 2], f"Terminal {r}", upcoming[0],
+                          stop_time_updates=updates))
+    return feed
+
+
+def _three_pass(trips, child_to_parent: dict[str, str], known_stop_ids: set[str], now_ts: float) -> FeedRecords:
+    """How the records were produced before normalize_trips fused the walks."""
+    records = FeedRecords(trip_count=len(trips))
+    for trip in trips:
+        vehicle = trip_to_vehicle_record(trip)
+        if vehicle:
+            vehicle["stop_id"] = resolve_parent_stop_id(vehicle["stop_id"], child_to_parent)
+            if vehicle["stop_id"] in known_stop_ids:
+                records.vehicles.append(tuple(vehicle[name] for name in VEHICLE_RECORD_FIELDS))
+
+    for trip in trips:
+        for key in trip_to_segment_pairs(trip, child_to_parent):
+            if key[1] in known_stop_ids and key[2] in known_stop_ids:
+                records.segments.add(key)
+
+    cutoff = now_ts + ARRIVAL_HORIZON_SECONDS
+    for trip in trips:
+        for update in trip.stop_time_updates:
+            arr = update.arrival or update.departure
+            if arr is None:
+                continue
+            arr_ts = arr.replace(tzinfo=timezone.utc).timestamp()
+            if arr_ts < now_ts or arr_ts > cutoff:
+                continue
+            parent = resolve_parent_stop_id(update.stop_id, child_to_parent)
+            if parent in known_stop_ids:
+                records.arrivals.append(
+                    (trip.trip_id, trip.route_id, trip.direction, trip.headsign_text, parent, int(arr_ts))
+                )
+    return records
+
+
+def _time(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _write_cycles(feeds: list[FeedRecords], cycles: int, single_transaction: bool) -> float:
+    elapsed = 0.0
+    for cycle in range(cycles):
+        feed = feeds[cycle % len(feeds)]
+        started = time.perf_counter()
+        for write, records in (
+            (_write_vehicles, feed.vehicles), (_write_route_segments, feed.segments), (_write_arrivals, feed.arrivals)
+        ):
+            write(records)
+            if not single_transaction:
+                db.session.commit()
+        if single_transaction:
+            db.session.commit()
+        elapsed += time.perf_counter() - started
+        collect_arrival_generations()  # as run_ingest does, outside the timed writes
+    return elapsed / cycles
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=600)
+    parser.add_argument("--routes", type=int, default=25)
+    parser.add_argument("--stops", type=int, default=30)
+    parser.add_argument("--cycles", type=int, default=10)
+    args = parser.parse_args()
+
+    gtfs = static_gtfs()
+    known = {s.stop_id for s in gtfs.parent_stations()}
+    now = datetime.utcnow().replace(microsecond=0)
+    now_ts = now.replace(tzinfo=timezone.utc).timestamp()
+    trips = _synthetic_trips(args.trips, args.routes, args.stops, now)
+    updates = sum(len(trip.stop_time_updates) for trip in trips)
+
+    fused = normalize_trips(trips, gtfs.child_to_parent, known, now_ts)
+    assert fused == _three_pass(trips, gtfs.child_to_parent, known, now_ts), "fused walk disagrees"
+    three = _time(lambda: _three_pass(trips, gtfs.child_to_parent, known, now_ts))
+    one = _time(lambda: normalize_trips(trips, gtfs.child_to_parent, known, now_ts))
+
+    print(f"{len(trips):,} trips, {updates:,} stop_time_updates -> {len(fused.vehicles)} vehicles, "
+          f"{len(fused.segments)} segments, {len(fused.arrivals):,} arrivals")
+    print(f"  normalize  : three-pass {three * 1000:7.2f} ms | fused {one * 1000:7.2f} ms ({three / one:.1f}x)")
+
+    # A second feed with the trains moved on, so vehicle diffs have work to do
+    later = _synthetic_trips(args.trips, args.routes, args.stops, now, seed=2)
+    feeds = [fused, normalize_trips(later, gtfs.child_to_parent, known, now_ts)]
+    with tempfile.TemporaryDirectory() as tmp:
+        class FileConfig(TestConfig):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{Path(tmp) / 'bench.db'}"
+
+        app = create_app(FileConfig)
+        with app.app_context():
+            _write_cycles(feeds, 2, single_transaction=True)  # warm up: segments land, pointer exists
+            separate = single = 0.0
+            for _ in range(2):  # interleaved, so neither side gets the warmer cache
+                separate += _write_cycles(feeds, args.cycles, single_transaction=False) / 2
+                single += _write_cycles(feeds, args.cycles, single_transaction=True) / 2
+            db.session.remove()
+    print(f"  writes     : 3 commits {separate * 1000:7.2f} ms | 1 commit {single * 1000:7.2f} ms per cycle")
+
+
+if __name__ == "__main__":
+    main()
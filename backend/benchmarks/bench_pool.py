@@ -0,0 +1,185 @@
+"""
+Load test of the connection pools: database-backed API reads while ingest
+cycles run back to back, with the ingest on its own pool ("separate") and
+on the request pool ("shared", DB_INGEST_POOL_SIZE=0).
+
+Each mode starts from empty tables and one ingest, then for `--duration`
+seconds an ingest thread runs full-size synthetic cycles (see
+benchmarks/bench_suite.py for the feed server) while `--concurrency`
+client threads -- gunicorn's --threads in the Dockerfile -- request the
+endpoints that query the database on every call. It reports read latency
+and errors (pool timeouts surface as 500s), ingest cycle times, and each
+pool's peak checkouts and waits as /api/health reports them.
+
+It's meant for Postgres, where one ingest transaction holds its connection
+for the whole write; point `--database-url` at a scratch database (its app
+tables are dropped). Without it a temporary SQLite file is used, which
+serializes writers anyway.
+
+    python -m benchmarks.bench_pool --database-url postgresql://localhost/transit_bench
+                                    [--duration 30] [--concurrency 32] [--pool-size 5] [--max-overflow 10]
+"""
+
+import argparse
+import logging
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest import mock
+
+import requests
+from sqlalchemy import create_engine
+from werkzeug.serving import make_server
+
+from app import create_app, database
+from app.config import Config, TestConfig
+from app.etl import run_ingest
+from app.extensions import db
+from benchmarks.bench_suite import _FeedServer, _percentile
+from benchmarks.synthetic_feed import SyntheticFeeds
+
+ENDPOINTS = (
+    "/api/health",
+    "/api/stats/alerts-by-route",
+    "/api/stats/alerts-history?hours=24",
+    "/api/stats/headways?route=A",
+    "/api/stats/bunching?route=A",
+)
+
+
+def _ingest_loop(app, feeds: SyntheticFeeds, server: _FeedServer, stop: threading.Event) -> list[float]:
+    cycles = []
+    with app.app_context():
+        while not stop.is_set():
+            server.publish(feeds.payloads(time.time()))
+            started = time.perf_counter()
+            run_ingest()
+            cycles.append(time.perf_counter() - started)
+    return cycles
+
+
+def _watch_pools(app, stop: threading.Event, peaks: dict[str, int]) -> None:
+    with app.app_context():
+        while not stop.wait(0.05):
+            for name, stats in database.pool_stats().items():
+                peaks[name] = max(peaks.get(name, 0), stats.get("checked_out", 0))
+
+
+def _client(base_url: str, stop: threading.Event, latencies: list[float], errors: list[int], offset: int) -> None:
+    session = requests.Session()
+    mine, failed, n = [], 0, offset
+    while not stop.is_set():
+        path = ENDPOINTS[n % len(ENDPOINTS)]
+        n += 1
+        started = time.perf_counter()
+        response = session.get(base_url + path, timeout=60)
+        response.content
+        mine.append(time.perf_counter() - started)
+        failed += response.status_code >= 400
+    latencies.extend(mine)
+    errors.append(failed)
+
+
+def run_mode(name: str, args, database_url: str, feed_server: _FeedServer, feeds: SyntheticFeeds, tmp: str) -> dict:
+    engine = create_engine(database_url)
+    db.metadata.drop_all(engine)
+    engine.dispose()
+
+    class PoolBenchConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = database_url
+        MTA_FEED_BASE_URL = feed_server.url
+        FEED_DECODE_PROCESSES = args.decode_processes
+        HEADWAY_ANALYTICS_ENABLED = True
+        GTFS_CACHE_DIR = str(Path(tmp) / "gtfs-cache")
+        DB_POOL_SIZE = args.pool_size
+        DB_MAX_OVERFLOW = args.max_overflow
+        DB_POOL_TIMEOUT = args.pool_timeout
+        DB_INGEST_POOL_SIZE = args.ingest_pool_size if name == "separate" else 0
+
+    app = create_app(PoolBenchConfig)
+    feed_server.publish(feeds.payloads(time.time()))
+    with app.app_context():
+        run_ingest()  # something for the endpoints to read
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    stop = threading.Event()
+    latencies: list[float] = []
+    errors: list[int] = []
+    peaks: dict[str, int] = {}
+    cycles: list[float] = []
+    threads = [threading.Thread(target=lambda: cycles.extend(_ingest_loop(app, feeds, feed_server, stop)))]
+    threads.append(threading.Thread(target=_watch_pools, args=(app, stop, peaks)))
+    threads += [
+        threading.Thread(target=_client, args=(base_url, stop, latencies, errors, i)) for i in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    pools = requests.get(base_url + "/api/health", timeout=60).json()["database_pools"]
+    stop.set()
+    for thread in threads:
+        thread.join()
+    server.shutdown()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+    return {
+        "reads": len(latencies),
+        "errors": sum(errors),
+        "throughput_rps": len(latencies) / args.duration,
+        "p50_ms": _percentile(latencies, 0.5) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies, default=0.0) * 1000,
+        "ingest_cycles": len(cycles),
+        "ingest_p50_ms": _percentile(cycles, 0.5) * 1000,
+        "pools": {pool: {**stats, "peak_checked_out": peaks.get(pool, 0)} for pool, stats in pools.items()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=2000)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load per mode")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--pool-size", type=int, default=Config.DB_POOL_SIZE)
+    parser.add_argument("--max-overflow", type=int, default=Config.DB_MAX_OVERFLOW)
+    parser.add_argument("--pool-timeout", type=int, default=Config.DB_POOL_TIMEOUT)
+    parser.add_argument("--ingest-pool-size", type=int, default=3)
+    parser.add_argument("--decode-processes", type=int, default=0)
+    parser.add_argument("--database-url", default="")
+    parser.add_argument("--mode", choices=("both", "shared", "separate"), default="both")
+    args = parser.parse_args()
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    tmp = tempfile.TemporaryDirectory()
+    database_url = args.database_url or f"sqlite:///{Path(tmp.name) / 'bench.db'}"
+    feeds = SyntheticFeeds(args.trips, now=datetime.now(timezone.utc).timestamp())
+    feed_server = _FeedServer()
+
+    modes = ("shared", "separate") if args.mode == "both" else (args.mode,)
+    with mock.patch("app.mta_alerts.ALERTS_FEED_URL", f"{feed_server.url}/alerts"):
+        results = {mode: run_mode(mode, args, database_url, feed_server, feeds, tmp.name) for mode in modes}
+    feed_server.close()
+
+    print(f"{feeds.trip_count():,} trips, {args.concurrency} client threads, {args.duration:g} s per mode, "
+          f"request pool {args.pool_size}+{args.max_overflow}")
+    for mode, result in results.items():
+        print(f"  {mode:8s} reads : {result['throughput_rps']:8.1f} req/s  p50 {result['p50_ms']:7.2f} ms  "
+              f"p99 {result['p99_ms']:8.2f} ms  max {result['max_ms']:8.2f} ms  {result['errors']} errors")
+        print(f"  {mode:8s} ingest: {result['ingest_cycles']} cycles, p50 {result['ingest_p50_ms']:.0f} ms")
+        for pool, stats in result["pools"].items():
+            print(f"    {pool:8s} pool : peak {stats['peak_checked_out']} checked out of "
+                  f"{stats.get('size', '?')}+{stats.get('max_overflow', '?')}, "
+                  f"wait mean {stats.get('wait_ms_mean', 0):.2f} ms max {stats.get('wait_ms_max', 0):.2f} ms, "
+                  f"{stats.get('timeouts', 0)} timeouts")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Old vs new station-onto-shape projection for /api/routes/<id>/stops.
+
+The old path called the pure-Python `project_point_onto_polyline` once per
+station per direction on every request; the new path projects all of a
+route's stations in one NumPy call (and only when the route's stop order
+is first built, since the result is cached). Sizes mirror a long MTA route:
+~2,000 shape points and ~70 stations, two directions.
+
+    python -m benchmarks.bench_projection [--points 2000] [--stations 70] [--repeat 20]
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from app.geometry import project_point_onto_polyline, project_points_onto_polyline
+
+
+def _synthetic_route(n_points: int, n_stations: int, seed: int = 1) -> tuple[list[list[float]], list[tuple[float, float]]]:
+    rng = random.Random(seed)
+    lat, lon = 40.57, -74.00
+    shape = []
+    for _ in range(n_points):
+        shape.append([lat, lon])
+        lat += rng.uniform(0.0, 0.0003)
+        lon += rng.uniform(-0.0002, 0.0002)
+    stations = [
+        (p[0] + rng.uniform(-0.0005, 0.0005), p[1] + rng.uniform(-0.0005, 0.0005))
+        for p in rng.sample(shape, n_stations)
+    ]
+    return shape, stations
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=2000)
+    parser.add_argument("--stations", type=int, default=70)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    shape, stations = _synthetic_route(args.points, args.stations)
+    shape_arr, stations_arr = np.array(shape), np.array(stations)
+
+    def old_path() -> None:
+        for _ in range(2):  # both directions
+            [project_point_onto_polyline(lat, lon, shape) for lat, lon in stations]
+
+    def new_path() -> None:
+        for _ in range(2):
+            project_points_onto_polyline(stations_arr, shape_arr)
+
+    old = _time(old_path, args.repeat)
+    new = _time(new_path, args.repeat)
+    print(f"{args.stations} stations x {args.points} shape points x 2 directions (best of {args.repeat})")
+    print(f"  python loop : {old * 1000:8.2f} ms")
+    print(f"  numpy batch : {new * 1000:8.2f} ms  ({old / new:.1f}x faster)")
+    print("  per request : cached after first build, only vehicles are merged")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Static-GTFS startup cost: the old per-consumer `csv.DictReader` passes vs
+the single loader in app/gtfs_static.py, cold (parsing) and warm (array cache).
+
+The bundled data has no shapes.txt, so a synthetic one is generated with
+`--shape-points` points for every shape_id in trips.txt (MTA's real file
+is ~150k rows) to show the cost the loader avoids once it's present.
+
+    python -m benchmarks.bench_static_load [--shape-points 500] [--repeat 5]
+"""
+
+import argparse
+import csv
+import os
+import shutil
+import tempfile
+import time
+
+from app.gtfs_static import DATA_DIR, load_cached, parse
+
+
+def _old_startup(data_dir: str) -> None:
+    """What each process did before: four separate DictReader passes."""
+    stops, trips, shapes = (os.path.join(data_dir, n) for n in ("stops.txt", "trips.txt", "shapes.txt"))
+    with open(stops, newline="", encoding="utf-8") as f:  # seed_stations
+        [(r["stop_id"], r["stop_name"], float(r["stop_lat"]), float(r["stop_lon"]))
+         for r in csv.DictReader(f) if r.get("location_type") == "1"]
+    with open(stops, newline="", encoding="utf-8") as f:  # _load_child_to_parent_map
+        {r["stop_id"]: r["parent_station"] for r in csv.DictReader(f) if r.get("parent_station")}
+    shape_to_route: dict[str, str] = {}
+    with open(trips, newline="", encoding="utf-8") as f:  # seed_shapes
+        for r in csv.DictReader(f):
+            shape_to_route.setdefault(r["shape_id"], r["route_id"])
+    points: dict[str, list] = {}
+    with open(shapes, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            points.setdefault(r["shape_id"], []).append(
+                (int(r["shape_pt_sequence"]), float(r["shape_pt_lat"]), float(r["shape_pt_lon"]))
+            )
+    for pts in points.values():
+        pts.sort(key=lambda p: p[0])
+    with open(trips, newline="", encoding="utf-8") as f:  # routes._shape_directions
+        directions: dict[str, tuple[int, str]] = {}
+        for r in csv.DictReader(f):
+            directions.setdefault(r["shape_id"], (int(r["direction_id"]), r["trip_headsign"]))
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shape-points", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        data_dir, cache_dir = os.path.join(root, "data"), os.path.join(root, "cache")
+        os.mkdir(data_dir)
+        shutil.copy(os.path.join(DATA_DIR, "stops.txt"), data_dir)
+        shutil.copy(os.path.join(DATA_DIR, "trips.txt"), data_dir)
+        shape_ids = {s for s in parse(data_dir).shapes}
+        with open(os.path.join(data_dir, "shapes.txt"), "w", encoding="utf-8") as f:
+            f.write("shape_id,shape_pt_lat,shape_pt_lon,shape_pt_sequence\n")
+            for shape_id in sorted(shape_ids):
+                for i in range(args.shape_points):
+                    f.write(f"{shape_id},{40.6 + i * 1e-4:.6f},{-74.0 + i * 5e-5:.6f},{i}\n")
+
+        old = _time(lambda: _old_startup(data_dir), args.repeat)
+        cold = _time(lambda: parse(data_dir), args.repeat)
+        load_cached(data_dir, cache_dir)  # write the cache
+        warm = _time(lambda: load_cached(data_dir, cache_dir), args.repeat)
+        cache_bytes = sum(os.path.getsize(os.path.join(cache_dir, n)) for n in os.listdir(cache_dir))
+
+    rows = len(shape_ids) * args.shape_points
+    print(f"stops.txt + trips.txt (20k rows) + synthetic shapes.txt ({rows:,} rows), best of {args.repeat}")
+    print(f"  old: 4 DictReader passes : {old * 1000:8.1f} ms")
+    print(f"  loader, cold parse       : {cold * 1000:8.1f} ms  ({old / cold:.1f}x)")
+    print(f"  loader, array cache      : {warm * 1000:8.1f} ms  ({old / warm:.1f}x, {cache_bytes / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
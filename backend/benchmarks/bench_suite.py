@@ -0,0 +1,307 @@
+"""
+End-to-end benchmark of the ingest and the read API, with results saved as
+JSON so runs can be compared across commits (see benchmarks/compare.py).
+
+A local server plays api-endpoint.mta.info, serving full-size synthetic
+feeds (benchmarks/synthetic_feed.py: `--trips` trips over the real
+stations) plus the sample alerts feed. The suite then:
+
+  * ingest : runs one cold cycle (empty tables) and `--cycles` warm ones
+             through run_ingest, the clock moving `--interval` seconds a
+             cycle so trains advance. It reports end-to-end time and each
+             stage's time, read from the metrics run_ingest records.
+  * api    : serves the app on a local threaded server and sends
+             `--requests` GETs to each main endpoint from `--concurrency`
+             client threads. It reports throughput and p50/p99 latency.
+
+The database defaults to a temporary SQLite file. `--database-url
+postgresql://...` runs it against Postgres. Its app tables are dropped
+first, so point it at a scratch database.
+
+    python -m benchmarks.bench_suite [--trips 2000] [--cycles 5] [--requests 500] [--concurrency 8]
+                                     [--database-url URL] [--output results.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+import requests
+from google.protobuf.json_format import ParseDict
+from nyct_gtfs.compiled_gtfs import gtfs_realtime_pb2
+from sqlalchemy import create_engine
+from werkzeug.serving import make_server
+
+from app import create_app, metrics
+from app.config import Config, TestConfig
+from app.etl import _FEED_PATHS, run_ingest
+from app.extensions import db
+from app.models import StopArrival
+from benchmarks.synthetic_feed import SyntheticFeeds
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+ALERTS_FIXTURE = BACKEND_DIR / "tests" / "fixtures" / "mta_alerts_response.json"
+
+STAGES = ("fetch", "vehicles", "segments", "arrivals", "commit", "alerts", "publish", "gc")
+
+
+class _FeedServer:
+    """Serves the current payload for each feed path, and the alerts feed."""
+
+    def __init__(self) -> None:
+        self.payloads: dict[str, bytes] = {}
+        alerts = json.loads(ALERTS_FIXTURE.read_text())
+        alerts_bytes = ParseDict(alerts, gtfs_realtime_pb2.FeedMessage(), ignore_unknown_fields=True).SerializeToString()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.lstrip("/")
+                body = alerts_bytes if path == "alerts" else server.payloads.get(path)
+                if body is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-protobuf")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def publish(self, payloads: dict[str, bytes]) -> None:
+        self.payloads = {_FEED_PATHS[group]: body for group, body in payloads.items()}
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _summary(seconds: list[float]) -> dict:
+    return {
+        "p50_ms": round(_percentile(seconds, 0.5) * 1000, 3),
+        "max_ms": round(max(seconds, default=0.0) * 1000, 3),
+        "mean_ms": round(statistics.fmean(seconds) * 1000, 3) if seconds else 0.0,
+    }
+
+
+def _stage_totals() -> dict[str, float]:
+    histogram = metrics.registry().ingest_stage_seconds
+    return {stage: histogram.total(stage) for stage in STAGES}
+
+
+def _timed_cycle(feeds: SyntheticFeeds, server: _FeedServer, now: float) -> tuple[float, dict[str, float]]:
+    server.publish(feeds.payloads(now))
+    before = _stage_totals()
+    with mock.patch("app.etl.time.time", return_value=now):  # run_ingest's idea of "now"
+        started = time.perf_counter()
+        run = run_ingest()
+        elapsed = time.perf_counter() - started
+    if run.status != "success":
+        raise RuntimeError(f"ingest cycle failed: {run.error_message}")
+    after = _stage_totals()
+    return elapsed, {stage: after[stage] - before[stage] for stage in STAGES}
+
+
+def bench_ingest(feeds: SyntheticFeeds, server: _FeedServer, cycles: int, interval: float, start: float) -> dict:
+    cold, cold_stages = _timed_cycle(feeds, server, start)
+    warm, per_stage = [], {stage: [] for stage in STAGES}
+    for cycle in range(1, cycles + 1):
+        elapsed, stages = _timed_cycle(feeds, server, start + cycle * interval)
+        warm.append(elapsed)
+        for stage, seconds in stages.items():
+            per_stage[stage].append(seconds)
+
+    return {
+        "cold_cycle_ms": round(cold * 1000, 3),
+        "cold_stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in cold_stages.items()},
+        "cycles": cycles,
+        "end_to_end": _summary(warm),
+        "stages": {stage: _summary(seconds) for stage, seconds in per_stage.items()},
+        "rows_written": {f"{table}.{op}": int(n) for (table, op), n in metrics.registry().rows_written.items()},
+    }
+
+
+def _endpoints(busiest_stop: str) -> dict[str, str]:
+    return {
+        "health": "/api/health",
+        "stations": "/api/stations",
+        "vehicles": "/api/vehicles",
+        "vehicles_by_route": "/api/vehicles?route=A",
+        "alerts": "/api/alerts",
+        "route_segments": "/api/route-segments",
+        "route_shapes": "/api/route-shapes?zoom=12",
+        "station_arrivals": f"/api/stations/{busiest_stop}/arrivals",
+        "route_stops": "/api/routes/A/stops",
+        "stations_near": "/api/stations/near?lat=40.7527&lon=-73.9772",
+        "alerts_by_route": "/api/stats/alerts-by-route",
+    }
+
+
+def _load(url: str, requests_total: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+    per_thread = max(1, requests_total // concurrency)
+
+    def _client() -> None:
+        nonlocal errors
+        session = requests.Session()
+        mine, failed = [], 0
+        for _ in range(per_thread):
+            started = time.perf_counter()
+            response = session.get(url, timeout=30)
+            response.content
+            mine.append(time.perf_counter() - started)
+            failed += response.status_code >= 400
+        with lock:
+            latencies.extend(mine)
+            errors += failed
+
+    threads = [threading.Thread(target=_client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.5) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def bench_api(app, requests_total: int, concurrency: int) -> dict:
+    with app.app_context():
+        busiest = (
+            db.session.query(StopArrival.stop_id)
+            .group_by(StopArrival.stop_id)
+            .order_by(db.func.count().desc())
+            .limit(1)
+            .scalar()
+        ) or "127"
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # one line per request otherwise
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    try:
+        return {
+            name: _load(base_url + path, requests_total, concurrency) for name, path in _endpoints(busiest).items()
+        }
+    finally:
+        server.shutdown()
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=2000)
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--interval", type=float, default=30.0, help="simulated seconds between cycles")
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--decode-processes", type=int, default=Config.FEED_DECODE_PROCESSES)
+    parser.add_argument("--database-url", default="")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="", help="default: benchmarks/results/<commit>-<database>.json")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    database_url = args.database_url or f"sqlite:///{Path(tmp.name) / 'bench.db'}"
+    engine = create_engine(database_url)
+    db.metadata.drop_all(engine)  # start from empty tables, every run
+    dialect = engine.dialect.name
+    engine.dispose()
+
+    feed_server = _FeedServer()
+
+    class BenchConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = database_url
+        MTA_FEED_BASE_URL = feed_server.url
+        FEED_DECODE_PROCESSES = args.decode_processes
+        HEADWAY_ANALYTICS_ENABLED = True
+        GTFS_CACHE_DIR = str(Path(tmp.name) / "gtfs-cache")
+
+    start = datetime.now(timezone.utc).timestamp()
+    feeds = SyntheticFeeds(args.trips, now=start, seed=args.seed)
+    sample = feeds.payloads(start)
+
+    with mock.patch("app.mta_alerts.ALERTS_FEED_URL", f"{feed_server.url}/alerts"):
+        app = create_app(BenchConfig)
+        with app.app_context():
+            ingest = bench_ingest(feeds, feed_server, args.cycles, args.interval, start)
+        api = bench_api(app, args.requests, args.concurrency)
+    feed_server.close()
+
+    results = {
+        "meta": {
+            "commit": _git("rev-parse", "--short", "HEAD"),
+            "dirty": bool(_git("status", "--porcelain", "--", ".")),
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "database": dialect,
+            "args": {name: value for name, value in vars(args).items() if name not in ("database_url", "output")},
+        },
+        "feed": {
+            "trips": feeds.trip_count(),
+            "bytes": sum(len(body) for body in sample.values()),
+        },
+        "ingest": ingest,
+        "api": api,
+    }
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{results['meta']['commit'] or 'local'}-{dialect}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2) + "\n")
+
+    print(f"{feeds.trip_count():,} trips, {results['feed']['bytes'] / 1e6:.1f} MB of feeds, {dialect}")
+    print(f"  ingest cold  : {ingest['cold_cycle_ms']:9.1f} ms")
+    print(f"  ingest warm  : {ingest['end_to_end']['p50_ms']:9.1f} ms p50 over {args.cycles} cycles")
+    for stage, summary in ingest["stages"].items():
+        print(f"    {stage:10s} : {summary['p50_ms']:9.1f} ms")
+    for name, result in api.items():
+        print(f"  {name:18s} : {result['throughput_rps']:8.1f} req/s  p50 {result['p50_ms']:7.2f} ms  "
+              f"p99 {result['p99_ms']:7.2f} ms" + (f"  ({result['errors']} errors)" if result["errors"] else ""))
+    print(f"Results written to {output}")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Compare two bench_suite result files, e.g. the main branch's against a
+change's. It prints every timing side by side and flags those that got
+worse by more than `--threshold` percent. It exits 1 if any did, so the
+comparison can gate CI. Only compare runs from the same machine and
+database: the meta blocks of both runs are printed first for that reason.
+
+    python -m benchmarks.compare benchmarks/results/abc1234-sqlite.json benchmarks/results/def5678-sqlite.json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def _timings(results: dict) -> dict[str, tuple[float, bool]]:
+    """Flattened metric name -> (value, higher is better)."""
+    ingest = results["ingest"]
+    flat = {"ingest.cold_cycle_ms": (ingest["cold_cycle_ms"], False)}
+    flat["ingest.end_to_end.p50_ms"] = (ingest["end_to_end"]["p50_ms"], False)
+    for stage, summary in ingest["stages"].items():
+        flat[f"ingest.{stage}.p50_ms"] = (summary["p50_ms"], False)
+    for endpoint, summary in results["api"].items():
+        flat[f"api.{endpoint}.throughput_rps"] = (summary["throughput_rps"], True)
+        flat[f"api.{endpoint}.p50_ms"] = (summary["p50_ms"], False)
+        flat[f"api.{endpoint}.p99_ms"] = (summary["p99_ms"], False)
+    return flat
+
+
+def compare(before: dict, after: dict, threshold: float) -> list[str]:
+    """Print the comparison; return the names of the regressed metrics."""
+    old, new = _timings(before), _timings(after)
+    regressions = []
+    for name in sorted(old.keys() & new.keys()):
+        (was, higher_is_better), (now, _) = old[name], new[name]
+        change = (now - was) / was * 100 if was else 0.0
+        worse = change < -threshold if higher_is_better else change > threshold
+        if worse:
+            regressions.append(name)
+        print(f"{name:40s} {was:12.2f} -> {now:12.2f}  {change:+7.1f}%{'  REGRESSION' if worse else ''}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before", type=Path)
+    parser.add_argument("after", type=Path)
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change counted as a regression")
+    args = parser.parse_args()
+
+    before, after = (json.loads(path.read_text()) for path in (args.before, args.after))
+    for label, results in (("before", before), ("after", after)):
+        meta = results["meta"]
+        print(f"{label:6s}: {meta['commit']}{' (dirty)' if meta['dirty'] else ''} on {meta['database']}, "
+              f"{meta['cpu_count']} CPUs, Python {meta['python']}, {meta['recorded_at']}")
+    regressions = compare(before, after, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:g}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
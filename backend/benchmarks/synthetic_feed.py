@@ -0,0 +1,129 @@
+"""
+Full-size synthetic NYCT GTFS-realtime feeds for the benchmarks.
+
+Each route runs along a corridor of real stations from the bundled
+stops.txt (stations sharing an id prefix, e.g. 101..142, in id order,
+which follows the line), in both directions. `trips` trips are spread over
+the routes in proportion to corridor length, with departures staggered so
+that at any moment most are underway and some are still scheduled. For a
+given time, each trip reports its remaining stops (a trip_update with one
+stop_time_update per stop, 60-180 s apart) and, once underway, a vehicle
+position -- the same shape of payload as api-endpoint.mta.info, so
+nyct-gtfs and the whole decode/normalize path see realistic input. Feeds
+are deterministic for a seed and move forward with the clock.
+
+    feeds = SyntheticFeeds(trips=2000)
+    payloads = feeds.payloads(time.time())  # feed group -> protobuf bytes
+"""
+
+import random
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from nyct_gtfs.compiled_gtfs import gtfs_realtime_pb2
+
+from app.etl import FEED_GROUPS
+from app.gtfs_static import static_gtfs
+
+# Routes carried by each feed group, and the station-id prefixes each one
+# runs along (concatenated, in id order)
+GROUP_ROUTES = {
+    "1": {"1": "1", "2": "2", "3": "32", "4": "46", "5": "52", "6": "6", "7": "7", "GS": "9"},
+    "A": {"A": "AH", "C": "A", "E": "EF", "H": "H", "FS": "S"},
+    "B": {"B": "DB", "D": "D", "F": "F", "M": "MB"},
+    "G": {"G": "G"},
+    "J": {"J": "JM", "Z": "J"},
+    "N": {"N": "NRQ", "Q": "QD", "R": "R", "W": "NR"},
+    "L": {"L": "L"},
+    "SI": {"SI": "S"},
+}
+
+# A stop that was due this recently is still listed (the train is at it)
+_DWELL_SECONDS = 30
+
+
+@dataclass
+class _Trip:
+    trip_id: str
+    route_id: str
+    direction: str
+    stop_ids: list[str]  # child stop ids, in travel order
+    times: list[int]  # scheduled epoch seconds at each stop
+
+
+class SyntheticFeeds:
+    def __init__(self, trips: int = 2000, now: float | None = None, seed: int = 1) -> None:
+        rng = random.Random(seed)
+        start = int(now if now is not None else datetime.now(timezone.utc).timestamp())
+        self.start_date = datetime.fromtimestamp(start, timezone.utc).strftime("%Y%m%d")
+
+        stations = sorted(s.stop_id for s in static_gtfs().parent_stations())
+        corridors = {
+            (group, route): [s for prefix in prefixes for s in stations if s.startswith(prefix)]
+            for group, routes in GROUP_ROUTES.items()
+            for route, prefixes in routes.items()
+        }
+        total_stops = sum(len(c) for c in corridors.values())
+
+        self.trips: dict[str, list[_Trip]] = {group: [] for group in FEED_GROUPS}
+        serial = 0
+        for (group, route), corridor in corridors.items():
+            for n in range(max(2, round(trips * len(corridor) / total_stops))):
+                direction = "NS"[n % 2]
+                stop_ids = [f"{s}{direction}" for s in (corridor if direction == "N" else corridor[::-1])]
+                # Departed up to a full run ago, or due to leave in the next 20 minutes
+                run_seconds = [0]
+                for _ in stop_ids[1:]:
+                    run_seconds.append(run_seconds[-1] + rng.randint(60, 180))
+                departs = start - rng.randint(-1200, run_seconds[-1])
+                origin = (departs // 60) % 1440 * 100 + serial % 100
+                serial += 1
+                self.trips[group].append(
+                    _Trip(f"{origin:06d}_{route}..{direction}{n:02d}R", route, direction, stop_ids,
+                          [departs + offset for offset in run_seconds])
+                )
+
+    def trip_count(self) -> int:
+        return sum(len(trips) for trips in self.trips.values())
+
+    def feed_message(self, group: str, now: float) -> gtfs_realtime_pb2.FeedMessage:
+        """This group's feed as of `now`: trips that have finished their
+        run are gone, the rest list their remaining stops.
+        """
+        now = int(now)
+        feed = gtfs_realtime_pb2.FeedMessage()
+        feed.header.gtfs_realtime_version = "1.0"
+        feed.header.timestamp = now
+        entity_id = 0
+        for trip in self.trips[group]:
+            remaining = [i for i, at in enumerate(trip.times) if at >= now - _DWELL_SECONDS]
+            if not remaining:
+                continue
+            entity_id += 1
+            entity = feed.entity.add(id=f"{entity_id:06d}")
+            update = entity.trip_update
+            update.trip.trip_id, update.trip.route_id = trip.trip_id, trip.route_id
+            update.trip.start_date = self.start_date
+            for i in remaining:
+                stop_time = update.stop_time_update.add(stop_id=trip.stop_ids[i])
+                if i:
+                    stop_time.arrival.time = trip.times[i]
+                stop_time.departure.time = trip.times[i]
+
+            if trip.times[0] <= now:  # underway
+                entity_id += 1
+                entity = feed.entity.add(id=f"{entity_id:06d}")
+                vehicle = entity.vehicle
+                vehicle.trip.trip_id, vehicle.trip.route_id = trip.trip_id, trip.route_id
+                vehicle.trip.start_date = self.start_date
+                vehicle.current_stop_sequence = remaining[0] + 1
+                vehicle.stop_id = trip.stop_ids[remaining[0]]
+                vehicle.timestamp = now
+                if trip.times[remaining[0]] <= now:
+                    vehicle.current_status = gtfs_realtime_pb2.VehiclePosition.STOPPED_AT
+                else:
+                    vehicle.current_status = gtfs_realtime_pb2.VehiclePosition.IN_TRANSIT_TO
+        return feed
+
+    def payloads(self, now: float) -> dict[str, bytes]:
+        return {group: self.feed_message(group, now).SerializeToString() for group in FEED_GROUPS}
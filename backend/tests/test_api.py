@@ -1,11 +1,16 @@
+import json
+from contextlib import contextmanager
 from datetime import datetime
 
 import pytest
+from sqlalchemy import event
 
 from app import create_app
 from app.config import TestConfig
+from app.etl import _apply_alert_route_changes, refresh_segment_derived_state
 from app.extensions import db
-from app.models import ServiceAlert, Station, RouteSegment, VehicleSnapshot
+from app.geometry import pack_points
+from app.models import RouteShape, ServiceAlert, SnapshotPointer, Station, StopArrival, RouteSegment, VehicleSnapshot
 
 
 @pytest.fixture
@@ -42,7 +47,11 @@ def app():
         db.session.add(
             RouteSegment(route_id="7", stop_id_a=grand_central.stop_id, stop_id_b=station.stop_id)
         )
+        # What _ingest_alerts keeps in step for an alert it writes, and what
+        # run_ingest does after a cycle that adds new edges
+        _apply_alert_route_changes({"lmm:alert:1": (set(), {"5", "6"})}, datetime(2025, 3, 28, 11, 0, 0))
         db.session.commit()
+        refresh_segment_derived_state()
 
     yield flask_app
 
@@ -86,6 +95,11 @@ def test_alerts_endpoint(client):
     assert body[0]["routes"] == ["5", "6"]
 
 
+def test_alerts_endpoint_filters_by_route(client):
+    assert [a["id"] for a in client.get("/api/alerts?route=6").get_json()] == ["lmm:alert:1"]
+    assert client.get("/api/alerts?route=7").get_json() == []
+
+
 def test_alerts_by_route_aggregation(client):
     body = client.get("/api/stats/alerts-by-route").get_json()
     assert {"route": "5", "count": 1} in body
@@ -111,3 +125,224 @@ def test_manual_ingest_trigger_requires_secret_when_configured(client, app):
     app.config["INGEST_TRIGGER_SECRET"] = "shh"
     resp = client.post("/api/ingest/run")
     assert resp.status_code == 401
+
+
+def test_station_arrivals_reads_only_the_live_generation(client, app):
+    import time
+
+    with app.app_context():
+        stop_id = Station.query.filter_by(name="Times Sq-42 St").first().stop_id
+        soon = int(time.time()) + 300
+        for generation, trip_id in [(1, "old_trip"), (2, "live_trip"), (3, "unpublished_trip")]:
+            db.session.add(
+                StopArrival(generation=generation, trip_id=trip_id, route_id="1", stop_id=stop_id, arrival_time=soon)
+            )
+        db.session.add(SnapshotPointer(name="stop_arrivals", generation=2))
+        db.session.commit()
+
+    body = client.get(f"/api/stations/{stop_id}/arrivals").get_json()
+    assert [a["trip_id"] for a in body["arrivals"]] == ["live_trip"]
+
+
+def test_read_endpoints_serve_the_published_snapshot_not_the_db(client, app):
+    from app.live_state import publish_from_db
+
+    assert len(client.get("/api/vehicles").get_json()) == 1
+
+    with app.app_context():
+        grand_central = Station.query.filter_by(name="Grand Central-42 St").first()
+        db.session.add(VehicleSnapshot(trip_id="new_trip", route_id="7", direction="S", stop_id=grand_central.stop_id))
+        db.session.commit()
+
+        # Written but not yet published: readers keep seeing the last snapshot
+        assert len(client.get("/api/vehicles").get_json()) == 1
+
+        publish_from_db()
+
+    assert len(client.get("/api/vehicles").get_json()) == 2
+    body = client.get("/api/vehicles?route=7").get_json()
+    assert [v["trip_id"] for v in body] == ["new_trip"]
+    assert body[0]["station_name"] == "Grand Central-42 St"
+
+
+@contextmanager
+def _count_statements():
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+
+
+def test_vehicle_and_segment_serialization_does_not_query_per_row(client, app):
+    from app import static_responses
+    from app.live_state import build_snapshot_from_db
+
+    with app.app_context():
+        with _count_statements() as before_vehicles:
+            build_snapshot_from_db()
+        with _count_statements() as before_segments:
+            static_responses.rebuild("route-segments")
+
+        # A full feed's worth of trains and edges, across many stations
+        stop_ids = [s for (s,) in db.session.query(Station.stop_id).order_by(Station.stop_id).limit(301)]
+        db.session.add_all(
+            VehicleSnapshot(trip_id=f"trip{i}", route_id="A", direction="N", stop_id=stop_id)
+            for i, stop_id in enumerate(stop_ids)
+        )
+        db.session.add_all(
+            RouteSegment(route_id="A", stop_id_a=a, stop_id_b=b) for a, b in zip(stop_ids, stop_ids[1:])
+        )
+        db.session.commit()
+        db.session.expunge_all()  # nothing already loaded to hide a lazy load
+
+        with _count_statements() as statements:
+            snapshot = build_snapshot_from_db()
+        assert len(statements) == len(before_vehicles)
+        assert len(snapshot.vehicles) == 302
+        assert all(v["lat"] is not None for v in snapshot.vehicles)
+
+        with _count_statements() as statements:
+            static_responses.rebuild("route-segments")
+        assert len(statements) == len(before_segments) == 1
+
+    body = client.get("/api/route-segments").get_json()
+    assert len(body) == 301
+    last = body[-1]
+    assert (last["route_id"], last["a"]["stop_id"], last["b"]["stop_id"]) == ("A", stop_ids[-2], stop_ids[-1])
+    assert last["a"]["lat"] is not None and last["b"]["lon"] is not None
+
+
+def test_static_endpoints_revalidate_with_etag(client):
+    first = client.get("/api/stations")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    again = client.get("/api/stations", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == etag
+
+
+def test_static_endpoints_negotiate_compression(client):
+    import gzip
+
+    plain = client.get("/api/route-segments")
+    compressed = client.get("/api/route-segments", headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in plain.headers
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+    assert gzip.decompress(compressed.data) == plain.data
+
+
+def test_route_stops_orders_stations_along_the_shape_and_merges_vehicles(client, app):
+    with app.app_context():
+        times_sq = Station.query.filter_by(name="Times Sq-42 St").first()
+        grand_central = Station.query.filter_by(name="Grand Central-42 St").first()
+        points = [[grand_central.lat, grand_central.lon], [times_sq.lat, times_sq.lon]]
+        db.session.add(
+            RouteShape(shape_id="7..S99X", route_id="7", point_count=len(points), points_blob=pack_points(points))
+        )
+        db.session.add(VehicleSnapshot(trip_id="7_trip", route_id="7", direction="N", stop_id=times_sq.stop_id))
+        db.session.commit()
+
+    body = client.get("/api/routes/7/stops").get_json()
+
+    assert body["route_id"] == "7"
+    [direction] = body["directions"]
+    assert [s["name"] for s in direction["stops"]] == ["Grand Central-42 St", "Times Sq-42 St"]
+    assert [v["trip_id"] for v in direction["stops"][1]["vehicles"]] == ["7_trip"]
+    assert client.get("/api/routes/Z/stops").status_code == 404
+
+
+def test_route_stops_breaks_position_ties_by_stop_id(client, app):
+    with app.app_context():
+        grand_central = Station.query.filter_by(name="Grand Central-42 St").first()
+        lat, lon = grand_central.lat, grand_central.lon
+        # Two platforms at the same spot, inserted in reverse stop_id order
+        for stop_id in ("T2", "T1"):
+            db.session.add(Station(stop_id=stop_id, name=f"Twin {stop_id}", lat=lat, lon=lon))
+        db.session.add(RouteSegment(route_id="T", stop_id_a="T1", stop_id_b="T2"))
+        points = [[lat, lon - 0.01], [lat, lon + 0.01]]
+        db.session.add(
+            RouteShape(shape_id="T..N01R", route_id="T", point_count=len(points), points_blob=pack_points(points))
+        )
+        db.session.commit()
+
+    [direction] = client.get("/api/routes/T/stops").get_json()["directions"]
+    assert [s["stop_id"] for s in direction["stops"]] == ["T1"]
+
+
+def test_station_arrivals_lists_walkable_connections_with_routes(client, app):
+    with app.app_context():
+        times_sq = Station.query.filter_by(name="Times Sq-42 St").first().stop_id
+
+    body = client.get(f"/api/stations/{times_sq}/arrivals").get_json()
+
+    assert body["connections"], "Times Sq has other platforms within 400 m"
+    distances = [c["distance_m"] for c in body["connections"]]
+    assert distances == sorted(distances) and max(distances) <= 400
+    assert all(c["stop_id"] != times_sq for c in body["connections"])
+
+
+def test_stations_near_point(client, app):
+    with app.app_context():
+        grand_central = Station.query.filter_by(name="Grand Central-42 St").first()
+        lat, lon, stop_id = grand_central.lat, grand_central.lon, grand_central.stop_id
+
+    body = client.get(f"/api/stations/near?lat={lat}&lon={lon}&radius=200").get_json()
+    assert body[0]["stop_id"] == stop_id
+    assert body[0]["distance_m"] == 0
+    assert body[0]["routes"] == ["7"]  # from the fixture's route-7 segment
+
+    assert client.get("/api/stations/near?lat=abc&lon=1").status_code == 400
+    assert client.get(f"/api/stations/near?lat={lat}&lon={lon}&radius=99999").status_code == 400
+
+
+def test_stream_pushes_a_delta_when_a_new_snapshot_is_published(client, app):
+    from app.live_state import publish_from_db
+
+    client.get("/api/vehicles")  # make sure a snapshot is published already
+    response = client.get("/api/stream?routes=7", buffered=False)
+    assert response.mimetype == "text/event-stream"
+    chunks = response.iter_encoded()
+    assert next(chunks).startswith(b"retry:")
+
+    with app.app_context():
+        grand_central = Station.query.filter_by(name="Grand Central-42 St").first()
+        db.session.add(VehicleSnapshot(trip_id="7_new", route_id="7", direction="S", stop_id=grand_central.stop_id))
+        db.session.add(VehicleSnapshot(trip_id="Q_new", route_id="Q", direction="S", stop_id=grand_central.stop_id))
+        db.session.commit()
+        publish_from_db()
+
+    message = next(chunks).decode()
+    assert message.startswith("event: delta\n")
+    payload = json.loads(message.split("data: ", 1)[1])
+    assert [v["trip_id"] for v in payload["vehicles"]["added"]] == ["7_new"]
+    response.close()
+
+
+def test_stream_is_refused_once_the_process_holds_its_limit(client, app):
+    from app import push
+
+    with app.app_context():
+        app_broker = push.broker()
+        held = [app_broker.subscribe(None, set()) for _ in range(app.config["STREAM_MAX_SUBSCRIBERS"])]
+    assert None not in held
+
+    response = client.get("/api/stream")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(push.FULL_RETRY_AFTER_SECONDS)
+
+    app_broker.unsubscribe(held.pop())
+    response = client.get("/api/stream", buffered=False)
+    assert response.status_code == 200
+    response.close()
+
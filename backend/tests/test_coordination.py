@@ -0,0 +1,183 @@
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from app import coordination, create_app
+from app.config import TestConfig
+from app.coordination import IngestLeader, follow_once
+from app.extensions import db
+from app.live_state import current_snapshot
+from app.models import IngestRun, Station, VehicleSnapshot
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def test_file_lock_admits_one_leader_until_released(tmp_path):
+    lock_file = str(tmp_path / "ingest.lock")
+    first, second = IngestLeader("file", lock_file), IngestLeader("file", lock_file)
+
+    assert first.acquire() and first.is_leader
+    assert first.acquire()  # re-checking a held lock is a no-op
+    assert not second.acquire()
+
+    first.release()
+    assert second.acquire() and not first.acquire()
+    second.release()
+
+
+def test_web_process_follows_ingests_from_another_process(tmp_path):
+    class SharedConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'shared.db'}"
+
+    ingester, web = create_app(SharedConfig), create_app(SharedConfig)
+    with web.app_context():
+        assert current_snapshot().vehicles == ()
+        assert not follow_once()
+
+    with ingester.app_context():
+        station = Station.query.filter_by(name="Times Sq-42 St").first()
+        db.session.add(VehicleSnapshot(trip_id="7_trip", route_id="7", direction="N", stop_id=station.stop_id))
+        db.session.add(IngestRun(status="success", finished_at=datetime.utcnow()))
+        db.session.commit()
+
+    with web.app_context():
+        assert follow_once()
+        assert [v["trip_id"] for v in current_snapshot().vehicles] == ["7_trip"]
+        assert not follow_once()  # nothing newer since
+
+
+def test_ingest_trigger_defers_to_the_leader(tmp_path):
+    class LockedConfig(TestConfig):
+        INGEST_LEADER_LOCK = "file"
+        INGEST_LOCK_FILE = str(tmp_path / "ingest.lock")
+
+    elsewhere = IngestLeader("file", LockedConfig.INGEST_LOCK_FILE)
+    assert elsewhere.acquire()
+    app = create_app(LockedConfig)
+
+    assert app.test_client().post("/api/ingest/run").status_code == 409
+    with app.app_context():
+        assert not coordination.leader().is_leader
+    elsewhere.release()
+
+
+def test_worker_skips_the_web_warmups():
+    class WorkerTestConfig(TestConfig):
+        SERVE_REQUESTS = False
+
+    worker = create_app(WorkerTestConfig)
+    assert worker.extensions["static_responses"]._responses == {}
+    assert worker.extensions["spatial"].stations is None
+    assert worker.extensions["route_stops"]._directions == {}
+
+    web = create_app(TestConfig)
+    assert "stations" in web.extensions["static_responses"]._responses
+    assert web.extensions["spatial"].stations is not None
+
+
+@pytest.mark.skipif(coordination.fcntl is None, reason="file locking needs fcntl")
+def test_manual_trigger_does_not_keep_leadership_from_the_worker(tmp_path, monkeypatch):
+    from app.etl import FeedRecords
+
+    class LockedConfig(TestConfig):
+        INGEST_LEADER_LOCK = "file"
+        INGEST_LOCK_FILE = str(tmp_path / "ingest.lock")
+
+    monkeypatch.setattr("app.etl._fetch_live_records", lambda *args: FeedRecords())
+    monkeypatch.setattr("app.etl.fetch_alerts_feed_dict", lambda: {"entity": []})
+    web, worker = create_app(LockedConfig), create_app(LockedConfig)
+
+    # The trigger reaches a web process while no worker holds the lock
+    assert web.test_client().post("/api/ingest/run").status_code == 200
+    with web.app_context():
+        assert not coordination.leader().is_leader
+
+    with worker.app_context():
+        assert coordination.ingest_if_leader() is not None
+        assert coordination.leader().is_leader
+        assert coordination.ingest_if_leader() is not None  # and keeps it
+    assert web.test_client().post("/api/ingest/run").status_code == 409
+    with worker.app_context():
+        coordination.leader().release()
+
+
+_WORKER = textwrap.dedent(
+    """
+    import os, sys, time
+    import app.etl
+
+    def fetch(*args):
+        with open(os.environ["FETCH_LOG"], "a") as log:
+            log.write(f"{os.getpid()} {time.time()}\\n")
+        return app.etl.FeedRecords()
+
+    app.etl._fetch_live_records = fetch
+    app.etl.fetch_alerts_feed_dict = lambda: {"entity": []}
+
+    from app.worker import main
+    main()
+    """
+)
+
+
+def _fetches(log: Path) -> list[tuple[int, float]]:
+    if not log.exists():
+        return []
+    return [(int(pid), float(at)) for pid, at in (line.split() for line in log.read_text().splitlines())]
+
+
+@pytest.mark.skipif(coordination.fcntl is None, reason="file locking needs fcntl")
+def test_several_workers_fetch_once_per_interval(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'workers.db'}"
+    log = tmp_path / "fetches.log"
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "INGEST_INTERVAL_SECONDS": "1",
+        "INGEST_LEADER_LOCK": "file",
+        "INGEST_LOCK_FILE": str(tmp_path / "ingest.lock"),
+        "GTFS_CACHE_DIR": str(tmp_path / "gtfs-cache"),
+        "HISTORY_DIR": "",
+        "FETCH_LOG": str(log),
+        "PYTHONPATH": str(BACKEND_DIR),
+    }
+
+    class SeededConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = database_url
+
+    create_app(SeededConfig)  # seed once so the workers start quickly
+
+    workers = [
+        subprocess.Popen([sys.executable, "-c", _WORKER], cwd=BACKEND_DIR, env=env,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for _ in range(3)
+    ]
+    try:
+        deadline = time.monotonic() + 30
+        while len(_fetches(log)) < 4 and time.monotonic() < deadline:
+            time.sleep(0.2)
+        fetches = _fetches(log)
+        assert len(fetches) >= 4
+        assert len({pid for pid, _ in fetches}) == 1  # only the leader fetches
+        times = [at for _, at in fetches]
+        assert min(b - a for a, b in zip(times, times[1:])) > 0.5  # once per 1 s interval
+
+        # The leader dies: a standby takes over at its next tick
+        [leader_pid] = {pid for pid, _ in fetches}
+        os.kill(leader_pid, signal.SIGKILL)
+        died_at = time.time()
+        while time.monotonic() < deadline and not any(at > died_at for _, at in _fetches(log)):
+            time.sleep(0.2)
+        survivors = {pid for pid, at in _fetches(log) if at > died_at}
+        assert len(survivors) == 1 and leader_pid not in survivors
+    finally:
+        for worker in workers:
+            worker.kill()
+            worker.wait()
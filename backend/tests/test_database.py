@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import exc, text
+
+from app import create_app, database
+from app.config import TestConfig
+from app.etl import run_ingest
+from app.extensions import db
+
+
+@pytest.fixture
+def pooled_app(tmp_path):
+    class PooledConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'pooled.db'}"
+        DB_POOL_SIZE = 1
+        DB_MAX_OVERFLOW = 0
+        DB_POOL_TIMEOUT = 1
+        DB_INGEST_POOL_SIZE = 2
+        DB_INGEST_MAX_OVERFLOW = 0
+
+    return create_app(PooledConfig)
+
+
+def test_in_memory_sqlite_keeps_one_shared_engine():
+    with create_app(TestConfig).app_context():
+        assert set(database.pool_stats()) == {"default"}
+        assert database.ingest_engine() is db.engine
+        with database.writer():
+            assert db.session.get_bind() is db.engine
+
+
+def test_ingest_writes_go_through_their_own_pool(pooled_app, monkeypatch):
+    with pooled_app.app_context():
+        stats = database.pool_stats()
+        assert (stats["default"]["size"], stats["default"]["max_overflow"]) == (1, 0)
+        assert (stats["ingest"]["size"], stats["ingest"]["max_overflow"]) == (2, 0)
+
+        ingest = db.engines[database.INGEST_BIND]
+        assert db.session.get_bind() is db.engine
+        with database.writer():
+            assert db.session.get_bind() is ingest
+
+        def offline(*args):
+            raise RuntimeError("feeds unreachable")
+
+        monkeypatch.setattr("app.etl._fetch_live_records", offline)
+        before = database.pool_stats()
+        assert run_ingest().status == "error"  # still records the run, through the ingest pool
+        after = database.pool_stats()
+        assert after["ingest"]["checkouts"] > before["ingest"]["checkouts"]
+        assert after["default"]["checkouts"] == before["default"]["checkouts"]
+
+
+def test_reads_are_not_starved_by_a_long_ingest_transaction(pooled_app):
+    client = pooled_app.test_client()
+    with pooled_app.app_context():
+        # The whole ingest pool busy, e.g. the leader lock plus a long write
+        held = [database.ingest_engine().connect() for _ in range(2)]
+        try:
+            started = time.perf_counter()
+            body = client.get("/api/health").get_json()
+            assert time.perf_counter() - started < 0.5
+        finally:
+            for conn in held:
+                conn.close()
+
+    assert body["database_pools"]["ingest"]["checked_out"] == 2
+    assert body["database_pools"]["default"]["timeouts"] == 0
+
+
+def test_pool_stats_report_waits_and_timeouts(pooled_app):
+    with pooled_app.app_context():
+        engine = db.engine
+        conn = engine.connect()
+        threading.Timer(0.2, conn.close).start()
+        with engine.connect() as waited:  # blocks until the timer returns the only connection
+            waited.execute(text("SELECT 1"))
+            with pytest.raises(exc.TimeoutError):
+                engine.connect()
+
+        stats = database.pool_stats()["default"]
+        assert stats["wait_ms_max"] >= 150
+        assert stats["timeouts"] == 1
+        assert stats["checked_out"] == 0
@@ -1,14 +1,27 @@
 import json
+import time
 from dataclasses import dataclass, field
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
+import pytest
+
+from app import create_app
+from app.config import TestConfig
 from app.etl import (
+    _ingest_alerts,
+    _write_arrivals,
+    _write_route_segments,
+    _write_vehicles,
+    collect_arrival_generations,
+    normalize_trips,
     _load_child_to_parent_map,
     resolve_parent_stop_id,
     trip_to_segment_pairs,
     trip_to_vehicle_record,
 )
+from app.extensions import db
+from app.models import AlertRoute, AlertRouteBucket, AlertRouteCount, RouteSegment, ServiceAlert, SnapshotPointer, Station, StopArrival, VehicleSnapshot
 from app.mta_alerts import parse_alerts_feed_dict
 
 FIXTURES = Path(__file__).parent / "fixtures"
@@ -17,6 +30,8 @@ FIXTURES = Path(__file__).parent / "fixtures"
 @dataclass
 class FakeStopTimeUpdate:
     stop_id: str
+    arrival: datetime | None = None
+    departure: datetime | None = None
 
 
 @dataclass
@@ -129,3 +144,215 @@ def test_trip_to_segment_pairs_skips_self_pairs_and_empty_sequences():
         stop_time_updates=[FakeStopTimeUpdate(stop_id="228N"), FakeStopTimeUpdate(stop_id="228S")],
     )
     assert trip_to_segment_pairs(same_station_twice, child_to_parent) == []
+
+
+@pytest.fixture
+def app():
+    flask_app = create_app(TestConfig)
+    with flask_app.app_context():
+        yield flask_app
+
+
+def test_write_vehicles_diffs_against_existing_rows_by_trip_id(app):
+    child_to_parent = _load_child_to_parent_map()
+    known = {row[0] for row in db.session.query(Station.stop_id).all()}
+
+    def cycle(trips):
+        result = _write_vehicles(normalize_trips(trips, child_to_parent, known, time.time()).vehicles)
+        db.session.commit()
+        return result
+
+    first = cycle([
+        FakeTrip(underway=True, trip_id="stays", location="228N"),
+        FakeTrip(underway=True, trip_id="moves", location="137N"),
+        FakeTrip(underway=True, trip_id="leaves", location="132N"),
+    ])
+    assert (first.inserted, first.updated, first.deleted) == (3, 0, 0)
+    unchanged_id = VehicleSnapshot.query.filter_by(trip_id="stays").one().id
+
+    second = cycle([
+        FakeTrip(underway=True, trip_id="stays", location="228N"),
+        FakeTrip(underway=True, trip_id="moves", location="132N"),
+        FakeTrip(underway=True, trip_id="arrives", location="127N"),
+    ])
+
+    assert (second.total, second.inserted, second.updated, second.deleted) == (3, 1, 1, 1)
+    rows = {v.trip_id: v for v in VehicleSnapshot.query.all()}
+    assert set(rows) == {"stays", "moves", "arrives"}
+    assert rows["moves"].stop_id == "132"
+    assert rows["stays"].id == unchanged_id  # untouched, not deleted and reinserted
+
+
+def test_normalize_trips_reduces_trips_to_known_station_tuples():
+    child_to_parent = {"228N": "228", "137N": "137", "132N": "132"}
+    known = {"228", "137", "132"}
+    now = datetime(2025, 3, 28, 12, 0, 0)
+    now_ts = now.replace(tzinfo=timezone.utc).timestamp()
+    trip = FakeTrip(
+        underway=True,
+        location="137N",
+        stop_time_updates=[
+            FakeStopTimeUpdate("228N", arrival=now - timedelta(minutes=1)),  # already passed
+            FakeStopTimeUpdate("137N", arrival=now + timedelta(minutes=2)),
+            FakeStopTimeUpdate("999N", arrival=now + timedelta(minutes=4)),  # unknown station
+            FakeStopTimeUpdate("132N", departure=now + timedelta(minutes=6)),
+        ],
+    )
+    parked = FakeTrip(underway=False, trip_id="not_yet", location="999N")
+
+    records = normalize_trips([trip, parked], child_to_parent, known, now_ts)
+
+    assert records.trip_count == 2
+    assert records.vehicles == [
+        ("121950_5..N", "5", "N", "Eastchester-Dyre Av", "137", "STOPPED_AT", False, datetime(2025, 3, 28, 12, 0, 0))
+    ]
+    assert records.segments == {("5", "137", "228")}  # the 999 edges are dropped
+    assert [(a[4], a[5] - now_ts) for a in records.arrivals] == [("137", 120), ("132", 360)]
+
+
+def test_normalize_trips_segments_match_trip_to_segment_pairs():
+    child_to_parent = {"228N": "228", "228S": "228", "137N": "137", "132N": "132", "127N": "127"}
+    known = {"228", "137", "132", "127"}
+    stop_patterns = [
+        ["228N", "137N", "132N", "127N"],
+        ["127N", "132N", "999N", "137N", "228N"],  # an unknown stop breaks the chain
+        ["228N", "228S", "137N", "137N"],  # self pairs
+        ["132N"],
+        [],
+    ]
+    trips = [
+        FakeTrip(underway=True, trip_id=f"t{i}", route_id=route, stop_time_updates=[FakeStopTimeUpdate(s) for s in stops])
+        for i, stops in enumerate(stop_patterns)
+        for route in ("1", "2")
+    ]
+
+    records = normalize_trips(trips, child_to_parent, known, datetime(2025, 3, 28).timestamp())
+
+    expected = {
+        key
+        for trip in trips
+        for key in trip_to_segment_pairs(trip, child_to_parent)
+        if key[1] in known and key[2] in known
+    }
+    assert records.segments == expected
+
+
+def test_write_arrivals_publishes_a_new_generation_and_gc_drops_old_ones(app):
+    child_to_parent = _load_child_to_parent_map()
+    known = {row[0] for row in db.session.query(Station.stop_id).all()}
+    soon = datetime.utcnow() + timedelta(minutes=5)
+
+    def cycle(stop_ids):
+        trip = FakeTrip(
+            underway=True,
+            stop_time_updates=[FakeStopTimeUpdate(stop_id=s, arrival=soon) for s in stop_ids],
+        )
+        count = _write_arrivals(normalize_trips([trip], child_to_parent, known, time.time()).arrivals)
+        db.session.commit()
+        return count
+
+    assert cycle(["228N", "137N"]) == 2
+    assert cycle(["228N"]) == 1
+    assert cycle(["132N"]) == 1
+
+    live = db.session.get(SnapshotPointer, "stop_arrivals").generation
+    assert live == 3
+    # Nothing is deleted during the write itself -- every generation is intact
+    assert StopArrival.query.count() == 4
+
+    assert collect_arrival_generations() == 2
+    assert {a.generation for a in StopArrival.query.all()} == {2, 3}
+
+
+def test_ingest_alerts_upserts_in_bulk_skips_unchanged_and_expires_missing(app, monkeypatch):
+    feed_dict = json.loads((FIXTURES / "mta_alerts_response.json").read_text())
+    total = len(feed_dict["entity"])
+    monkeypatch.setattr("app.etl.fetch_alerts_feed_dict", lambda: feed_dict)
+    app.config["ALERT_EXPIRY_CYCLES"] = 4
+
+    first = _ingest_alerts(run_id=1)
+    assert (first.total, first.written, first.expired) == (total, total, 0)
+    assert ServiceAlert.query.count() == total
+
+    # Same feed again: nothing rewritten, only the last-seen markers
+    second = _ingest_alerts(run_id=2)
+    assert (second.written, second.touched) == (0, total)
+
+    # One alert edited, one dropped from the feed
+    edited, dropped = feed_dict["entity"][0], feed_dict["entity"][1]
+    edited["alert"]["headerText"] = {"translation": [{"language": "en", "text": "Changed"}]}
+    feed_dict["entity"] = [e for e in feed_dict["entity"] if e is not dropped]
+
+    third = _ingest_alerts(run_id=3)
+    assert (third.written, third.touched) == (1, total - 2)
+    assert ServiceAlert.query.filter_by(external_id=edited["id"]).one().header_text == "Changed"
+
+    # Last seen in run 2: kept while missing from runs 3-5, gone in run 6
+    assert third.expired == 0
+    for run_id in range(4, 6):
+        assert _ingest_alerts(run_id=run_id).expired == 0
+    assert _ingest_alerts(run_id=6).expired == 1
+    assert ServiceAlert.query.filter_by(external_id=dropped["id"]).count() == 0
+    assert ServiceAlert.query.count() == total - 1
+
+
+def test_ingest_alerts_maintains_route_association_and_counters(app, monkeypatch):
+    def alert(alert_id, *routes):
+        return {
+            "id": alert_id,
+            "alert": {
+                "headerText": {"translation": [{"language": "en", "text": alert_id}]},
+                "informedEntity": [{"routeId": r} for r in routes],
+            },
+        }
+
+    feed_dict = {"entity": [alert("a1", "A", "C"), alert("a2", "C")]}
+    monkeypatch.setattr("app.etl.fetch_alerts_feed_dict", lambda: feed_dict)
+    app.config["ALERT_EXPIRY_CYCLES"] = 2
+
+    def counts():
+        return {c.route_id: c.active_count for c in AlertRouteCount.query}
+
+    _ingest_alerts(run_id=1)
+    assert counts() == {"A": 1, "C": 2}
+
+    # a1 moves from A,C to C,E; a2 leaves the feed and expires on its second missed run
+    feed_dict["entity"] = [alert("a1", "C", "E")]
+    _ingest_alerts(run_id=2)
+    assert counts() == {"A": 0, "C": 2, "E": 1}
+    _ingest_alerts(run_id=3)
+    _ingest_alerts(run_id=4)
+    assert counts() == {"A": 0, "C": 1, "E": 1}
+    assert sorted((r.route_id, r.external_id) for r in AlertRoute.query) == [("C", "a1"), ("E", "a1")]
+
+    buckets = {b.route_id: (b.raised, b.cleared) for b in AlertRouteBucket.query}
+    assert buckets == {"A": (1, 1), "C": (2, 1), "E": (1, 0)}
+
+    # The incrementally maintained counters agree with a full recount
+    recount: dict[str, int] = {}
+    for alert_row in ServiceAlert.query:
+        for route in alert_row.routes.split(","):
+            recount[route] = recount.get(route, 0) + 1
+    assert {r: n for r, n in counts().items() if n} == recount
+
+
+def test_write_route_segments_uses_key_cache_and_tolerates_other_writers(app):
+    child_to_parent = _load_child_to_parent_map()
+    known = {row[0] for row in db.session.query(Station.stop_id).all()}
+
+    def cycle(*stop_ids):
+        trip = FakeTrip(underway=True, route_id="5", stop_time_updates=[FakeStopTimeUpdate(s) for s in stop_ids])
+        new_count = _write_route_segments(normalize_trips([trip], child_to_parent, known, time.time()).segments)
+        db.session.commit()
+        return new_count
+
+    assert cycle("228N", "137N") == 1
+    assert cycle("228N", "137N") == 0
+
+    # Another worker writes an edge this process hasn't seen yet
+    db.session.add(RouteSegment(route_id="5", stop_id_a="132", stop_id_b="137"))
+    db.session.commit()
+
+    assert cycle("228N", "137N", "132N", "127N") == 1
+    assert RouteSegment.query.count() == 3
+    assert cycle("132N", "127N") == 0
@@ -0,0 +1,130 @@
+import json
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+from google.protobuf.json_format import ParseDict
+from nyct_gtfs.compiled_gtfs import gtfs_realtime_pb2
+
+from app.etl import FeedDecoder, decode_feed, fetch_feed_groups
+from app.gtfs_static import static_gtfs
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def _fixture_feed_bytes() -> bytes:
+    """The saved sample response, re-encoded as the protobuf MTA serves."""
+    feed_dict = json.loads((FIXTURES / "mta_sample_response.json").read_text())
+    return ParseDict(feed_dict, gtfs_realtime_pb2.FeedMessage(), ignore_unknown_fields=True).SerializeToString()
+
+
+@pytest.fixture
+def feed_server():
+    """Local stand-in for api-endpoint.mta.info: /ok serves the fixture
+    protobuf, /broken returns a 500, /slow stalls past any sane timeout.
+    """
+    payload = _fixture_feed_bytes()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/slow":
+                time.sleep(2)
+            if self.path == "/broken":
+                self.send_response(500)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-protobuf")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", len(payload)
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_feed_groups_parses_every_group_and_reports_latency(feed_server):
+    base_url, payload_size = feed_server
+
+    results = fetch_feed_groups(
+        ["1", "A", "B"],
+        url_for=lambda group: f"{base_url}/ok",
+        feed_timeout=5,
+        cycle_deadline=10,
+        max_workers=3,
+    )
+
+    assert [r.group for r in results] == ["1", "A", "B"]
+    for result in results:
+        assert result.error is None
+        assert len(result.trips) == 16
+        assert result.byte_count == payload_size
+        assert result.latency_seconds > 0
+
+
+def test_fetch_feed_groups_skips_failed_and_slow_feeds(feed_server):
+    base_url, _ = feed_server
+    paths = {"1": "ok", "A": "broken", "B": "slow"}
+
+    started = time.perf_counter()
+    results = {
+        r.group: r
+        for r in fetch_feed_groups(
+            list(paths),
+            url_for=lambda group: f"{base_url}/{paths[group]}",
+            feed_timeout=5,
+            cycle_deadline=0.5,
+            max_workers=3,
+        )
+    }
+    elapsed = time.perf_counter() - started
+
+    # The deadline bounds the stage even though /slow is still in flight
+    assert elapsed < 1.5
+    assert results["1"].error is None and len(results["1"].trips) == 16
+    assert results["A"].error is not None and results["A"].trips == []
+    assert results["B"].error == "deadline exceeded"
+
+
+def test_feeds_decode_to_the_same_records_in_a_process_pool(feed_server):
+    base_url, _ = feed_server
+    gtfs = static_gtfs()
+    known = {s.stop_id for s in gtfs.parent_stations()}
+    now_ts = time.time()
+
+    def fetch(decode):
+        [result] = fetch_feed_groups(
+            ["1"], url_for=lambda group: f"{base_url}/ok", feed_timeout=5, cycle_deadline=30, max_workers=1,
+            decode=decode,
+        )
+        assert result.error is None and result.trips == []
+        return result.records
+
+    inline = fetch(FeedDecoder(None, gtfs.child_to_parent, known, now_ts))
+    assert inline.trip_count == 16 and inline.segments
+
+    with ProcessPoolExecutor(2, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pooled = fetch(FeedDecoder(pool, gtfs.child_to_parent, known, now_ts))
+    assert pooled == inline
+
+    # Once the pool is gone, the payload is still decoded, inline
+    class BrokenPool:
+        def submit(self, *args):
+            raise BrokenProcessPool("a decode process died")
+
+    decoder = FeedDecoder(BrokenPool(), gtfs.child_to_parent, known, now_ts)
+    assert fetch(decoder) == inline and decoder.broken
+    assert decode_feed(_fixture_feed_bytes(), f"{base_url}/ok", gtfs.child_to_parent, known, now_ts) == inline
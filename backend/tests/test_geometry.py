@@ -0,0 +1,83 @@
+import random
+
+import numpy as np
+
+from app.geometry import (
+    METERS_PER_DEG_LAT,
+    METERS_PER_DEG_LON,
+    pack_points,
+    project_point_onto_polyline,
+    project_points_onto_polyline,
+    simplify_polyline,
+    unpack_points,
+)
+
+
+def _zigzag_shape(n_points: int, seed: int = 7) -> list[list[float]]:
+    rng = random.Random(seed)
+    lat, lon = 40.70, -74.00
+    points = []
+    for _ in range(n_points):
+        points.append([lat, lon])
+        lat += rng.uniform(0.0, 0.002)
+        lon += rng.uniform(-0.001, 0.001)
+    return points
+
+
+def test_batched_projection_matches_reference_loop():
+    shape = _zigzag_shape(300)
+    shape.insert(50, list(shape[50]))  # a zero-length segment, as real shapes have
+    rng = random.Random(11)
+    stations = [(rng.uniform(40.69, 41.0), rng.uniform(-74.02, -73.98)) for _ in range(80)]
+
+    batched = project_points_onto_polyline(np.array(stations), np.array(shape))
+    expected = [project_point_onto_polyline(lat, lon, shape) for lat, lon in stations]
+
+    np.testing.assert_allclose(batched, expected, atol=1e-9)
+
+
+def test_batched_projection_orders_points_along_the_line():
+    shape = [[40.70, -74.0], [40.80, -74.0]]
+    stations = np.array([[40.79, -74.0001], [40.71, -73.9999], [40.75, -74.0]])
+
+    params = project_points_onto_polyline(stations, np.array(shape))
+
+    assert list(np.argsort(params)) == [1, 2, 0]
+    assert params.min() >= 0.0 and params.max() <= 1.0
+
+
+def test_batched_projection_handles_degenerate_input():
+    assert project_points_onto_polyline(np.empty((0, 2)), np.array(_zigzag_shape(5))).shape == (0,)
+    assert list(project_points_onto_polyline(np.array([[40.7, -74.0]]), np.array([[40.7, -74.0]]))) == [0.0]
+
+
+def _distance_to_polyline_m(lat: float, lon: float, points: np.ndarray) -> float:
+    xy = points[:, ::-1] * (METERS_PER_DEG_LON, METERS_PER_DEG_LAT)
+    p = np.array([lon * METERS_PER_DEG_LON, lat * METERS_PER_DEG_LAT])
+    best = float("inf")
+    for a, b in zip(xy, xy[1:]):
+        ab = b - a
+        t = 0.0 if not ab.any() else min(max(float((p - a) @ ab / (ab @ ab)), 0.0), 1.0)
+        best = min(best, float(np.hypot(*(p - a - t * ab))))
+    return best
+
+
+def test_simplify_keeps_every_dropped_point_within_tolerance():
+    shape = np.array(_zigzag_shape(400))
+
+    for tolerance in (5, 20, 80):
+        simplified = simplify_polyline(shape, tolerance)
+        assert 2 <= len(simplified) < len(shape)
+        assert simplified[0].tolist() == shape[0].tolist()
+        assert simplified[-1].tolist() == shape[-1].tolist()
+        assert max(_distance_to_polyline_m(lat, lon, simplified) for lat, lon in shape) <= tolerance + 1e-6
+
+    assert len(simplify_polyline(shape, 80)) < len(simplify_polyline(shape, 5))
+
+
+def test_packed_points_round_trip_at_gtfs_precision():
+    shape = np.round(np.array(_zigzag_shape(100)), 6)
+    blob = pack_points(shape)
+
+    assert len(blob) == 8 * len(shape)
+    np.testing.assert_array_equal(unpack_points(blob), shape)
@@ -0,0 +1,94 @@
+import csv
+import shutil
+
+import pytest
+
+from app import gtfs_static
+from app.gtfs_static import DATA_DIR, files_digest, load_cached, parse
+
+
+def test_parse_matches_the_bundled_csvs():
+    gtfs = parse()
+
+    with open(f"{DATA_DIR}/stops.txt", newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    parents = {r["stop_id"] for r in rows if r["location_type"] == "1"}
+    assert {s.stop_id for s in gtfs.parent_stations()} == parents
+    assert gtfs.child_to_parent["228N"] == "228"
+    assert all(child[:-1] == parent for child, parent in gtfs.child_to_parent.items() if child[-1] in "NS")
+
+    with open(f"{DATA_DIR}/trips.txt", newline="", encoding="utf-8") as f:
+        first_trip = next(csv.DictReader(f))
+    shape = gtfs.shapes[first_trip["shape_id"]]
+    assert (shape.route_id, shape.direction_id, shape.headsign) == (
+        first_trip["route_id"], int(first_trip["direction_id"]), first_trip["trip_headsign"]
+    )
+    assert gtfs.shape_points == {}  # no shapes.txt bundled
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    shutil.copy(f"{DATA_DIR}/stops.txt", data)
+    shutil.copy(f"{DATA_DIR}/trips.txt", data)
+    (data / "shapes.txt").write_text(
+        "shape_id,shape_pt_lat,shape_pt_lon,shape_pt_sequence\n"
+        "1..S03R,40.70,-74.01,2\n"
+        "1..S03R,40.90,-73.90,0\n"
+        "1..S03R,40.80,-73.95,1\n"
+    )
+    return str(data)
+
+
+def test_load_cached_reuses_the_cache_until_the_files_change(data_dir, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    first = load_cached(data_dir, cache_dir)
+    assert first.shape_points["1..S03R"].tolist() == [[40.90, -73.90], [40.80, -73.95], [40.70, -74.01]]
+
+    def fail(*args):
+        raise AssertionError("should have come from the cache")
+
+    monkeypatch.setattr(gtfs_static, "parse", fail)
+    cached = load_cached(data_dir, cache_dir)
+    assert [s.stop_id for s in cached.stops] == [s.stop_id for s in first.stops]
+    assert cached.child_to_parent == first.child_to_parent
+    assert cached.shapes["1..S03R"].route_id == "1"
+
+    # Editing a file changes the key, so the stale cache isn't used
+    digest = files_digest(data_dir)
+    with open(f"{data_dir}/shapes.txt", "a") as f:
+        f.write("1..S03R,40.60,-74.02,3\n")
+    assert files_digest(data_dir) != digest
+    with pytest.raises(AssertionError, match="cache"):
+        load_cached(data_dir, cache_dir)
+
+
+def test_load_cached_recovers_from_a_corrupt_cache(data_dir, tmp_path):
+    cache_dir = tmp_path / "cache"
+    load_cached(data_dir, str(cache_dir))
+    [cache_file] = cache_dir.iterdir()
+    cache_file.write_bytes(b"not an npz")
+
+    assert len(load_cached(data_dir, str(cache_dir)).shape_points) == 1
+
+
+class _Payload:
+    def __init__(self, marker: str) -> None:
+        self.marker = marker
+
+    def __reduce__(self):
+        return exec, (f"open({self.marker!r}, 'w').close()",)
+
+
+def test_load_cached_never_unpickles_a_planted_file(data_dir, tmp_path):
+    import pickle
+
+    cache_dir = tmp_path / "cache"
+    load_cached(data_dir, str(cache_dir))
+    [cache_file] = cache_dir.iterdir()
+    marker = tmp_path / "pwned"
+    cache_file.write_bytes(pickle.dumps(_Payload(str(marker))))
+
+    assert len(load_cached(data_dir, str(cache_dir)).shape_points) == 1
+    assert not marker.exists()
@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+from types import MappingProxyType
+
+import pytest
+
+from app import create_app
+from app.config import TestConfig
+from app.headways import ObservedStop, headway_stats, infer_arrivals, purge, record_arrivals
+from app.live_state import LiveSnapshot
+from app.models import HeadwayBucket, ObservedArrival
+
+
+def _vehicle(trip_id, stop_id, status, route_id="5", last_update=None):
+    return {
+        "trip_id": trip_id,
+        "route_id": route_id,
+        "direction": "N",
+        "stop_id": stop_id,
+        "location_status": status,
+        "last_position_update": last_update,
+    }
+
+
+def _snapshot(built_at, vehicles, arrivals=None):
+    return LiveSnapshot(
+        built_at=built_at,
+        stations=MappingProxyType({}),
+        vehicles=tuple(vehicles),
+        vehicles_by_route=MappingProxyType({}),
+        arrivals_by_stop=MappingProxyType({k: tuple(v) for k, v in (arrivals or {}).items()}),
+        alerts=(),
+        alerts_by_route=MappingProxyType({}),
+    )
+
+
+def test_infer_arrivals_from_consecutive_snapshots():
+    t0 = datetime(2025, 3, 28, 12, 0, 0)
+    t1 = t0 + timedelta(seconds=30)
+    predicted = int((t0 + timedelta(seconds=10) - datetime(1970, 1, 1)).total_seconds())
+    previous = _snapshot(
+        t0,
+        [
+            _vehicle("stays", "137", "STOPPED_AT"),
+            _vehicle("pulls-in", "132", "INCOMING_AT"),
+            _vehicle("skips-past", "127", "IN_TRANSIT_TO"),
+            _vehicle("leaves", "725", "STOPPED_AT"),
+        ],
+        arrivals={"127": [{"trip_id": "skips-past", "arrival_time": predicted}]},
+    )
+    current = _snapshot(
+        t1,
+        [
+            _vehicle("stays", "137", "STOPPED_AT"),
+            _vehicle("pulls-in", "132", "STOPPED_AT", last_update=(t0 + timedelta(seconds=25)).isoformat()),
+            _vehicle("skips-past", "120", "IN_TRANSIT_TO"),
+            _vehicle("leaves", "726", "IN_TRANSIT_TO"),
+            _vehicle("new-trip", "101", "STOPPED_AT"),
+        ],
+    )
+
+    found = infer_arrivals(previous, current)
+    assert [(a.trip_id, a.stop_id, a.arrived_at) for a in found] == [
+        ("skips-past", "127", t0 + timedelta(seconds=10)),  # at last cycle's prediction
+        ("pulls-in", "132", t0 + timedelta(seconds=25)),  # at its feed timestamp
+        ("new-trip", "101", t1),
+    ]
+
+
+@pytest.fixture
+def app():
+    flask_app = create_app(TestConfig)
+    with flask_app.app_context():
+        yield flask_app
+
+
+def test_record_arrivals_maintains_headway_buckets_incrementally(app):
+    base = datetime.utcnow().replace(microsecond=0) - timedelta(minutes=40)
+
+    def arrival(trip_id, minutes, stop_id="137"):
+        return ObservedStop(trip_id, "5", "N", stop_id, base + timedelta(minutes=minutes))
+
+    # first sighting only seeds the state; the repeat of t2 is ignored
+    assert record_arrivals([arrival("t1", 0), arrival("t2", 6)]) == 1
+    assert record_arrivals([arrival("t2", 6), arrival("t3", 7), arrival("t4", 25), arrival("x1", 0, "127")]) == 2
+
+    assert ObservedArrival.query.count() == 5
+    assert sorted(a.headway_s for a in ObservedArrival.query.filter_by(stop_id="137") if a.headway_s) == [
+        60, 360, 1080
+    ]
+
+    [stats] = headway_stats(3, route_id="5", stop_id="137")
+    assert stats["headways"] == 3
+    assert stats["mean_headway_s"] == 500.0
+    assert stats["bunched"] == 1  # the 60 s headway
+    assert stats["gaps"] == 1  # the 18 min one
+    assert stats["bunching_rate"] == pytest.approx(0.333)
+
+    purge(datetime.utcnow() + timedelta(hours=2))
+    assert ObservedArrival.query.count() == 0
+    assert HeadwayBucket.query.count() == 0
+
+
+def test_headway_and_bunching_endpoints(app):
+    base = datetime.utcnow().replace(microsecond=0) - timedelta(minutes=30)
+    record_arrivals(
+        [ObservedStop(f"t{i}", "A", "S", "A27", base + timedelta(minutes=m)) for i, m in enumerate((0, 1, 2, 10))]
+    )
+
+    client = app.test_client()
+    headway_rows = client.get("/api/stats/headways?route=a&direction=s").get_json()
+    assert [(r["stop_id"], r["headways"]) for r in headway_rows] == [("A27", 3)]
+
+    [summary] = client.get("/api/stats/bunching?hours=2").get_json()
+    assert summary["route_id"] == "A"
+    assert summary["bunched"] == 2
+    assert summary["worst_stations"] == [{"stop_id": "A27", "bunched": 2, "headways": 3}]
+
+    assert client.get("/api/stats/headways?hours=0").status_code == 400
+    assert client.get("/api/stats/bunching?hours=x").status_code == 400
@@ -0,0 +1,111 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app, history
+from app.config import TestConfig
+from app.history import RECORD_DTYPE, HistoryStore
+
+
+def _vehicle(trip_id, route_id, stop_id, status="STOPPED_AT"):
+    return {"trip_id": trip_id, "route_id": route_id, "stop_id": stop_id, "location_status": status}
+
+
+def test_history_round_trips_and_filters_by_route_trip_and_time(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    t0 = datetime(2025, 3, 28, 12, 59, 30)
+    store.append(t0, [_vehicle("A1", "5", "137"), _vehicle("B1", "7", "725")])
+    store.append(t0 + timedelta(seconds=30), [_vehicle("A1", "5", "132", "IN_TRANSIT_TO")])  # next hour
+    store.append(t0 + timedelta(seconds=60), [_vehicle("A1", "5", None), _vehicle("A2", "5", "137")])
+
+    everything = store.positions(t0, t0 + timedelta(hours=1))
+    assert len(everything) == 5
+    assert [p["observed_at"] for p in everything] == sorted(p["observed_at"] for p in everything)
+
+    route_5 = store.positions(t0, t0 + timedelta(hours=1), route_id="5")
+    assert [(p["trip_id"], p["stop_id"]) for p in route_5] == [
+        ("A1", "137"), ("A1", "132"), ("A1", None), ("A2", "137")
+    ]
+    assert route_5[1] == {
+        "observed_at": "2025-03-28T13:00:00",
+        "trip_id": "A1",
+        "route_id": "5",
+        "stop_id": "132",
+        "location_status": "IN_TRANSIT_TO",
+    }
+
+    # end is exclusive, start inclusive
+    window = store.positions(t0 + timedelta(seconds=30), t0 + timedelta(seconds=60), trip_id="A1")
+    assert [p["stop_id"] for p in window] == ["132"]
+    assert store.positions(t0, t0 + timedelta(hours=1), route_id="Z") == []
+
+    # two hourly partitions, 10-byte records
+    assert sorted(os.listdir(tmp_path)) == [
+        "2025032812.bin", "2025032812.dict.json", "2025032813.bin", "2025032813.dict.json"
+    ]
+    assert RECORD_DTYPE.itemsize == 10
+    assert os.path.getsize(tmp_path / "2025032813.bin") == 3 * RECORD_DTYPE.itemsize
+
+
+def test_history_reopens_partition_and_ignores_torn_record(tmp_path):
+    t0 = datetime(2025, 3, 28, 12, 0, 0)
+    HistoryStore(str(tmp_path)).append(t0, [_vehicle("A1", "5", "137")])
+
+    # A restarted process keeps appending to the same hour with the same codes
+    reopened = HistoryStore(str(tmp_path))
+    reopened.append(t0 + timedelta(seconds=30), [_vehicle("B1", "7", "725"), _vehicle("A1", "5", "137")])
+    with open(tmp_path / "2025032812.bin", "ab") as f:
+        f.write(b"\x01\x02\x03")  # a writer crashed mid-record
+
+    positions = reopened.positions(t0, t0 + timedelta(minutes=1))
+    assert [(p["trip_id"], p["route_id"]) for p in positions] == [("A1", "5"), ("B1", "7"), ("A1", "5")]
+
+
+def test_history_prunes_partitions_outside_retention(tmp_path):
+    store = HistoryStore(str(tmp_path), retention_hours=2)
+    t0 = datetime(2025, 3, 28, 12, 0, 0)
+    for hours in range(4):
+        store.append(t0 + timedelta(hours=hours), [_vehicle("A1", "5", "137")])
+
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith(".bin")) == [
+        "2025032813.bin", "2025032814.bin", "2025032815.bin"
+    ]
+
+
+@pytest.fixture
+def history_app(tmp_path):
+    class HistoryConfig(TestConfig):
+        HISTORY_DIR = str(tmp_path)
+        HISTORY_MAX_QUERY_HOURS = 2
+
+    return create_app(HistoryConfig)
+
+
+def test_history_positions_endpoint(history_app):
+    with history_app.app_context():
+        store = history.store()
+        assert store is not None
+        store.append(datetime(2025, 3, 28, 12, 0, 0), [_vehicle("A1", "5", "137"), _vehicle("B1", "7", "725")])
+
+    client = history_app.test_client()
+    resp = client.get("/api/history/positions?route=5&start=2025-03-28T11:30:00Z&end=2025-03-28T12:30:00Z")
+    assert resp.status_code == 200
+    assert [p["trip_id"] for p in resp.get_json()["positions"]] == ["A1"]
+
+    assert client.get("/api/history/positions?start=2025-03-28T12:00:00").status_code == 400
+    too_wide = client.get("/api/history/positions?start=2025-03-28T00:00:00&end=2025-03-28T12:00:00")
+    assert too_wide.status_code == 400
+
+
+def test_history_positions_endpoint_disabled_by_default():
+    client = create_app(TestConfig).test_client()
+    assert client.get("/api/history/positions?start=2025-03-28T12:00:00&end=2025-03-28T13:00:00").status_code == 404
+
+
+def test_history_positions_endpoint_reports_an_unshared_directory(history_app):
+    # Nothing recorded here: e.g. the ingest process writes to another disk
+    client = history_app.test_client()
+    resp = client.get("/api/history/positions?start=2025-03-28T12:00:00&end=2025-03-28T13:00:00")
+    assert resp.status_code == 503
+    assert "shared" in resp.get_json()["error"]
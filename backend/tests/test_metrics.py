@@ -0,0 +1,92 @@
+import time
+import urllib.request
+from datetime import datetime
+
+import pytest
+
+from app import create_app
+from app.config import TestConfig
+from app.etl import FeedRecords, run_ingest
+from app.metrics import Counter, Histogram, serve
+
+
+def test_histogram_renders_cumulative_buckets_per_label_set():
+    histogram = Histogram("stage_seconds", "Stage time.", ("stage",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "fetch")
+    histogram.observe(0.1, "fetch")  # bounds are inclusive
+    histogram.observe(3, "fetch")
+    histogram.observe(0.5, 'say "hi"')
+
+    lines = list(histogram.samples())
+
+    assert 'stage_seconds_bucket{stage="fetch",le="0.1"} 2' in lines
+    assert 'stage_seconds_bucket{stage="fetch",le="1"} 2' in lines
+    assert 'stage_seconds_bucket{stage="fetch",le="+Inf"} 3' in lines
+    assert 'stage_seconds_sum{stage="fetch"} 3.15' in lines
+    assert 'stage_seconds_count{stage="fetch"} 3' in lines
+    assert 'stage_seconds_bucket{stage="say \\"hi\\"",le="1"} 1' in lines
+
+
+def test_counter_accumulates_amounts():
+    counter = Counter("rows_total", "Rows.", ("table",))
+    counter.inc("stop_arrivals", amount=40)
+    counter.inc("stop_arrivals", amount=2)
+
+    assert list(counter.samples()) == ['rows_total{table="stop_arrivals"} 42']
+
+
+@pytest.fixture
+def app(monkeypatch):
+    feed = FeedRecords(
+        vehicles=[("t1", "1", "N", "Van Cortlandt Park-242 St", "127", "STOPPED_AT", False, datetime.utcnow())],
+        arrivals=[("t1", "1", "N", "Van Cortlandt Park-242 St", "127", int(time.time()) + 60)],
+        trip_count=1,
+    )
+    monkeypatch.setattr("app.etl._fetch_live_records", lambda *args: feed)
+    monkeypatch.setattr("app.etl.fetch_alerts_feed_dict", lambda: {"entity": []})
+    return create_app(TestConfig)
+
+
+def test_metrics_endpoint_reports_ingest_stages_and_request_latency(app):
+    client = app.test_client()
+    with app.app_context():
+        assert run_ingest().status == "success"
+    client.get("/api/health")
+    client.get("/api/stations/127/arrivals")
+    client.get("/api/stations/127/arrivals")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    body = response.get_data(as_text=True)
+    for stage in ("fetch", "vehicles", "segments", "arrivals", "commit", "alerts", "publish", "gc"):
+        assert f'transit_ingest_stage_duration_seconds_count{{stage="{stage}"}} 1' in body
+    assert 'transit_ingest_runs_total{status="success"} 1' in body
+    assert 'transit_ingest_rows_total{table="vehicle_snapshots",operation="insert"} 1' in body
+    assert 'transit_ingest_rows_total{table="stop_arrivals",operation="insert"} 1' in body
+    # One series per view, not per station
+    assert (
+        'transit_http_request_duration_seconds_count{endpoint="api.station_arrivals",method="GET",status="200"} 2'
+        in body
+    )
+    assert 'endpoint="api.health"' in body
+
+
+def test_metrics_can_be_disabled():
+    class NoMetricsConfig(TestConfig):
+        METRICS_ENABLED = False
+
+    assert create_app(NoMetricsConfig).test_client().get("/metrics").status_code == 404
+
+
+def test_worker_serves_metrics_on_its_own_port(app):
+    server = serve(app, 0)
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            body = response.read().decode()
+        assert "# TYPE transit_ingest_stage_duration_seconds histogram" in body
+    finally:
+        server.shutdown()
+        server.server_close()
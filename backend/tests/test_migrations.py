@@ -0,0 +1,127 @@
+import random
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from app import create_app
+from app.config import TestConfig
+from app.extensions import db
+from app.migrations import MIGRATIONS, upgrade
+from app.models import AlertRoute, AlertRouteCount, IngestRun, RouteSegment, RouteShape, SchemaMigration, SnapshotPointer, StopArrival
+
+# The tables as the first release created them, before any migration
+_FIRST_RELEASE_DDL = [
+    """CREATE TABLE service_alerts (
+        id INTEGER PRIMARY KEY, external_id VARCHAR(64) NOT NULL UNIQUE, header_text TEXT NOT NULL,
+        routes VARCHAR(128), starts_at DATETIME, ends_at DATETIME, last_seen_at DATETIME)""",
+    """CREATE TABLE route_shapes (
+        shape_id VARCHAR(64) PRIMARY KEY, route_id VARCHAR(8) NOT NULL, points_json TEXT NOT NULL)""",
+    "CREATE INDEX ix_route_shapes_route_id ON route_shapes (route_id)",
+    """CREATE TABLE stop_arrivals (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, trip_id VARCHAR(64) NOT NULL, route_id VARCHAR(8) NOT NULL,
+        direction VARCHAR(1), headsign VARCHAR(128), stop_id VARCHAR(16) NOT NULL, arrival_time INTEGER NOT NULL)""",
+    "CREATE INDEX ix_stop_arrivals_stop_id ON stop_arrivals (stop_id)",
+    """CREATE TABLE ingest_runs (
+        id INTEGER PRIMARY KEY, started_at DATETIME, finished_at DATETIME, vehicle_count INTEGER,
+        alert_count INTEGER, new_segment_count INTEGER, status VARCHAR(16), error_message TEXT)""",
+    "INSERT INTO route_shapes VALUES ('old', '1', '[[40.7, -73.9], [40.8, -73.95]]')",
+    "INSERT INTO stop_arrivals (trip_id, route_id, stop_id, arrival_time) VALUES ('t', '1', '127', 0)",
+    "INSERT INTO ingest_runs (status) VALUES ('success')",
+    "INSERT INTO service_alerts (external_id, header_text, routes) VALUES ('a1', 'Delays', 'A, C')",
+]
+
+
+def test_upgrade_brings_a_first_release_database_up_to_date(tmp_path):
+    url = f"sqlite:///{tmp_path / 'old.db'}"
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        for statement in _FIRST_RELEASE_DDL:
+            conn.execute(text(statement))
+    engine.dispose()
+
+    class OldConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = url
+
+    app = create_app(OldConfig)
+    with app.app_context():
+        schema = inspect(db.engine)
+        assert {"content_hash", "last_seen_run_id"} <= {c["name"] for c in schema.get_columns("service_alerts")}
+        assert {i["name"] for i in schema.get_indexes("stop_arrivals")} == {"ix_stop_arrivals_generation_stop_time"}
+        assert "ix_ingest_runs_started_at" in {i["name"] for i in schema.get_indexes("ingest_runs")}
+        assert StopArrival.query.one().generation == 0
+        assert IngestRun.query.one().vehicles_inserted == 0
+        # The alert route index is filled from the alerts already stored
+        assert sorted((r.route_id, r.external_id) for r in AlertRoute.query) == [("A", "a1"), ("C", "a1")]
+        assert {c.route_id: c.active_count for c in AlertRouteCount.query} == {"A": 1, "C": 1}
+        # Shapes are recreated in the packed form, to be reseeded from the static GTFS
+        assert {"point_count", "points_blob"} <= {c["name"] for c in schema.get_columns("route_shapes")}
+        assert db.session.get(RouteShape, "old") is None
+        assert [m.version for m in SchemaMigration.query.order_by(SchemaMigration.version)] == [
+            m.version for m in MIGRATIONS
+        ]
+        assert upgrade() == []  # nothing left to do
+
+    # A database created by this version gets every migration recorded, none needed
+    with create_app(TestConfig).app_context():
+        assert SchemaMigration.query.count() == len(MIGRATIONS)
+
+
+def _plan(statement) -> list[str]:
+    compiled = statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+    return [row[-1] for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))]
+
+
+def _assert_indexed(plan: list[str], table: str, index: str = "INDEX") -> None:
+    """The table is read through `index` (any index by default), never
+    scanned whole, and no temporary B-tree is built to sort the result.
+    """
+    reads = [step for step in plan if f" {table} " in f" {step} "]
+    assert reads and all(index in step for step in reads), plan
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+@pytest.fixture
+def seeded_app():
+    """A day's worth of ingest runs and three arrival generations of a full
+    feed (~17k arrivals each), with planner statistics gathered.
+    """
+    app = create_app(TestConfig)
+    with app.app_context():
+        rng = random.Random(1)
+        stop_ids = [s for (s,) in db.session.execute(text("SELECT stop_id FROM stations"))]
+        for generation in (1, 2, 3):
+            db.session.bulk_insert_mappings(StopArrival, [
+                {"generation": generation, "trip_id": f"trip{i % 600}", "route_id": "1", "direction": "N",
+                 "stop_id": rng.choice(stop_ids), "arrival_time": 1_760_000_000 + rng.randrange(5400)}
+                for i in range(17_000)
+            ])
+        db.session.add(SnapshotPointer(name="stop_arrivals", generation=3))
+        db.session.bulk_insert_mappings(IngestRun, [{"status": "success"} for _ in range(2880)])
+        db.session.commit()
+        db.session.execute(text("ANALYZE"))
+        yield app
+
+
+def test_hot_queries_use_their_indexes(seeded_app):
+    live = StopArrival.generation == SnapshotPointer.live_generation("stop_arrivals")
+
+    # live_state.publish_from_db: the live generation, grouped by station in time order
+    arrivals = (
+        db.select(StopArrival.stop_id, StopArrival.arrival_time)
+        .where(live)
+        .order_by(StopArrival.stop_id, StopArrival.arrival_time)
+    )
+    _assert_indexed(_plan(arrivals), "stop_arrivals", "ix_stop_arrivals_generation_stop_time")
+
+    # etl.collect_arrival_generations
+    superseded = db.delete(StopArrival).where(StopArrival.generation <= 1)
+    _assert_indexed(_plan(superseded), "stop_arrivals", "ix_stop_arrivals_generation_stop_time")
+
+    # /api/health
+    latest_run = db.select(IngestRun.id).order_by(IngestRun.started_at.desc()).limit(1)
+    _assert_indexed(_plan(latest_run), "ingest_runs", "ix_ingest_runs_started_at")
+
+    # route_stops: one route's edges (covered by the unique constraint)
+    route_edges = db.select(RouteSegment.stop_id_a, RouteSegment.stop_id_b).where(RouteSegment.route_id == "A")
+    _assert_indexed(_plan(route_edges), "route_segments")
+
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+from types import MappingProxyType
+
+from app.live_state import LiveSnapshot
+from app.push import compute_delta, filter_delta
+
+
+def _vehicle(trip_id, route_id, stop_id, status="STOPPED_AT"):
+    return {
+        "trip_id": trip_id,
+        "route_id": route_id,
+        "stop_id": stop_id,
+        "location_status": status,
+        "has_delay_alert": False,
+    }
+
+
+def _snapshot(vehicles=(), arrivals=None, alerts=()):
+    return LiveSnapshot(
+        built_at=datetime(2025, 3, 28, 12, 0, 0),
+        stations=MappingProxyType({}),
+        vehicles=tuple(vehicles),
+        vehicles_by_route=MappingProxyType({}),
+        arrivals_by_stop=MappingProxyType({k: tuple(v) for k, v in (arrivals or {}).items()}),
+        alerts=tuple(alerts),
+        alerts_by_route=MappingProxyType({}),
+    )
+
+
+def test_compute_delta_reports_only_what_changed():
+    before = _snapshot(
+        vehicles=[_vehicle("t1", "5", "228"), _vehicle("t2", "5", "137"), _vehicle("t3", "A", "A27")],
+        arrivals={"228": [{"trip_id": "t1", "arrival_time": 100}], "137": [{"trip_id": "t2", "arrival_time": 200}]},
+        alerts=[{"id": "a1", "routes": ["5"]}],
+    )
+    after = _snapshot(
+        vehicles=[_vehicle("t1", "5", "228"), _vehicle("t2", "5", "132"), _vehicle("t4", "A", "A28")],
+        arrivals={"228": [{"trip_id": "t1", "arrival_time": 100}], "132": [{"trip_id": "t2", "arrival_time": 250}]},
+        alerts=[{"id": "a2", "routes": ["A"]}],
+    )
+
+    delta = compute_delta(before, after)
+
+    assert [v["trip_id"] for v in delta["vehicles"]["added"]] == ["t4"]
+    assert [v["trip_id"] for v in delta["vehicles"]["moved"]] == ["t2"]
+    assert delta["vehicles"]["removed"] == [{"trip_id": "t3", "route_id": "A"}]
+    assert set(delta["arrivals"]) == {"132", "137"}  # 228 unchanged
+    assert delta["arrivals"]["137"] == []
+    assert [a["id"] for a in delta["alerts"]["added"]] == ["a2"]
+    assert delta["alerts"]["cleared"] == [{"id": "a1", "routes": ["5"]}]
+
+
+def test_compute_delta_stamps_built_at_with_its_utc_offset():
+    delta = compute_delta(_snapshot(), _snapshot())
+
+    assert delta["built_at"] == "2025-03-28T12:00:00+00:00"
+    assert datetime.fromisoformat(delta["built_at"]).utcoffset() == timedelta(0)
+
+
+def test_filter_delta_limits_to_subscribed_routes_and_stations():
+    delta = compute_delta(
+        _snapshot(vehicles=[_vehicle("t1", "5", "228")], arrivals={"228": [{"trip_id": "t1", "arrival_time": 1}]}),
+        _snapshot(vehicles=[_vehicle("t1", "5", "137"), _vehicle("t9", "Q", "R16")]),
+    )
+
+    route_5 = filter_delta(delta, {"5"}, set())
+    assert [v["trip_id"] for v in route_5["vehicles"]["moved"]] == ["t1"]
+    assert route_5["vehicles"]["added"] == []
+    assert route_5["arrivals"] == {}
+
+    assert filter_delta(delta, {"5"}, {"228"})["arrivals"] == {"228": []}
+    assert filter_delta(delta, {"L"}, {"L08"}) is None
+    assert filter_delta(delta, None, {"228"}, frozenset({"arrivals"}))["vehicles"]["added"] == []
@@ -38,3 +38,116 @@ def test_seed_stations_is_idempotent(app):
 
         assert inserted_again == 0
         assert before == after
+
+
+def test_spatial_index_matches_brute_force_radius_search(app):
+    import math
+
+    from app.spatial import nearby
+
+    with app.app_context():
+        stations = Station.query.all()
+        origin = next(s for s in stations if s.name == "Grand Central-42 St")
+
+        expected = {
+            s.stop_id
+            for s in stations
+            if s.stop_id != origin.stop_id
+            and math.hypot(
+                (s.lat - origin.lat) * 111_000,
+                (s.lon - origin.lon) * 111_000 * math.cos(math.radians(origin.lat)),
+            ) <= 1500
+        }
+
+        assert {s.stop_id for s in nearby(origin.stop_id, 1500)} == expected
+        assert nearby("not-a-station", 1500) == []
+
+
+def test_seed_stations_skips_until_the_fingerprint_changes(app):
+    from app.etl import seed_stations
+    from app.models import StaticDataVersion
+
+    with app.app_context():
+        assert db.session.get(StaticDataVersion, "stations") is not None
+        station = db.session.get(Station, "127")
+        station.name = "Renamed"
+        db.session.delete(db.session.get(Station, "101"))
+        db.session.commit()
+
+        # stops.txt unchanged: nothing is read or written
+        assert seed_stations() == 0
+        assert db.session.get(Station, "127").name == "Renamed"
+
+        # Fingerprint mismatch: only the missing and changed stations are applied
+        db.session.delete(db.session.get(StaticDataVersion, "stations"))
+        db.session.commit()
+        assert seed_stations() == 1
+        assert db.session.get(Station, "101") is not None
+        assert db.session.get(Station, "127").name == "Times Sq-42 St"
+
+
+def test_seed_shapes_applies_only_changed_shapes(app, tmp_path):
+    import shutil
+
+    from app.etl import seed_shapes
+    from app.geometry import SIMPLIFY_TOLERANCES_M, unpack_points
+    from app.gtfs_static import DATA_DIR
+    from app.models import RouteShape, RouteShapeLevel
+
+    def data_dir(name, shapes_csv):
+        path = tmp_path / name
+        path.mkdir()
+        shutil.copy(f"{DATA_DIR}/stops.txt", path)
+        shutil.copy(f"{DATA_DIR}/trips.txt", path)
+        (path / "shapes.txt").write_text("shape_id,shape_pt_lat,shape_pt_lon,shape_pt_sequence\n" + shapes_csv)
+        return str(path)
+
+    v1 = data_dir("v1", "1..S03R,40.9,-73.9,0\n1..S03R,40.7,-74.0,1\n1..N03R,40.7,-74.0,0\n1..N03R,40.9,-73.9,1\n")
+    v2 = data_dir("v2", "1..S03R,40.9,-73.9,0\n1..S03R,40.8,-73.95,1\n1..S03R,40.7,-74.0,2\n"
+                        "2..S08R,40.9,-73.8,0\n2..S08R,40.7,-74.0,1\n")
+
+    with app.app_context():
+        assert seed_shapes(v1) == 2
+        assert seed_shapes(v1) == 0  # fingerprint matches, skipped
+
+        assert seed_shapes(v2) == 1  # 2..S08R new; 1..S03R updated; 1..N03R gone
+        shapes = {s.shape_id: s for s in RouteShape.query}
+        assert set(shapes) == {"1..S03R", "2..S08R"}
+        assert unpack_points(shapes["1..S03R"].points_blob).tolist() == [[40.9, -73.9], [40.8, -73.95], [40.7, -74.0]]
+        levels = {(lvl.shape_id, lvl.tolerance_m) for lvl in RouteShapeLevel.query}
+        assert levels == {(s, t) for s in shapes for t in SIMPLIFY_TOLERANCES_M}
+
+
+def test_route_shapes_serves_simplified_levels(app, tmp_path):
+    import shutil
+
+    from app import static_responses
+    from app.etl import seed_shapes
+    from app.gtfs_static import DATA_DIR
+
+    data = tmp_path / "data"
+    data.mkdir()
+    shutil.copy(f"{DATA_DIR}/stops.txt", data)
+    shutil.copy(f"{DATA_DIR}/trips.txt", data)
+    # A gentle curve: ~1.3 m of wiggle every ~11 m along a 5.5 km line
+    rows = [f"1..S03R,{40.70 + i * 1e-4:.6f},{-74.0 + (i % 2) * 2e-5:.6f},{i}" for i in range(500)]
+    (data / "shapes.txt").write_text("shape_id,shape_pt_lat,shape_pt_lon,shape_pt_sequence\n" + "\n".join(rows))
+
+    with app.app_context():
+        seed_shapes(str(data))
+        static_responses.rebuild()
+    client = app.test_client()
+
+    def point_counts(query=""):
+        response = client.get(f"/api/route-shapes{query}")
+        assert response.status_code == 200
+        return {s["shape_id"]: len(s["points"]) for s in response.get_json()}
+
+    full = point_counts()
+    assert full["1..S03R"] == 500
+    assert point_counts("?tolerance=1") == full  # finer than the finest level
+    assert point_counts("?tolerance=5")["1..S03R"] == 2
+    assert point_counts("?zoom=10")["1..S03R"] == 2
+    assert point_counts("?zoom=18") == full
+    for bad in ("?zoom=abc", "?zoom=40", "?tolerance=-1", "?tolerance=nan"):
+        assert client.get(f"/api/route-shapes{bad}").status_code == 400
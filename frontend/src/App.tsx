@@ -1,16 +1,42 @@
 import { useEffect, useState } from "react";
-import { api } from "./api/client";
+import { api, subscribeLive } from "./api/client";
 import { AlertsPanel } from "./components/AlertsPanel";
 import { DelayChart } from "./components/DelayChart";
 import { Header } from "./components/Header";
 import { RoutePanel } from "./components/RoutePanel";
 import { TransitMap } from "./components/TransitMap";
 import { relativeTime } from "./lib/time";
-import type { AlertsByRoute, RouteSegment, RouteShape, ServiceAlert, Station, VehicleSnapshot } from "./types";
+import type {
+  AlertsByRoute,
+  LiveDelta,
+  RouteSegment,
+  RouteShape,
+  ServiceAlert,
+  Station,
+  VehicleSnapshot,
+} from "./types";
 import "./App.css";
 
+// While the delta stream is down (or refused because the server holds its
+// limit of open streams), fall back to reloading on this interval.
 const POLL_INTERVAL_MS = 30_000;
 
+function applyVehicleDelta(current: VehicleSnapshot[], delta: LiveDelta["vehicles"]): VehicleSnapshot[] {
+  const removed = new Set(delta.removed.map((v) => v.trip_id));
+  const changed = new Map([...delta.added, ...delta.moved].map((v) => [v.trip_id, v]));
+  return current
+    .filter((v) => !removed.has(v.trip_id) && !changed.has(v.trip_id))
+    .concat([...changed.values()]);
+}
+
+function applyAlertDelta(current: ServiceAlert[], delta: LiveDelta["alerts"]): ServiceAlert[] {
+  const gone = new Set([...delta.cleared.map((a) => a.id), ...delta.added.map((a) => a.id)]);
+  return current
+    .filter((a) => !gone.has(a.id))
+    .concat(delta.added)
+    .sort((a, b) => (b.starts_at ?? "").localeCompare(a.starts_at ?? ""));
+}
+
 export default function App() {
   const [stations, setStations] = useState<Station[]>([]);
   const [vehicles, setVehicles] = useState<VehicleSnapshot[]>([]);
@@ -25,15 +51,16 @@ export default function App() {
   // Stations and route shapes are static reference data -- fetch once.
   useEffect(() => {
     api.stations().then(setStations).catch(() => undefined);
-    api.routeShapes().then(setShapes).catch(() => undefined);
+    // Zoom-14 detail (5 m) stays within a couple of pixels up to the map's max zoom
+    api.routeShapes(14).then(setShapes).catch(() => undefined);
   }, []);
 
-  // Everything else is "right now" -- poll on an interval rather than
-  // opening a socket, since the backend itself only refreshes every 30s.
+  // Everything else is "right now": load it once, then apply the deltas the
+  // backend pushes after each ingest instead of re-polling every endpoint.
   useEffect(() => {
     let cancelled = false;
 
-    const poll = async () => {
+    const load = async () => {
       try {
         const [nextVehicles, nextAlerts, nextAlertsByRoute, nextSegments] = await Promise.all([
           api.vehicles(),
@@ -53,11 +80,54 @@ export default function App() {
       }
     };
 
-    poll();
-    const interval = setInterval(poll, POLL_INTERVAL_MS);
+    // Aggregates and segments aren't in the delta; both are cheap to
+    // refetch (segments revalidate to a 304 unless new edges appeared).
+    const refreshDerived = async () => {
+      try {
+        const [nextAlertsByRoute, nextSegments] = await Promise.all([api.alertsByRoute(), api.routeSegments()]);
+        if (cancelled) return;
+        setAlertsByRoute(nextAlertsByRoute);
+        setSegments(nextSegments);
+      } catch {
+        // the next delta will try again
+      }
+    };
+
+    let dropped = false;
+    let pollInterval: ReturnType<typeof setInterval> | null = null;
+    const stopPolling = () => {
+      if (pollInterval !== null) clearInterval(pollInterval);
+      pollInterval = null;
+    };
+    load();
+    const unsubscribe = subscribeLive(
+      { topics: ["vehicles", "alerts"] },
+      {
+        onDelta: (delta) => {
+          setVehicles((current) => applyVehicleDelta(current, delta.vehicles));
+          setAlerts((current) => applyAlertDelta(current, delta.alerts));
+          setLastSyncIso(delta.built_at);
+          refreshDerived();
+        },
+        onOpen: () => {
+          setIsLive(true);
+          // Deltas sent while we were disconnected are gone -- resync fully
+          if (dropped) load();
+          dropped = false;
+          stopPolling();
+        },
+        onError: () => {
+          dropped = true;
+          setIsLive(false);
+          pollInterval ??= setInterval(load, POLL_INTERVAL_MS);
+        },
+      },
+    );
+
     return () => {
       cancelled = true;
-      clearInterval(interval);
+      stopPolling();
+      unsubscribe();
     };
   }, []);
 
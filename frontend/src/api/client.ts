@@ -1,6 +1,7 @@
 import type {
   AlertsByRoute,
   HealthResponse,
+  LiveDelta,
   RouteSegment,
   RouteShape,
   RouteStops,
@@ -12,12 +13,28 @@ import type {
 
 const BASE_URL = import.meta.env.VITE_API_BASE_URL ?? "http://localhost:8000";
 
+// Last body + ETag per path. Endpoints that send an ETag (the precomputed
+// static ones) are revalidated with If-None-Match, so an unchanged payload
+// costs a bodiless 304 instead of a full download and JSON parse.
+const etagCache = new Map<string, { etag: string; body: unknown }>();
+
 async function getJson<T>(path: string): Promise<T> {
-  const response = await fetch(`${BASE_URL}${path}`);
+  const cached = etagCache.get(path);
+  const response = await fetch(`${BASE_URL}${path}`, {
+    headers: cached ? { "If-None-Match": cached.etag } : undefined,
+  });
+  if (response.status === 304 && cached) {
+    return cached.body as T;
+  }
   if (!response.ok) {
     throw new Error(`Request to ${path} failed with status ${response.status}`);
   }
-  return (await response.json()) as T;
+  const body = (await response.json()) as T;
+  const etag = response.headers.get("ETag");
+  if (etag) {
+    etagCache.set(path, { etag, body });
+  }
+  return body;
 }
 
 export const api = {
@@ -27,7 +44,185 @@ export const api = {
   alerts: () => getJson<ServiceAlert[]>("/api/alerts"),
   alertsByRoute: () => getJson<AlertsByRoute[]>("/api/stats/alerts-by-route"),
   routeSegments: () => getJson<RouteSegment[]>("/api/route-segments"),
-  routeShapes: () => getJson<RouteShape[]>("/api/route-shapes"),
+  routeShapes: (zoom?: number) =>
+    getJson<RouteShape[]>(zoom === undefined ? "/api/route-shapes" : `/api/route-shapes?zoom=${zoom}`),
   routeStops: (routeId: string) => getJson<RouteStops>(`/api/routes/${routeId}/stops`),
   stationArrivals: (stopId: string) => getJson<StationArrivals>(`/api/stations/${stopId}/arrivals`),
 };
+
+export type LiveTopic = "vehicles" | "alerts" | "arrivals";
+
+interface LiveSubscription {
+  routes?: string[];
+  stations?: string[];
+  topics?: LiveTopic[];
+}
+
+interface LiveHandlers {
+  onDelta: (delta: LiveDelta) => void;
+  onOpen?: () => void;
+  onError?: () => void;
+}
+
+interface LiveSubscriber {
+  subscription: LiveSubscription;
+  handlers: LiveHandlers;
+}
+
+// Every subscribeLive() call shares one EventSource, opened for the union
+// of the current subscriptions. When that union changes the stream is
+// reopened, and the old one is kept until the new one is open so no cycle
+// falls in between.
+const liveSubscribers = new Set<LiveSubscriber>();
+let liveSource: EventSource | null = null;
+let retiringSource: EventSource | null = null;
+let liveQuery = "";
+let lastBuiltAt: string | null = null;
+// The browser retries dropped streams itself, but not refused ones (e.g. a
+// 503 when the server holds its limit of open streams); those are reopened
+// after this long, with subscribers polling in the meantime.
+const LIVE_REOPEN_MS = 30_000;
+let reopenTimer: ReturnType<typeof setTimeout> | null = null;
+
+function sortedUnion(lists: (string[] | undefined)[]): string[] {
+  return [...new Set(lists.flatMap((list) => list ?? []))].sort();
+}
+
+function liveQueryString(): string {
+  const subscriptions = [...liveSubscribers].map((s) => s.subscription);
+  const query = new URLSearchParams();
+  // An empty routes or topics list means "all", which wins over any union
+  const routes = subscriptions.some((s) => !s.routes?.length)
+    ? []
+    : sortedUnion(subscriptions.map((s) => s.routes));
+  const stations = sortedUnion(subscriptions.map((s) => s.stations));
+  const topics = subscriptions.some((s) => !s.topics?.length)
+    ? []
+    : sortedUnion(subscriptions.map((s) => s.topics));
+  if (routes.length) query.set("routes", routes.join(","));
+  if (stations.length) query.set("stations", stations.join(","));
+  if (topics.length) query.set("topics", topics.join(","));
+  return query.toString();
+}
+
+/**
+ * The part of a shared-stream delta one subscription asked for, cut down the
+ * way the server's filter_delta would; null if none of it applies.
+ */
+function filterLiveDelta(delta: LiveDelta, subscription: LiveSubscription): LiveDelta | null {
+  const topics = subscription.topics?.length ? subscription.topics : null;
+  const routes = subscription.routes?.length ? new Set(subscription.routes.map((r) => r.toUpperCase())) : null;
+  const stations = new Set(subscription.stations ?? []);
+  const wants = (topic: LiveTopic) => !topics || topics.includes(topic);
+  const onRoute = (routeIds: string[]) => !routes || routeIds.some((r) => routes.has(r));
+
+  const vehicles = wants("vehicles")
+    ? {
+        added: delta.vehicles.added.filter((v) => onRoute([v.route_id])),
+        moved: delta.vehicles.moved.filter((v) => onRoute([v.route_id])),
+        removed: delta.vehicles.removed.filter((v) => onRoute([v.route_id])),
+      }
+    : { added: [], moved: [], removed: [] };
+  const alerts = wants("alerts")
+    ? {
+        added: delta.alerts.added.filter((a) => onRoute(a.routes)),
+        cleared: delta.alerts.cleared.filter((a) => onRoute(a.routes)),
+      }
+    : { added: [], cleared: [] };
+  const arrivals = wants("arrivals")
+    ? Object.fromEntries(Object.entries(delta.arrivals).filter(([stopId]) => stations.has(stopId)))
+    : {};
+
+  const sections = [...Object.values(vehicles), ...Object.values(alerts)];
+  if (!sections.some((rows) => rows.length) && !Object.keys(arrivals).length) return null;
+  return { built_at: delta.built_at, vehicles, alerts, arrivals };
+}
+
+function dispatchLiveDelta(delta: LiveDelta): void {
+  // While a reopened stream takes over, both may carry the same cycle
+  if (delta.built_at === lastBuiltAt) return;
+  lastBuiltAt = delta.built_at;
+  for (const { subscription, handlers } of [...liveSubscribers]) {
+    const own = filterLiveDelta(delta, subscription);
+    if (own) handlers.onDelta(own);
+  }
+}
+
+function closeRetiringSource(): void {
+  retiringSource?.close();
+  retiringSource = null;
+}
+
+function clearReopenTimer(): void {
+  if (reopenTimer !== null) clearTimeout(reopenTimer);
+  reopenTimer = null;
+}
+
+function syncLiveSource(): void {
+  if (!liveSubscribers.size) {
+    clearReopenTimer();
+    closeRetiringSource();
+    liveSource?.close();
+    liveSource = null;
+    liveQuery = "";
+    return;
+  }
+  const query = liveQueryString();
+  if (liveSource && query === liveQuery) return;
+
+  if (liveSource?.readyState === EventSource.OPEN) {
+    closeRetiringSource();
+    retiringSource = liveSource;
+  } else {
+    liveSource?.close(); // never delivered anything, nothing to hand over
+  }
+  clearReopenTimer();
+  liveQuery = query;
+  const source = new EventSource(`${BASE_URL}/api/stream?${query}`);
+  liveSource = source;
+  source.addEventListener("delta", (event) => {
+    dispatchLiveDelta(JSON.parse((event as MessageEvent<string>).data) as LiveDelta);
+  });
+  source.onopen = () => {
+    if (source !== liveSource) return;
+    closeRetiringSource();
+    for (const { handlers } of [...liveSubscribers]) handlers.onOpen?.();
+  };
+  source.onerror = () => {
+    if (source !== liveSource) {
+      // The retiring stream dropped before its replacement opened
+      source.close();
+      if (source !== retiringSource) return;
+      retiringSource = null;
+    } else {
+      closeRetiringSource();
+      if (source.readyState === EventSource.CLOSED) {
+        reopenTimer = setTimeout(() => {
+          reopenTimer = null;
+          liveSource = null;
+          syncLiveSource();
+        }, LIVE_REOPEN_MS);
+      }
+    }
+    for (const { handlers } of [...liveSubscribers]) handlers.onError?.();
+  };
+}
+
+/**
+ * Subscribe to the server-sent delta stream. One message arrives per ingest
+ * cycle that changed something this subscription cares about; the browser
+ * reconnects on its own after drops, and a refused stream is retried every
+ * LIVE_REOPEN_MS. onError means deltas aren't arriving, so poll until the
+ * next onOpen. All subscriptions share a single connection. Returns a
+ * function that unsubscribes.
+ */
+export function subscribeLive(subscription: LiveSubscription, handlers: LiveHandlers): () => void {
+  const subscriber = { subscription, handlers };
+  liveSubscribers.add(subscriber);
+  syncLiveSource();
+  if (liveSource?.readyState === EventSource.OPEN) handlers.onOpen?.();
+  return () => {
+    liveSubscribers.delete(subscriber);
+    syncLiveSource();
+  };
+}
@@ -1,5 +1,5 @@
 import { useEffect, useState } from "react";
-import { api } from "../api/client";
+import { api, subscribeLive } from "../api/client";
 import { canonicalRouteId } from "../lib/routeGeometry";
 import type { StationArrivals, StopArrival } from "../types";
 import { RouteBullet } from "./RouteBullet";
@@ -42,6 +42,18 @@ export function StationPanel({ stopId, onClose }: StationPanelProps) {
       .then(setData)
       .catch(() => undefined)
       .finally(() => setLoading(false));
+
+    // Refetch whenever this station's upcoming arrivals change; the server
+    // computes minutes_away, so the delta itself isn't rendered directly.
+    // This adds the station to the app's one stream, not a second one.
+    return subscribeLive(
+      { stations: [stopId], topics: ["arrivals"] },
+      {
+        onDelta: () => {
+          api.stationArrivals(stopId).then(setData).catch(() => undefined);
+        },
+      },
+    );
   }, [stopId]);
 
   // Group arrivals by route for a compact display
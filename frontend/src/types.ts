@@ -93,6 +93,10 @@ export interface IngestRun {
   finished_at: string | null;
   vehicle_count: number;
   alert_count: number;
+  new_segment_count: number;
+  vehicles_inserted: number;
+  vehicles_updated: number;
+  vehicles_deleted: number;
   status: "running" | "success" | "error";
   error_message: string | null;
 }
@@ -101,3 +105,19 @@ export interface HealthResponse {
   status: string;
   last_ingest_run: IngestRun | null;
 }
+
+/** One /api/stream "delta" event: what changed in the last ingest cycle. */
+export interface LiveDelta {
+  built_at: string;
+  vehicles: {
+    added: VehicleSnapshot[];
+    moved: VehicleSnapshot[];
+    removed: { trip_id: string; route_id: string }[];
+  };
+  /** Full upcoming-arrival list for each subscribed station that changed. */
+  arrivals: Record<string, Omit<StopArrival, "minutes_away">[]>;
+  alerts: {
+    added: ServiceAlert[];
+    cleared: { id: string; routes: string[] }[];
+  };
+}